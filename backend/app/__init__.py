@@ -4,7 +4,23 @@ from flask_cors import CORS
 from flask_mail import Mail
 from flask_wtf.csrf import CSRFProtect
 from .config import Config
-from .models import db, User
+from .models import db
+from .search import search_index
+from .view_counter import view_counter
+from .view_history import view_history
+from .ranking import hot_ranking
+from .cache import response_cache
+from .image_pipeline import image_processor
+from .audio_pipeline import audio_processor
+from .chunked_upload import chunked_uploads
+from .media import media_server
+from .db_pool import pool_monitor
+from .db_routing import replica_router, PRIMARY_UNTIL_HEADER
+from .user_cache import user_cache
+from .tokens import token_auth
+from .passwords import password_hasher, PasswordHasherBusy
+from .rollups import daily_rollup, rebuild as rebuild_rollups
+from . import migrations
 
 # 初始化扩展
 login_manager = LoginManager()
@@ -16,20 +32,47 @@ csrf = CSRFProtect()
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # 进程内缓存的用户快照，命中时不查库
+    return user_cache.load(int(user_id))
+
+@login_manager.unauthorized_handler
+def unauthorized():
+    # API 统一返回 401，令牌客户端据此刷新访问令牌
+    return {'success': False, 'message': login_manager.login_message}, 401
+
+@login_manager.request_loader
+def load_user_from_request(request):
+    # 没有 cookie 会话时校验 Authorization: Bearer 访问令牌，不查库
+    return token_auth.load_from_request(request)
 
 def create_app(config_class=Config):
     """应用工厂函数"""
-    app = Flask(__name__)
+    # /static 由 media_server 提供（带缓存头、Range 和代理发送）
+    app = Flask(__name__, static_folder=None)
     app.config.from_object(config_class)
     
-    # 初始化扩展
+    # 初始化扩展（连接池参数和只读副本需要在 db.init_app 之前配置）
+    pool_monitor.init_app(app)
+    replica_router.init_app(app)
     db.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
+    search_index.init_app(app)
+    view_counter.init_app(app)
+    view_history.init_app(app)
+    hot_ranking.init_app(app)
+    response_cache.init_app(app)
+    user_cache.init_app(app)
+    token_auth.init_app(app)
+    password_hasher.init_app(app)
+    daily_rollup.init_app(app)
+    image_processor.init_app(app)
+    audio_processor.init_app(app)
+    chunked_uploads.init_app(app)
+    media_server.init_app(app)
     
     # 为API环境配置CORS，允许所有域名访问
-    CORS(app, supports_credentials=True, origins="*")
+    CORS(app, supports_credentials=True, origins="*", expose_headers=['ETag', PRIMARY_UNTIL_HEADER])
     
     # 在API环境中禁用CSRF保护，避免跨域问题
     app.config['WTF_CSRF_ENABLED'] = False
@@ -41,9 +84,11 @@ def create_app(config_class=Config):
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(main_bp, url_prefix='/api')
     
-    # 创建数据库表
+    # 检查数据库结构版本（已是最新版本时只有一次查询），需要时执行迁移
     with app.app_context():
-        db.create_all()
+        pool_monitor.watch()
+        if app.config['AUTO_MIGRATE']:
+            migrations.upgrade(db.engine)
         
         # 确保上传目录存在
         import os
@@ -52,6 +97,19 @@ def create_app(config_class=Config):
         os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'instruments'), exist_ok=True)
         os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'audios'), exist_ok=True)
     
+    @app.cli.command('migrate')
+    def migrate_command():
+        """升级数据库结构到最新版本"""
+        start, end = migrations.upgrade(db.engine)
+        print(f"数据库结构版本: {start} -> {end}" if end != start else f"数据库结构已是最新版本 {end}")
+    
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """按全部历史重建仪表板的按天统计"""
+        with db.engine.begin() as conn:
+            days = rebuild_rollups(conn)
+        print(f"已重建 {days} 天的统计")
+    
     # 注册错误处理器
     @app.errorhandler(404)
     def not_found_error(error):
@@ -66,4 +124,9 @@ def create_app(config_class=Config):
     def request_entity_too_large(error):
         return {'success': False, 'message': '文件太大'}, 413
     
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        # 登录/注册高峰时快速失败，由客户端稍后重试
+        return {'success': False, 'message': str(error)}, 503, {'Retry-After': '1'}
+    
     return app
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""试听音频的后台处理
+
+卖家上传的原始音频（常见是几十 MB 的 WAV）只作为源文件保存，发布请求提交后：
+- 用 ffmpeg 转成 AUDIO_PREVIEW_BITRATE 码率的 MP3 试听文件，去掉元数据；
+- 解码出单声道 PCM，用 NumPy 向量化地降采样为 AUDIO_PEAKS_COUNT 组 (最小值, 最大值)
+  波形峰值写成 JSON，播放器直接画波形，不需要下载整段音频；
+- 时长、码率、试听文件和峰值文件地址写回 Instrument。
+
+处理方式与图片相同：进程池（AUDIO_PROCESSING_MODE=process，默认）、线程池（thread）
+或请求内同步执行（sync）。服务器没有安装 ffmpeg 时，WAV 仍由标准库解码计算时长和波形，
+试听直接使用原文件；MP3 则原样使用。
+"""
+import json
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+
+from .models import db, Instrument
+from .cache import response_cache
+from .workers import ProcessLocalExecutor
+
+# 计算波形时的解码采样率，波形只需要包络，8kHz 足够
+PEAKS_SAMPLE_RATE = 8000
+
+
+def compute_peaks(samples, count):
+    """把 [-1, 1] 的单声道样本降采样为 count 组 (最小值, 最大值)，按 min, max 交替展开"""
+    if samples.size == 0:
+        return []
+    count = min(count, samples.size)
+    bucket = -(-samples.size // count)
+    # 末尾用最后一个样本补齐，保证能整形成 count 行
+    frames = np.pad(samples, (0, bucket * count - samples.size), mode='edge').reshape(count, bucket)
+    peaks = np.empty(count * 2)
+    peaks[0::2] = frames.min(axis=1)
+    peaks[1::2] = frames.max(axis=1)
+    return np.round(peaks, 3).tolist()
+
+
+def _decode_with_ffmpeg(ffmpeg, source_path):
+    """用 ffmpeg 解码为单声道 16 位 PCM，返回 [-1, 1] 的样本"""
+    result = subprocess.run(
+        [ffmpeg, '-v', 'error', '-i', source_path, '-vn', '-ac', '1', '-ar', str(PEAKS_SAMPLE_RATE),
+         '-f', 's16le', '-'],
+        capture_output=True, check=True
+    )
+    return np.frombuffer(result.stdout, dtype='<i2').astype(np.float32) / 32768, PEAKS_SAMPLE_RATE
+
+
+def _decode_wav(source_path):
+    """没有 ffmpeg 时用标准库解码 PCM WAV，返回 [-1, 1] 的单声道样本"""
+    with wave.open(source_path, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 3:
+        # 24 位没有对应的 dtype，补一个低字节后按 32 位读
+        padded = np.zeros((len(raw) // 3, 4), dtype=np.uint8)
+        padded[:, 1:] = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        samples = padded.view('<i4').reshape(-1).astype(np.float32) / 2 ** 31
+    else:
+        dtype = {2: '<i2', 4: '<i4'}[width]
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / 2 ** (8 * width - 1)
+    # 多声道取平均混成单声道
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def process_audio(upload_folder, audio_url, bitrate, peaks_count, ffmpeg='ffmpeg'):
+    """生成试听文件和波形峰值（在工作进程中执行）
+
+    返回 {'preview', 'peaks', 'duration', 'bitrate'}，路径相对 upload_folder。
+    """
+    source_path = os.path.join(upload_folder, audio_url)
+    base, ext = os.path.splitext(audio_url)
+    ffmpeg = shutil.which(ffmpeg)
+    preview_url = f'{base}_preview.mp3' if ffmpeg else audio_url
+    peaks_url = f'{base}_peaks.json'
+    peaks_path = os.path.join(upload_folder, peaks_url)
+
+    # 内容相同的音频已经处理过（文件名是内容哈希），直接复用
+    if os.path.exists(peaks_path) and os.path.exists(os.path.join(upload_folder, preview_url)):
+        with open(peaks_path) as f:
+            waveform = json.load(f)
+        return {'preview': preview_url, 'peaks': peaks_url,
+                'duration': waveform['duration'], 'bitrate': waveform['bitrate']}
+
+    if ffmpeg:
+        samples, rate = _decode_with_ffmpeg(ffmpeg, source_path)
+        temp_path = os.path.join(upload_folder, f'{base}_preview.tmp.mp3')
+        subprocess.run(
+            [ffmpeg, '-v', 'error', '-y', '-i', source_path, '-vn', '-map_metadata', '-1',
+             '-codec:a', 'libmp3lame', '-b:a', f'{bitrate}k', temp_path],
+            capture_output=True, check=True
+        )
+        os.replace(temp_path, os.path.join(upload_folder, preview_url))
+    elif ext.lower() == '.wav':
+        samples, rate = _decode_wav(source_path)
+    else:
+        # 无法解码，只能原样播放
+        return {'preview': audio_url, 'peaks': None, 'duration': None, 'bitrate': None}
+
+    duration = round(samples.size / rate, 3)
+    if not ffmpeg:
+        # 未转码时按文件大小估算实际码率
+        bitrate = round(os.path.getsize(source_path) * 8 / 1000 / duration) if duration else None
+
+    with open(peaks_path, 'w') as f:
+        json.dump({
+            'duration': duration,
+            'bitrate': bitrate,
+            'length': min(peaks_count, samples.size),
+            'data': compute_peaks(samples, peaks_count)
+        }, f, separators=(',', ':'))
+
+    return {'preview': preview_url, 'peaks': peaks_url, 'duration': duration, 'bitrate': bitrate}
+
+
+class AudioProcessor:
+    """音频处理任务调度"""
+
+    def __init__(self):
+        self._executor = ProcessLocalExecutor()
+        self._app = None
+        self.mode = 'process'
+        self.max_workers = 1
+        self.bitrate = 96
+        self.peaks_count = 800
+        self.ffmpeg = 'ffmpeg'
+
+    def init_app(self, app):
+        self._app = app
+        self.mode = app.config.get('AUDIO_PROCESSING_MODE', 'process')
+        self.max_workers = app.config.get('AUDIO_PROCESSING_WORKERS', 1)
+        self.bitrate = app.config.get('AUDIO_PREVIEW_BITRATE', 96)
+        self.peaks_count = app.config.get('AUDIO_PEAKS_COUNT', 800)
+        self.ffmpeg = app.config.get('AUDIO_FFMPEG_PATH', 'ffmpeg')
+        app.extensions['audio_processor'] = self
+
+    def submit(self, instrument):
+        """为已提交到数据库、audio_status 为 pending 的乐器排队处理音频"""
+        args = (self._app.config['UPLOAD_FOLDER'], instrument.audio_url,
+                self.bitrate, self.peaks_count, self.ffmpeg)
+        if self.mode == 'sync':
+            try:
+                result = process_audio(*args)
+            except Exception as e:
+                self._finish(instrument.id, instrument.audio_url, None, e)
+            else:
+                self._finish(instrument.id, instrument.audio_url, result)
+            return
+
+        future = self._executor.get(self.mode, self.max_workers).submit(process_audio, *args)
+        future.add_done_callback(
+            lambda f, instrument_id=instrument.id, audio_url=instrument.audio_url:
+                self._on_done(instrument_id, audio_url, f)
+        )
+
+    def _on_done(self, instrument_id, audio_url, future):
+        error = future.exception()
+        self._finish(instrument_id, audio_url, None if error else future.result(), error)
+
+    def _finish(self, instrument_id, audio_url, result, error=None):
+        if error is not None:
+            print(f"音频处理失败 (instrument_id={instrument_id}): {error}")
+        values = {'audio_status': 'failed'} if error is not None else {
+            'audio_status': 'ready',
+            'audio_preview_url': result['preview'],
+            'audio_peaks_url': result['peaks'],
+            'audio_duration': result['duration'],
+            'audio_bitrate': result['bitrate']
+        }
+        table = Instrument.__table__
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as conn:
+                    # 处理期间卖家换了音频时丢弃旧结果
+                    conn.execute(
+                        table.update()
+                        .where(table.c.id == instrument_id, table.c.audio_url == audio_url)
+                        .values(**values)
+                    )
+            # 绕过了 ORM 会话，需要手动作废乐器相关的响应缓存
+            response_cache.invalidate('instruments')
+        except Exception as e:
+            print(f"音频处理结果写回失败 (instrument_id={instrument_id}): {e}")
+
+
+audio_processor = AudioProcessor()
@@ -1,14 +1,44 @@
 from flask import Blueprint, request, jsonify, session
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash
+from sqlalchemy import case, or_, update
+from sqlalchemy.exc import IntegrityError
 import re
 
 from . import db
 from .models import User
-from .utils import validate_email, validate_phone, generate_token, verify_token
+from .passwords import password_hasher
+from .utils import validate_email, validate_phone
+from .tokens import token_auth
 
 auth_bp = Blueprint('auth', __name__)
 
+# 唯一约束冲突对应的提示，按字段名匹配约束名
+DUPLICATE_MESSAGES = {
+    'phone': '手机号已被注册',
+    'email': '邮箱已被注册',
+    'username': '用户名已被使用'
+}
+
+# 违反唯一约束时各数据库报错中约束/列名所在的片段
+_CONSTRAINT_PATTERNS = [
+    re.compile(r"for key '([^']+)'"),                # MySQL: Duplicate entry 'x' for key 'user.email'
+    re.compile(r'UNIQUE constraint failed: (\S+)'),  # SQLite: UNIQUE constraint failed: user.email
+    re.compile(r'constraint "([^"]+)"')              # PostgreSQL: violates unique constraint "user_email_key"
+]
+
+def _duplicate_message(error):
+    """IntegrityError -> 对应字段的提示，识别不出时返回 None"""
+    text = str(error.orig)
+    for pattern in _CONSTRAINT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            # 只看约束名，不看报错里重复的值（用户名里可能带 email 字样）
+            key = match.group(1)
+            for field, message in DUPLICATE_MESSAGES.items():
+                if field in key:
+                    return message
+    return None
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """用户注册"""
@@ -46,25 +76,16 @@ def register():
     if phone and not validate_phone(phone):
         return jsonify({'success': False, 'message': '手机号格式不正确'}), 400
     
-    # 检查用户名和邮箱是否已存在
-    if User.query.filter_by(username=username).first():
-        return jsonify({'success': False, 'message': '用户名已被使用'}), 400
-    
-    if User.query.filter_by(email=email).first():
-        return jsonify({'success': False, 'message': '邮箱已被注册'}), 400
-    
-    if phone and User.query.filter_by(phone=phone).first():
-        return jsonify({'success': False, 'message': '手机号已被注册'}), 400
+    # 创建新用户（哈希排队超时由 PasswordHasherBusy 处理器返回 503）
+    user = User(
+        username=username,
+        email=email,
+        phone=phone or None
+    )
+    user.set_password(password)
     
+    # 不预先查询用户名、邮箱、手机号是否已存在，直接插入，由唯一约束判重（没有先查后插的竞态）
     try:
-        # 创建新用户
-        user = User(
-            username=username,
-            email=email,
-            phone=phone or None
-        )
-        user.set_password(password)
-        
         db.session.add(user)
         db.session.commit()
         
@@ -82,6 +103,12 @@ def register():
             }
         }), 201
         
+    except IntegrityError as e:
+        db.session.rollback()
+        message = _duplicate_message(e)
+        if message is None:
+            return jsonify({'success': False, 'message': f'注册失败: {str(e.orig)}'}), 500
+        return jsonify({'success': False, 'message': message}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'注册失败: {str(e)}'}), 500
@@ -98,13 +125,13 @@ def login():
     if not username or not password:
         return jsonify({'success': False, 'message': '请输入用户名和密码'}), 400
     
-    # 支持用户名、邮箱、手机号登录
-    if '@' in username:
-        user = User.query.filter_by(email=username).first()
-    elif username.isdigit() and len(username) == 11:
-        user = User.query.filter_by(phone=username).first()
-    else:
-        user = User.query.filter_by(username=username).first()
+    # 支持用户名、邮箱、手机号登录：一条查询，三列各有唯一索引；
+    # 11 位数字的用户名可能与别人的手机号相同，此时用户名优先，其次邮箱
+    user = User.query.filter(
+        or_(User.username == username, User.email == username, User.phone == username)
+    ).order_by(
+        case((User.username == username, 0), (User.email == username, 1), else_=2)
+    ).first()
     
     if not user or not user.check_password(password):
         return jsonify({'success': False, 'message': '用户名或密码错误'}), 401
@@ -112,12 +139,32 @@ def login():
     if not user.is_verified and user.role == 'seller':
         return jsonify({'success': False, 'message': '卖家账号需要先验证身份'}), 403
     
-    # 登录用户
-    login_user(user, remember=remember)
+    # 旧算法或旧代价的哈希趁有明文时升级（需开启 PASSWORD_REHASH_ON_LOGIN），失败不影响本次登录。
+    # 密码没变，直接按旧哈希条件更新这一列：不经过 ORM flush，不会递增令牌版本或清空响应缓存，
+    # 期间改过密码的不会被覆盖
+    if password_hasher.rehash_on_login and password_hasher.needs_rehash(user.password_hash):
+        try:
+            new_hash = password_hasher.hash(password)
+            db.session.execute(
+                update(User)
+                .where(User.id == user.id, User.password_hash == user.password_hash)
+                .values(password_hash=new_hash)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"密码哈希升级失败 (user_id={user.id}): {e}")
+    
+    # API 客户端可以换取 Bearer 令牌，不建立 cookie 会话
+    issue_tokens = str(data.get('issue_tokens', '')).lower() in ('true', '1')
+    if not issue_tokens:
+        login_user(user, remember=remember)
     
     return jsonify({
         'success': True,
         'message': '登录成功',
+        **({'tokens': token_auth.issue(user)} if issue_tokens else {}),
         'user': {
             'id': user.id,
             'username': user.username,
@@ -133,9 +180,25 @@ def login():
 @login_required
 def logout():
     """用户登出"""
+    # 令牌模式下吊销当前访问令牌和请求体中的刷新令牌
+    data = request.get_json(silent=True) or {}
+    token_auth.revoke((token_auth.bearer_token(request), 'access'), (data.get('refresh_token'), 'refresh'))
     logout_user()
     return jsonify({'success': True, 'message': '已退出登录'})
 
+@auth_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    """用刷新令牌换取新的访问令牌和刷新令牌"""
+    data = request.get_json(silent=True) or {}
+    token = data.get('refresh_token', '').strip()
+    if not token:
+        return jsonify({'success': False, 'message': '缺少刷新令牌'}), 400
+    
+    tokens, error = token_auth.refresh(token)
+    if error:
+        return jsonify({'success': False, 'message': error}), 401
+    return jsonify({'success': True, 'tokens': tokens})
+
 @auth_bp.route('/csrf_token', methods=['GET'])
 def get_csrf_token():
     """获取CSRF token"""
@@ -194,6 +257,9 @@ def update_profile():
     try:
         db.session.commit()
         return jsonify({'success': True, 'message': '资料更新成功'})
+    except IntegrityError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': _duplicate_message(e) or f'更新失败: {str(e.orig)}'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'更新失败: {str(e)}'}), 500
@@ -0,0 +1,237 @@
+"""公共只读接口的响应缓存
+
+- 缓存键由请求路径和规范化后的查询参数（按参数名、参数值排序）组成；
+- 后端可插拔：默认进程内 LRU + TTL，CACHE_BACKEND=redis 时使用共享的 Redis
+  （需要安装 redis 包，多 worker 共享缓存和失效）；
+- 失效按标签分代：每个标签有一个版本号，版本号写进缓存键，
+  乐器、收藏、订单、分类等数据提交后递增对应标签的版本，旧条目自然作废；
+- 命中/未命中/失效次数可通过 stats() 查看。
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, current_app
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import attributes
+
+from .models import db, User, Category, Instrument, InstrumentImage, Favorite, Order
+
+
+class MemoryCacheBackend:
+    """进程内 LRU + TTL 缓存"""
+
+    def __init__(self, max_entries=1024):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        # 计数器单独存放，不参与 LRU 淘汰（标签版本号被淘汰会让旧条目复活）
+        self._counters = {}
+        self.max_entries = max_entries
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisCacheBackend:
+    """Redis 共享缓存（可选依赖）"""
+
+    def __init__(self, url, prefix='instrument-trading:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND=redis 需要先安装 redis 包')
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def get_counter(self, key):
+        return int(self._client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        return self._client.incr(self.prefix + key)
+
+
+class ResponseCache:
+    """响应缓存"""
+
+    def __init__(self):
+        self.backend = MemoryCacheBackend()
+        self.default_ttl = 60
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CACHE_ENABLED', True)
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+        if app.config.get('CACHE_BACKEND', 'memory') == 'redis':
+            self.backend = RedisCacheBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryCacheBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        app.extensions['response_cache'] = self
+
+    # ---------- 键与失效 ----------
+    @staticmethod
+    def normalized_query():
+        """规范化查询参数：按参数名、参数值排序
+
+        空值不能丢弃：cursor= 表示游标分页的第一页，和不带 cursor 是两种响应。
+        """
+        items = sorted(
+            (key, value)
+            for key in request.args
+            for value in request.args.getlist(key)
+        )
+        return '&'.join(f'{key}={value}' for key, value in items)
+
+    def tag_version(self, tag):
+        return self.backend.get_counter(f'tag:{tag}')
+
+    def make_key(self, tags):
+        versions = ','.join(f'{tag}.{self.tag_version(tag)}' for tag in tags)
+        return f'view:{request.path}?{self.normalized_query()}#{versions}'
+
+    def invalidate(self, *tags):
+        """作废带有这些标签的全部缓存条目"""
+        for tag in tags:
+            self.backend.incr(f'tag:{tag}')
+        with self._lock:
+            self._stats['invalidations'] += len(tags)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+    # ---------- 装饰器 ----------
+    def cached(self, tags, ttl=None, anonymous_only=False):
+        """缓存视图的 200 响应
+
+        tags 决定哪些数据变化会让条目失效；anonymous_only 时登录用户直接绕过缓存。
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or (anonymous_only and current_user.is_authenticated):
+                    return view(*args, **kwargs)
+
+                key = self.make_key(tags)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._count('hits')
+                    response = current_app.response_class(
+                        entry['body'], status=entry['status'], mimetype=entry['mimetype']
+                    )
+                    if entry.get('etag'):
+                        response.headers['ETag'] = entry['etag']
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count('misses')
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self.backend.set(key, {
+                        'body': response.get_data(as_text=True),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype,
+                        'etag': response.headers.get('ETag')
+                    }, ttl or self.default_ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
+
+
+# ---------- 数据变化时按标签失效 ----------
+# 乐器列表中嵌入了卖家、图片、收藏数和状态，这些数据变化都需要作废乐器相关缓存
+_INVALIDATION_TAGS = (
+    (Category, 'categories'),
+    (Instrument, 'instruments'),
+    (InstrumentImage, 'instruments'),
+    (Favorite, 'instruments'),
+    (Order, 'instruments'),
+)
+
+# 乐器列表里嵌入的用户字段
+_LISTED_USER_ATTRS = ('username', 'real_name', 'avatar', 'credit_score')
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_stale_tags(session, flush_context):
+    tags = session.info.setdefault('cache_stale_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        for model, tag in _INVALIDATION_TAGS:
+            if isinstance(obj, model):
+                tags.add(tag)
+        # 卖家资料（昵称、头像、信用分）也出现在乐器列表里，只有这几列变化才作废
+        if isinstance(obj, User) and (obj in session.deleted or obj in session.dirty and any(
+            attributes.get_history(obj, attr).has_changes() for attr in _LISTED_USER_ATTRS
+        )):
+            tags.add('instruments')
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_stale_tags(session):
+    tags = session.info.pop('cache_stale_tags', None)
+    if tags:
+        response_cache.invalidate(*tags)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_stale_tags(session):
+    session.info.pop('cache_stale_tags', None)
@@ -0,0 +1,294 @@
+"""可续传的分片上传
+
+大文件（尤其是试听音频）不再整包走 multipart，而是：
+1. POST /api/uploads 声明文件名、大小和类型，拿到 upload_id；
+2. PUT /api/uploads/<upload_id>?offset=N 逐片追加原始字节，服务端边读边写盘，
+   内存占用只有一个读缓冲；收到足够的文件头后立即按魔数校验类型；
+   中断后 GET /api/uploads/<upload_id> 查询已收到的字节数即可续传；
+3. POST /api/uploads/<upload_id>/complete 校验完整性并按内容哈希落到正式目录；
+4. 发布乐器时在 images / audio 字段里填 upload_id 引用已完成的上传。
+
+上传状态以 JSON 文件与分片文件放在 UPLOAD_FOLDER/.chunks 下，多 worker 共享；
+同一上传的读改写用锁文件（flock）串行化，发布时引用的上传在事务提交后才删除。
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from .models import db
+from .utils import hash_file, move_to_content_path
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：单进程运行，退化为进程内锁
+    fcntl = None
+
+# 文件头魔数 -> 实际格式
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'ID3', 'mp3'),
+)
+
+# 允许的类型：kind -> (扩展名集合, 正式存放目录)
+UPLOAD_KINDS = {
+    'image': ({'jpg', 'jpeg', 'png', 'gif'}, 'instruments'),
+    'audio': ({'mp3', 'wav'}, 'audios'),
+}
+
+# 判断文件类型需要的文件头长度
+HEADER_SIZE = 12
+
+
+class UploadError(Exception):
+    """分片上传请求无效"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def detect_format(header):
+    """按文件头魔数识别格式，无法识别时返回 None"""
+    for signature, fmt in _SIGNATURES:
+        if header.startswith(signature):
+            return fmt
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav'
+    # 无 ID3 标签的 MP3 直接以帧同步字开头
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        return 'mp3'
+    return None
+
+
+class ChunkedUploadStore:
+    """分片上传状态存储"""
+
+    def __init__(self):
+        self._app = None
+        self.chunk_size = 1024 * 1024
+        self.max_sizes = {'image': 10 * 1024 * 1024, 'audio': 50 * 1024 * 1024}
+        self.session_ttl = 24 * 3600
+        self._local_lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self.chunk_size = app.config.get('UPLOAD_CHUNK_SIZE', self.chunk_size)
+        self.max_sizes = app.config.get('UPLOAD_MAX_SIZES', self.max_sizes)
+        self.session_ttl = app.config.get('UPLOAD_SESSION_TTL', self.session_ttl)
+        app.extensions['chunked_uploads'] = self
+
+    # ---------- 存储 ----------
+    @property
+    def directory(self):
+        path = os.path.join(self._app.config['UPLOAD_FOLDER'], '.chunks')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _paths(self, upload_id):
+        # upload_id 只能是我们生成的十六进制串，防止路径穿越
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadError('上传不存在', 404)
+        return (os.path.join(self.directory, f'{upload_id}.json'),
+                os.path.join(self.directory, f'{upload_id}.part'))
+
+    @contextmanager
+    def _locked(self, upload_id):
+        """串行化同一上传的读改写（跨 worker 进程）"""
+        meta_path, _ = self._paths(upload_id)
+        if fcntl is None:
+            with self._local_lock:
+                yield
+            return
+        with open(f'{meta_path[:-len(".json")]}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, upload_id, user_id):
+        meta_path, _ = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise UploadError('上传不存在', 404)
+        if meta['user_id'] != user_id:
+            raise UploadError('无权操作此上传', 403)
+        return meta
+
+    def _save(self, meta):
+        meta_path, _ = self._paths(meta['upload_id'])
+        temp_path = f'{meta_path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, meta_path)
+
+    def _discard(self, upload_id):
+        meta_path, part_path = self._paths(upload_id)
+        for path in (meta_path, part_path, f'{meta_path[:-len(".json")]}.lock'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def purge_expired(self):
+        """清理超时未完成或未被引用的上传"""
+        deadline = time.time() - self.session_ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.json') and os.path.getmtime(path) < deadline:
+                with self._locked(name[:-len('.json')]):
+                    self._discard(name[:-len('.json')])
+
+    # ---------- 上传流程 ----------
+    def create(self, user_id, filename, size, kind):
+        """创建上传会话"""
+        if kind not in UPLOAD_KINDS:
+            raise UploadError('不支持的上传类型')
+        extensions, _ = UPLOAD_KINDS[kind]
+        if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in extensions:
+            raise UploadError('文件类型不允许')
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('文件大小不正确')
+        if size > self.max_sizes[kind]:
+            raise UploadError('文件太大', 413)
+
+        self.purge_expired()
+        meta = {
+            'upload_id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'kind': kind,
+            'filename': filename,
+            'size': size,
+            'offset': 0,
+            'format': None,
+            'status': 'uploading',
+            'path': None,
+            'created_at': time.time()
+        }
+        _, part_path = self._paths(meta['upload_id'])
+        open(part_path, 'wb').close()
+        self._save(meta)
+        return meta
+
+    def status(self, upload_id, user_id):
+        return self._load(upload_id, user_id)
+
+    def append(self, upload_id, user_id, offset, stream, length):
+        """从请求流追加一片数据，offset 必须等于已收到的字节数"""
+        with self._locked(upload_id):
+            return self._append(upload_id, user_id, offset, stream, length)
+
+    def _append(self, upload_id, user_id, offset, stream, length):
+        meta = self._load(upload_id, user_id)
+        if meta['status'] != 'uploading':
+            raise UploadError('上传已完成')
+        if offset != meta['offset']:
+            raise UploadError(f"分片偏移不匹配，应从 {meta['offset']} 继续", 409)
+        if length is None or length <= 0:
+            raise UploadError('分片为空')
+        if length > self.chunk_size:
+            raise UploadError('分片太大', 413)
+        if offset + length > meta['size']:
+            raise UploadError('数据超出声明的文件大小')
+
+        _, part_path = self._paths(upload_id)
+        received = 0
+        with open(part_path, 'r+b') as out:
+            out.seek(offset)
+            while received < length:
+                chunk = stream.read(min(64 * 1024, length - received))
+                if not chunk:
+                    break
+                out.write(chunk)
+                received += len(chunk)
+            out.truncate(offset + received)
+        meta['offset'] = offset + received
+
+        # 收到文件头后立即校验，类型不符直接终止上传
+        if meta['format'] is None and (meta['offset'] >= HEADER_SIZE or meta['offset'] == meta['size']):
+            with open(part_path, 'rb') as f:
+                fmt = detect_format(f.read(HEADER_SIZE))
+            extensions, _ = UPLOAD_KINDS[meta['kind']]
+            if fmt not in extensions:
+                self._discard(upload_id)
+                raise UploadError('文件内容与类型不符')
+            meta['format'] = fmt
+
+        self._save(meta)
+        return meta
+
+    def complete(self, upload_id, user_id):
+        """完成上传：校验长度并按内容哈希移动到正式目录"""
+        with self._locked(upload_id):
+            return self._complete(upload_id, user_id)
+
+    def _complete(self, upload_id, user_id):
+        meta = self._load(upload_id, user_id)
+        if meta['status'] == 'complete':
+            return meta
+        if meta['status'] == 'claimed':
+            raise UploadError('上传已被引用')
+        if meta['offset'] != meta['size'] or meta['format'] is None:
+            raise UploadError('文件尚未上传完整')
+
+        _, part_path = self._paths(upload_id)
+        _, subfolder = UPLOAD_KINDS[meta['kind']]
+        meta['path'] = move_to_content_path(part_path, hash_file(part_path), subfolder, meta['format'])
+        meta['status'] = 'complete'
+        self._save(meta)
+        return meta
+
+    def claim(self, upload_id, user_id, kind):
+        """发布时引用已完成的上传，返回文件相对路径；每个上传只能引用一次。
+        先标记为已引用，当前事务提交后才删除上传记录，回滚则恢复为可引用
+        """
+        with self._locked(upload_id):
+            meta = self._load(upload_id, user_id)
+            if meta['status'] != 'complete' or meta['kind'] != kind:
+                raise UploadError('引用的上传无效')
+            meta['status'] = 'claimed'
+            self._save(meta)
+        db.session.info.setdefault('claimed_uploads', []).append(upload_id)
+        return meta['path']
+
+    def _finish_claims(self, upload_ids, committed):
+        for upload_id in upload_ids:
+            with self._locked(upload_id):
+                if committed:
+                    self._discard(upload_id)
+                    continue
+                meta_path, _ = self._paths(upload_id)
+                if os.path.exists(meta_path):
+                    with open(meta_path) as f:
+                        meta = json.load(f)
+                    meta['status'] = 'complete'
+                    self._save(meta)
+
+
+chunked_uploads = ChunkedUploadStore()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _discard_claimed_uploads(session):
+    upload_ids = session.info.pop('claimed_uploads', None)
+    if upload_ids:
+        chunked_uploads._finish_claims(upload_ids, committed=True)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _release_claimed_uploads(session, transaction):
+    # 回滚或未提交就关闭会话：恢复为可引用（提交时 after_commit 已先取走）
+    if transaction.parent is not None:
+        return
+    upload_ids = session.info.pop('claimed_uploads', None)
+    if upload_ids:
+        chunked_uploads._finish_claims(upload_ids, committed=False)
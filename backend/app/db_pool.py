@@ -0,0 +1,181 @@
+"""数据库连接池配置与监控
+
+连接池参数来自 DB_* 配置（环境变量），由 pool_monitor.init_app 在 db.init_app 之前
+合并进 SQLALCHEMY_ENGINE_OPTIONS（显式写在 SQLALCHEMY_ENGINE_OPTIONS 里的项优先）：
+- pool_pre_ping：借出前探测连接，空闲后被 MySQL/代理断开的连接会自动重连；
+- pool_recycle：连接存活超过该秒数后重建，应小于服务端的空闲断开时间；
+- DB_STATEMENT_TIMEOUT：单条语句超时（MySQL 用 max_execution_time，PostgreSQL 用 statement_timeout）。
+
+监控：借出/归还/新建/失效次数、等待空闲连接的耗时和超时次数，
+以及当前借出数相对 pool_size + max_overflow 的饱和度，见 GET /api/health/db。
+QUERY_COUNT_HEADER=true 时每个响应带上 X-Query-Count（本请求执行的 SQL 条数），供压测统计。
+"""
+import threading
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from .models import db
+
+
+class MonitoredQueuePool(QueuePool):
+    """记录借出等待时间的 QueuePool"""
+
+    _local = threading.local()
+
+    def _do_get(self):
+        # QueuePool._do_get 竞争失败时会递归重试，只在最外层计时
+        if getattr(self._local, 'timing', False):
+            return super()._do_get()
+        self._local.timing = True
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_monitor.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        finally:
+            self._local.timing = False
+        pool_monitor.record_wait(time.perf_counter() - start)
+        return connection
+
+
+def build_engine_options(config):
+    """按 DB_* 配置生成 create_engine 参数"""
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    # SQLite 开发库由 Flask-SQLAlchemy 选择合适的连接池
+    if uri.startswith('sqlite'):
+        return {}
+
+    options = {
+        'poolclass': MonitoredQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 10),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 280),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+
+    timeout = config.get('DB_STATEMENT_TIMEOUT', 0)
+    if timeout:
+        if uri.startswith('mysql'):
+            options['connect_args'] = {'init_command': f'SET SESSION max_execution_time={int(timeout)}'}
+        elif uri.startswith('postgresql'):
+            options['connect_args'] = {'options': f'-c statement_timeout={int(timeout)}'}
+    return options
+
+
+class PoolMonitor:
+    """连接池指标"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._app = None
+        self._stats = self._empty_stats()
+        self.slow_checkout = 0.1
+        self.count_queries = False
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            'connects': 0,
+            'checkouts': 0,
+            'checkins': 0,
+            'invalidations': 0,
+            'timeouts': 0,
+            'slow_checkouts': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0
+        }
+
+    def init_app(self, app):
+        """需要在 db.init_app 之前调用"""
+        self._app = app
+        self.slow_checkout = app.config.get('DB_SLOW_CHECKOUT', 0.1)
+        self.count_queries = app.config.get('QUERY_COUNT_HEADER', False)
+        if self.count_queries:
+            app.after_request(self._query_count_header)
+        options = build_engine_options(app.config)
+        options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+        app.extensions['pool_monitor'] = self
+
+    def watch(self):
+        """给所有引擎的连接池挂上计数事件（需要应用上下文）"""
+        for engine in db.engines.values():
+            if self.count_queries and not event.contains(engine, 'before_cursor_execute', self._on_execute):
+                event.listen(engine, 'before_cursor_execute', self._on_execute)
+            pool = engine.pool
+            if event.contains(pool, 'checkout', self._on_checkout):
+                continue
+            event.listen(pool, 'connect', self._on_connect)
+            event.listen(pool, 'checkout', self._on_checkout)
+            event.listen(pool, 'checkin', self._on_checkin)
+            event.listen(pool, 'invalidate', self._on_invalidate)
+            event.listen(pool, 'soft_invalidate', self._on_invalidate)
+
+    def _incr(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self._incr('connects')
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self._incr('checkouts')
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self._incr('checkins')
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self._incr('invalidations')
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+
+    def _query_count_header(self, response):
+        response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+        return response
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self._stats['wait_total'] += seconds
+            self._stats['wait_max'] = max(self._stats['wait_max'], seconds)
+            if seconds >= self.slow_checkout:
+                self._stats['slow_checkouts'] += 1
+            if timed_out:
+                self._stats['timeouts'] += 1
+
+    @staticmethod
+    def pool_status(engine):
+        """单个引擎连接池的当前占用"""
+        pool = engine.pool
+        status = {'pool_class': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            status.update({
+                'size': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'checked_out': pool.checkedout(),
+                'idle': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'saturation': round(pool.checkedout() / capacity, 4) if capacity else None
+            })
+        return status
+
+    def stats(self):
+        """累计指标和各连接池当前占用（需要应用上下文）"""
+        with self._lock:
+            stats = dict(self._stats)
+        waits = stats['checkouts'] or 1
+        stats['wait_avg_ms'] = round(stats.pop('wait_total') / waits * 1000, 3)
+        stats['wait_max_ms'] = round(stats.pop('wait_max') * 1000, 3)
+        stats['pools'] = {name or 'default': self.pool_status(engine) for name, engine in db.engines.items()}
+        return stats
+
+
+pool_monitor = PoolMonitor()
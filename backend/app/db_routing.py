@@ -0,0 +1,120 @@
+"""读写分离
+
+DATABASE_REPLICA_URLS（逗号分隔）配置只读副本后，副本注册为 SQLALCHEMY_BINDS 中的
+replica_0、replica_1 ……，会话按请求选择连接：
+- GET/HEAD/OPTIONS 请求中的查询走副本，同一请求固定使用同一个副本；
+- 写请求、flush、INSERT/UPDATE/DELETE 和 SELECT ... FOR UPDATE 始终走主库；
+- 读己之写：提交过写操作后，在 DB_REPLICA_STICKY_SECONDS 秒内该客户端的读请求也走主库。
+  截止时间记在签名的 session cookie 里，同时通过 X-DB-Primary-Until 响应头返回，
+  不用 cookie 的 Bearer 令牌客户端在之后的请求中原样带回这个请求头；两者都由客户端携带，多 worker 共享。
+  请求头不签名，只接受不晚于 DB_REPLICA_STICKY_SECONDS 秒之后的时间，伪造也最多让自己多读一会儿主库；
+- 请求之外（后台线程、命令行）一律走主库。
+
+本地测试可以把主库 SQLite 文件复制一份作为副本：
+    DATABASE_URL=sqlite:////tmp/primary.db DATABASE_REPLICA_URLS=sqlite:////tmp/replica.db
+"""
+import random
+import time
+
+from flask import g, request, session, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+PRIMARY_UNTIL_HEADER = 'X-DB-Primary-Until'
+
+
+class ReplicaRouter:
+    """只读副本路由"""
+
+    def __init__(self):
+        self.replicas = []
+        self.sticky_seconds = 10
+
+    def init_app(self, app):
+        """需要在 db.init_app 之前调用，把副本注册为数据库绑定"""
+        self.sticky_seconds = app.config.get('DB_REPLICA_STICKY_SECONDS', 10)
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        self.replicas = []
+        for index, url in enumerate(app.config.get('DATABASE_REPLICA_URLS') or []):
+            key = f'replica_{index}'
+            binds[key] = url
+            self.replicas.append(key)
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.after_request(self._add_primary_header)
+        app.extensions['replica_router'] = self
+
+    def read_key(self):
+        """当前请求的读操作应使用的副本绑定名，需要走主库时返回 None"""
+        if not self.replicas or not has_request_context() or request.method not in READ_METHODS:
+            return None
+        if g.get('db_use_primary') or self._primary_until() > time.time():
+            return None
+        if 'db_replica' not in g:
+            g.db_replica = random.choice(self.replicas)
+        return g.db_replica
+
+    def stick_to_primary(self):
+        """提交写操作后，本请求剩余部分和接下来一段时间的读请求都走主库"""
+        if not self.replicas or not has_request_context():
+            return
+        g.db_use_primary = True
+        g.db_primary_until = session['db_primary_until'] = time.time() + self.sticky_seconds
+
+    def _primary_until(self):
+        """客户端带来的读主库截止时间：session cookie 或 X-DB-Primary-Until 请求头，取较晚者"""
+        until = session.get('db_primary_until', 0)
+        try:
+            echoed = float(request.headers.get(PRIMARY_UNTIL_HEADER, 0))
+        except ValueError:
+            echoed = 0
+        if echoed <= time.time() + self.sticky_seconds:
+            until = max(until, echoed)
+        return until
+
+    def _add_primary_header(self, response):
+        until = g.get('db_primary_until')
+        if until is not None:
+            response.headers[PRIMARY_UNTIL_HEADER] = f'{until:.3f}'
+        return response
+
+
+replica_router = ReplicaRouter()
+
+
+def _is_write(clause):
+    if clause is None:
+        return False
+    return getattr(clause, 'is_dml', False) or getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    """按请求类型选择主库或副本的会话"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if _is_write(clause):
+            # session.execute(update(...)) 之类不经过 flush 的写操作
+            self.info['db_wrote'] = True
+        elif bind is None and not self._flushing:
+            key = replica_router.read_key()
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# ---------- 读己之写 ----------
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['db_wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_after_commit(session):
+    if session.info.pop('db_wrote', False):
+        replica_router.stick_to_primary()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_written(session):
+    session.info.pop('db_wrote', None)
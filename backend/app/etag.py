@@ -0,0 +1,56 @@
+"""ETag 与条件请求
+
+列表接口用本页记录的行版本（id、updated_at、计数字段）加上缓存标签版本计算 ETag，
+If-None-Match 命中时直接返回 304，不再序列化整页数据；
+其余 GET 接口由 main_bp 的 after_request 按响应体哈希补上 ETag。
+"""
+import hashlib
+import json
+
+from flask import request, jsonify, current_app
+
+from .cache import response_cache
+
+
+def _digest(parts):
+    raw = json.dumps(parts, default=str, separators=(',', ':'), sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def instruments_etag(instruments, *extra):
+    """由乐器行版本计算 ETag
+
+    图片、卖家资料等嵌入数据的变化体现在 instruments 缓存标签的版本号上。
+    """
+    return _digest([
+        response_cache.tag_version('instruments'),
+        [(inst.id, inst.updated_at, inst.status, inst.view_count, inst.favorite_count) for inst in instruments],
+        list(extra)
+    ])
+
+
+def value_etag(*parts):
+    """由任意可 JSON 化的值计算 ETag"""
+    return _digest(list(parts))
+
+
+def json_with_etag(etag, build, weak=False):
+    """If-None-Match 命中时返回 304，否则调用 build() 生成 JSON 响应并带上 ETag"""
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag, weak)
+    return response
+
+
+def add_conditional_headers(response):
+    """after_request 钩子：GET 的 JSON 响应补齐 ETag 并处理 If-None-Match"""
+    if request.method != 'GET' or response.status_code != 200 \
+            or response.mimetype != 'application/json' or response.direct_passthrough:
+        return response
+    if 'ETag' not in response.headers:
+        response.add_etag()
+    # 浏览器每次都带 If-None-Match 回源校验
+    response.headers.setdefault('Cache-Control', 'no-cache')
+    return response.make_conditional(request)
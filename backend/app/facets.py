@@ -0,0 +1,96 @@
+"""乐器列表的分面计数
+
+GET /api/instruments?facets=true 在结果之外返回每个分类、成色和价格区间的数量：
+- 每个分面的计数遵守其他分面的筛选条件，但不受自身条件限制
+  （选中“吉他”后分类计数仍显示其他分类各有多少，成色和价格计数只统计吉他）；
+- 只发一条聚合查询：内层按行算出分类、成色、价格区间和“是否满足各筛选条件”的标记，
+  外层 GROUP BY 得到一个很小的计数立方体（分类数 × 5 种成色 × 区间数 × 2^条件数），
+  各分面的计数在 Python 中由立方体累加得到，不需要每个取值一条 COUNT；
+- 聚合走 (status, category_id, instrument_condition, price) 覆盖索引，只扫索引不回表。
+"""
+from flask import current_app
+from sqlalchemy import and_, case, func, literal
+
+from .models import db, Instrument
+
+CONDITIONS = ('new', 'like_new', 'good', 'fair', 'poor')
+
+
+def build_filters(category_id=None, condition=None, min_price=None, max_price=None):
+    """各分面当前的筛选条件，{分面名: SQL 条件}，未筛选的分面不出现"""
+    filters = {}
+    if category_id:
+        filters['category'] = Instrument.category_id == category_id
+    if condition:
+        filters['condition'] = Instrument.instrument_condition == condition
+    price = []
+    if min_price is not None:
+        price.append(Instrument.price >= min_price)
+    if max_price is not None:
+        price.append(Instrument.price <= max_price)
+    if price:
+        filters['price'] = and_(*price)
+    return filters
+
+
+def price_buckets(bounds=None):
+    """由 FACET_PRICE_BUCKETS 边界生成 [(最低价, 最高价)]，区间左闭右开，最后一档没有上限"""
+    if bounds is None:
+        bounds = current_app.config.get('FACET_PRICE_BUCKETS', [])
+    edges = [0] + sorted(bounds) + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _bucket_expression(buckets):
+    """价格所在区间的序号"""
+    whens = [(Instrument.price < high, index) for index, (_, high) in enumerate(buckets) if high is not None]
+    if not whens:
+        return literal(0)
+    return case(*whens, else_=len(buckets) - 1)
+
+
+def facet_counts(base_query, filters, buckets=None):
+    """统计各分面的数量
+
+    base_query 是只带公共条件（在售、关键词）的乐器查询，filters 来自 build_filters。
+    返回 {'category': [...], 'condition': [...], 'price': [...]}。
+    """
+    buckets = buckets or price_buckets()
+    names = list(filters)
+
+    columns = [
+        Instrument.category_id.label('category'),
+        Instrument.instrument_condition.label('condition'),
+        _bucket_expression(buckets).label('price_bucket')
+    ]
+    columns += [case((filters[name], 1), else_=0).label(f'match_{name}') for name in names]
+    cells = base_query.with_entities(*columns).order_by(None).subquery()
+
+    keys = [cells.c.category, cells.c.condition, cells.c.price_bucket] + \
+        [cells.c[f'match_{name}'] for name in names]
+    rows = db.session.query(*keys, func.count()).group_by(*keys).all()
+
+    category_counts, condition_counts, bucket_counts = {}, {}, {}
+    for row in rows:
+        category, condition, bucket, count = row[0], row[1], row[2], row[-1]
+        matches = dict(zip(names, row[3:-1]))
+        # 满足除 facet 自身以外的全部条件才计入该分面
+        if all(matches[name] for name in names if name != 'category'):
+            category_counts[category] = category_counts.get(category, 0) + count
+        if all(matches[name] for name in names if name != 'condition'):
+            condition_counts[condition] = condition_counts.get(condition, 0) + count
+        if all(matches[name] for name in names if name != 'price'):
+            bucket_counts[bucket] = bucket_counts.get(bucket, 0) + count
+
+    return {
+        'category': [
+            {'value': category, 'count': count}
+            for category, count in sorted(category_counts.items(), key=lambda item: (-item[1], item[0] or 0))
+            if category is not None
+        ],
+        'condition': [{'value': condition, 'count': condition_counts.get(condition, 0)} for condition in CONDITIONS],
+        'price': [
+            {'min': low, 'max': high, 'count': bucket_counts.get(index, 0)}
+            for index, (low, high) in enumerate(buckets)
+        ]
+    }
@@ -0,0 +1,128 @@
+"""上传图片的后台处理
+
+请求线程只负责把原图按内容哈希写盘（见 utils.save_content_addressed）
+并插入 status='pending' 的 InstrumentImage，缩放和格式转换交给进程池
+（IMAGE_PROCESSING_MODE=process，默认）、线程池（thread）或在请求内同步执行（sync，便于调试）。
+
+每张图按 IMAGE_VARIANT_WIDTHS 生成一组宽度（不超过原图宽度），每档同时输出
+JPEG/PNG 和 WebP，供前端 srcset 按需选择；生成前按 EXIF 方向摆正，
+输出文件不带 EXIF 等元数据。派生图与原图同样以内容哈希命名，
+重复上传的图片直接复用已有文件。
+完成后把结果写回 InstrumentImage.variants 并置为 ready，失败置为 failed。
+"""
+import json
+import os
+
+from PIL import Image, ImageOps
+
+from .models import db, InstrumentImage
+from .cache import response_cache
+from .workers import ProcessLocalExecutor
+
+
+def derive_variants(upload_folder, image_url, widths):
+    """生成宽度阶梯派生图（在工作进程中执行）
+
+    返回 {宽度: {'src': JPEG/PNG 相对路径, 'webp': WebP 相对路径}}。
+    """
+    source_path = os.path.join(upload_folder, image_url)
+    base, ext = os.path.splitext(image_url)
+    ext = ext.lower()
+    variants = {}
+
+    with Image.open(source_path) as img:
+        img.load()
+        # 手机照片常靠 EXIF 标记方向，先摆正再缩放
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+        # JPEG 不支持透明通道，GIF 派生图统一转成 PNG
+        fallback_ext = '.png' if has_alpha or ext in ('.png', '.gif') else '.jpg'
+        fallback_format = 'PNG' if fallback_ext == '.png' else 'JPEG'
+
+        source_width, source_height = img.size
+        # 不放大：只保留比原图窄的档位，再补一档原图宽度（不超过最大档）
+        targets = sorted({w for w in widths if w < source_width} | {min(source_width, max(widths))})
+
+        for width in targets:
+            src_url = f'{base}_{width}w{fallback_ext}'
+            webp_url = f'{base}_{width}w.webp'
+            variants[width] = {'src': src_url, 'webp': webp_url}
+            # 内容相同的图片已经生成过，直接复用
+            if os.path.exists(os.path.join(upload_folder, src_url)) \
+                    and os.path.exists(os.path.join(upload_folder, webp_url)):
+                continue
+
+            height = max(1, round(source_height * width / source_width))
+            resized = img if width == source_width else img.resize((width, height), Image.Resampling.LANCZOS)
+
+            # 不传 exif/icc_profile，输出文件不带元数据
+            save_options = {'optimize': True}
+            if fallback_format == 'JPEG':
+                save_options.update(quality=82, progressive=True)
+            resized.save(os.path.join(upload_folder, src_url), fallback_format, **save_options)
+            resized.save(os.path.join(upload_folder, webp_url), 'WEBP', quality=78, method=4)
+
+    return variants
+
+
+class ImageProcessor:
+    """图片处理任务调度"""
+
+    def __init__(self):
+        self._executor = ProcessLocalExecutor()
+        self._app = None
+        self.mode = 'process'
+        self.max_workers = 2
+        self.widths = [160, 320, 640, 960, 1280]
+
+    def init_app(self, app):
+        self._app = app
+        self.mode = app.config.get('IMAGE_PROCESSING_MODE', 'process')
+        self.max_workers = app.config.get('IMAGE_PROCESSING_WORKERS', 2)
+        self.widths = app.config.get('IMAGE_VARIANT_WIDTHS', self.widths)
+        app.extensions['image_processor'] = self
+
+    def submit(self, images):
+        """为已提交到数据库的 pending 图片排队生成派生图"""
+        upload_folder = self._app.config['UPLOAD_FOLDER']
+        for image in images:
+            if self.mode == 'sync':
+                try:
+                    variants = derive_variants(upload_folder, image.image_url, self.widths)
+                except Exception as e:
+                    self._finish(image.id, None, e)
+                else:
+                    self._finish(image.id, variants)
+                continue
+
+            executor = self._executor.get(self.mode, self.max_workers)
+            future = executor.submit(derive_variants, upload_folder, image.image_url, self.widths)
+            future.add_done_callback(lambda f, image_id=image.id: self._on_done(image_id, f))
+
+    def _on_done(self, image_id, future):
+        error = future.exception()
+        self._finish(image_id, None if error else future.result(), error)
+
+    def _finish(self, image_id, variants, error=None):
+        if error is not None:
+            print(f"图片处理失败 (image_id={image_id}): {error}")
+        values = {'status': 'failed'} if error is not None else {
+            'status': 'ready',
+            'variants': json.dumps(variants)
+        }
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(
+                        InstrumentImage.__table__.update()
+                        .where(InstrumentImage.__table__.c.id == image_id)
+                        .values(**values)
+                    )
+            # 绕过了 ORM 会话，需要手动作废乐器相关的响应缓存
+            response_cache.invalidate('instruments')
+        except Exception as e:
+            print(f"图片处理结果写回失败 (image_id={image_id}): {e}")
+
+
+image_processor = ImageProcessor()
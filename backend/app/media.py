@@ -0,0 +1,84 @@
+"""上传文件的服务
+
+- /static/<path>：后端静态目录（上传文件在 static/uploads 下）。
+  上传文件名里带内容哈希或 uuid（见 utils.save_content_addressed / save_uploaded_file），
+  同名文件内容不会变，直接返回一年期的 immutable 缓存头；其余文件靠 ETag/Last-Modified 回源校验；
+- 前端页面和 css/js 部署在 GitHub Pages，不经过这里；
+- Range 请求（音频拖动进度条）由 send_file 的条件响应处理；
+- 部署在反向代理后面时可以把文件传输交给代理：USE_X_SENDFILE=true（Apache/lighttpd）
+  或 MEDIA_ACCEL_REDIRECT_PREFIX=/protected/（nginx 的 internal location）。
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from flask import send_file, abort, current_app
+from werkzeug.security import safe_join
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# 文件名里的内容哈希（sha256）或 uuid4.hex
+_FINGERPRINT = re.compile(r'[0-9a-f]{32,}')
+
+
+class MediaServer:
+    """静态文件服务"""
+
+    def __init__(self):
+        self.url_prefix = '/static/uploads'
+        self.accel_prefix = None
+
+    def init_app(self, app):
+        self.url_prefix = app.config.get('MEDIA_URL_PREFIX', self.url_prefix).rstrip('/')
+        self.accel_prefix = app.config.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+        app.add_url_rule('/static/<path:filename>', 'static', self.serve_static)
+        app.extensions['media_server'] = self
+
+    # ---------- 地址 ----------
+    def media_url(self, path):
+        """上传文件的公开地址"""
+        return f'{self.url_prefix}/{path}' if path else None
+
+    # ---------- 视图 ----------
+    def serve_static(self, filename):
+        """后端静态文件（含上传文件）"""
+        immutable = filename.startswith('uploads/') \
+            and _FINGERPRINT.search(os.path.basename(filename)) is not None
+        return self.send(current_app.config['STATIC_FOLDER'], filename, immutable)
+
+    def serve_upload(self, filename):
+        """上传文件（兼容旧的 /api/uploads/<path> 地址）"""
+        return self.serve_static(f'uploads/{filename}')
+
+    # ---------- 发送 ----------
+    def send(self, root, filename, immutable=False):
+        path = safe_join(root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if self.accel_prefix:
+            # 交给 nginx 发送文件，Range 和条件请求也由 nginx 处理
+            response = current_app.response_class(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = self._accel_path(root, path)
+        else:
+            # conditional=True 处理 If-None-Match/If-Modified-Since 和 Range；
+            # USE_X_SENDFILE 打开时 send_file 只返回 X-Sendfile 头
+            response = send_file(path, mimetype=mimetype, conditional=True)
+
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else 'no-cache'
+        return response
+
+    def _accel_path(self, root, path):
+        relative = os.path.relpath(path, root).replace(os.sep, '/')
+        # 静态目录在 nginx 中映射到 <prefix>static/
+        return quote(f"{self.accel_prefix.rstrip('/')}/static/{relative}")
+
+
+media_server = MediaServer()
+
+
+def media_url(path):
+    """上传文件的公开地址"""
+    return media_server.media_url(path)
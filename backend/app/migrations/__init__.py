@@ -0,0 +1,105 @@
+"""数据库结构迁移
+
+每个迁移是本目录下的 vNNNN_*.py 模块，定义 VERSION、DESCRIPTION 和 upgrade(conn)。
+已执行的版本记录在 schema_version 表中，启动时只需查询一次当前版本：
+已是最新版本时直接返回，不执行任何 DDL，也不会删除已有数据。
+
+多个 worker 同时启动时，MySQL 上用 GET_LOCK 保证只有一个进程执行迁移。
+手动执行：flask --app run migrate，或 python database.py。
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+
+import sqlalchemy as sa
+
+schema_version = sa.Table(
+    'schema_version', sa.MetaData(),
+    sa.Column('version', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('description', sa.String(200)),
+    sa.Column('applied_at', sa.DateTime)
+)
+
+# MySQL 命名锁的名字和等待秒数
+LOCK_NAME = 'instrument_trading_schema_migration'
+LOCK_TIMEOUT = 60
+
+
+def load_migrations():
+    """按版本号排序的迁移模块"""
+    modules = [
+        importlib.import_module(f'{__name__}.{name}')
+        for _, name, _ in pkgutil.iter_modules(__path__)
+        if name.startswith('v')
+    ]
+    return sorted(modules, key=lambda module: module.VERSION)
+
+
+def current_version(conn):
+    """数据库当前的结构版本，未建 schema_version 表时为 0"""
+    if not sa.inspect(conn).has_table('schema_version'):
+        return 0
+    return conn.execute(sa.select(sa.func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine):
+    """升级到最新版本，返回 (升级前版本, 升级后版本)"""
+    migrations = load_migrations()
+    latest = migrations[-1].VERSION if migrations else 0
+
+    with engine.connect() as conn:
+        start = current_version(conn)
+    if start >= latest:
+        return start, start
+
+    with engine.connect() as conn:
+        locked = conn.dialect.name == 'mysql'
+        if locked:
+            conn.execute(sa.text('SELECT GET_LOCK(:name, :timeout)'), {'name': LOCK_NAME, 'timeout': LOCK_TIMEOUT})
+            conn.commit()
+        try:
+            # 拿到锁后重新读取版本，其他进程可能已经完成了迁移
+            version = current_version(conn)
+            schema_version.create(conn, checkfirst=True)
+            conn.commit()
+            for migration in migrations:
+                if migration.VERSION <= version:
+                    continue
+                migration.upgrade(conn)
+                conn.execute(schema_version.insert().values(
+                    version=migration.VERSION,
+                    description=migration.DESCRIPTION,
+                    applied_at=datetime.utcnow()
+                ))
+                conn.commit()
+                print(f"✅ 数据库结构已升级到版本 {migration.VERSION}: {migration.DESCRIPTION}")
+        finally:
+            if locked:
+                conn.execute(sa.text('SELECT RELEASE_LOCK(:name)'), {'name': LOCK_NAME})
+                conn.commit()
+    return start, latest
+
+
+# ---------- 迁移中常用的辅助函数 ----------
+def has_column(conn, table, column):
+    return column in {c['name'] for c in sa.inspect(conn).get_columns(table)}
+
+
+def add_index(conn, table, name, *columns, unique=False):
+    """表上没有同名索引时创建"""
+    if name in {index['name'] for index in sa.inspect(conn).get_indexes(table)}:
+        return
+    target = sa.Table(table, sa.MetaData(), autoload_with=conn)
+    sa.Index(name, *(target.c[column] for column in columns), unique=unique).create(conn)
+
+
+def add_column(conn, table, column):
+    """表中没有该列时添加（兼容由旧 database.py 建好、已经带有新列的库）"""
+    if has_column(conn, table, column.name):
+        return
+    preparer = conn.dialect.identifier_preparer
+    ddl = f'ALTER TABLE {preparer.quote(table)} ADD COLUMN {preparer.quote(column.name)} ' \
+          f'{column.type.compile(dialect=conn.dialect)}'
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+    conn.execute(sa.text(ddl))
@@ -0,0 +1,141 @@
+"""初始表结构
+
+与原 database.py 的建表语句一致，订单表按模型使用 orders（原建表语句误建为 `order`）。
+已由旧 database.py 建好的库：已有的表保持不动，`order` 表改名为 orders。
+"""
+import sqlalchemy as sa
+
+VERSION = 1
+DESCRIPTION = '初始表结构'
+
+DEFAULT_CATEGORIES = [
+    {'name': '吉他', 'description': '各种类型吉他', 'icon': 'fas fa-guitar'},
+    {'name': '钢琴', 'description': '钢琴及键盘乐器', 'icon': 'fas fa-music'},
+    {'name': '小提琴', 'description': '弦乐器', 'icon': 'fas fa-violin'},
+    {'name': '鼓类', 'description': '打击乐器', 'icon': 'fas fa-drum'},
+    {'name': '管乐器', 'description': '铜管和木管乐器', 'icon': 'fas fa-trumpet'},
+    {'name': '民族乐器', 'description': '中国传统乐器', 'icon': 'fas fa-guitar'},
+    {'name': '其他', 'description': '其他类型乐器', 'icon': 'fas fa-question-circle'},
+]
+
+
+def _timestamps():
+    return [
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.current_timestamp()),
+        sa.Column('updated_at', sa.DateTime, server_default=sa.func.current_timestamp()),
+    ]
+
+
+def upgrade(conn):
+    metadata = sa.MetaData()
+
+    sa.Table(
+        'user', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('username', sa.String(50), unique=True, nullable=False),
+        sa.Column('email', sa.String(100), unique=True, nullable=False),
+        sa.Column('password_hash', sa.String(200), nullable=False),
+        sa.Column('phone', sa.String(20)),
+        sa.Column('real_name', sa.String(50)),
+        sa.Column('student_id', sa.String(20)),
+        sa.Column('avatar', sa.String(200)),
+        sa.Column('role', sa.Enum('user', 'seller', 'admin'), server_default='user'),
+        sa.Column('credit_score', sa.Integer, server_default='100'),
+        sa.Column('is_verified', sa.Boolean, server_default=sa.false()),
+        *_timestamps()
+    )
+
+    category = sa.Table(
+        'category', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.String(50), nullable=False),
+        sa.Column('description', sa.Text),
+        sa.Column('icon', sa.String(100)),
+        sa.Column('sort_order', sa.Integer, server_default='0'),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.current_timestamp())
+    )
+
+    sa.Table(
+        'instrument', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('title', sa.String(100), nullable=False),
+        sa.Column('description', sa.Text),
+        sa.Column('price', sa.Numeric(10, 2), nullable=False),
+        sa.Column('original_price', sa.Numeric(10, 2)),
+        sa.Column('category_id', sa.Integer, sa.ForeignKey('category.id', ondelete='SET NULL')),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id', ondelete='CASCADE')),
+        sa.Column('instrument_condition', sa.Enum('new', 'like_new', 'good', 'fair', 'poor'), server_default='good'),
+        sa.Column('brand', sa.String(50)),
+        sa.Column('model', sa.String(50)),
+        sa.Column('status', sa.Enum('available', 'pending', 'sold', 'removed'), server_default='available'),
+        sa.Column('view_count', sa.Integer, server_default='0'),
+        sa.Column('favorite_count', sa.Integer, server_default='0'),
+        sa.Column('location', sa.String(200)),
+        sa.Column('audio_url', sa.String(200)),
+        *_timestamps(),
+        sa.Index('idx_status_created', 'status', 'created_at'),
+        sa.Index('idx_category_status', 'category_id', 'status'),
+        sa.Index('idx_user_status', 'user_id', 'status')
+    )
+
+    sa.Table(
+        'instrument_image', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('instrument_id', sa.Integer, sa.ForeignKey('instrument.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('image_url', sa.String(200), nullable=False),
+        sa.Column('is_main', sa.Boolean, server_default=sa.false()),
+        sa.Column('sort_order', sa.Integer, server_default='0'),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.current_timestamp())
+    )
+
+    sa.Table(
+        'favorite', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('instrument_id', sa.Integer, sa.ForeignKey('instrument.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.current_timestamp()),
+        sa.UniqueConstraint('user_id', 'instrument_id', name='uk_user_instrument')
+    )
+
+    sa.Table(
+        'orders', metadata,
+        sa.Column('id', sa.String(50), primary_key=True),
+        sa.Column('instrument_id', sa.Integer, sa.ForeignKey('instrument.id'), nullable=False),
+        sa.Column('buyer_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('seller_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('total_price', sa.Numeric(10, 2), nullable=False),
+        sa.Column('status', sa.Enum('pending', 'paid', 'shipped', 'completed', 'cancelled'), server_default='pending'),
+        sa.Column('payment_method', sa.String(50)),
+        sa.Column('meeting_time', sa.DateTime),
+        sa.Column('meeting_place', sa.String(200)),
+        *_timestamps()
+    )
+
+    sa.Table(
+        'cart', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('instrument_id', sa.Integer, sa.ForeignKey('instrument.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('quantity', sa.Integer, server_default='1'),
+        *_timestamps(),
+        sa.UniqueConstraint('user_id', 'instrument_id', name='uk_user_instrument_cart')
+    )
+
+    sa.Table(
+        'view_history', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('instrument_id', sa.Integer, sa.ForeignKey('instrument.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('viewed_at', sa.DateTime, server_default=sa.func.current_timestamp())
+    )
+
+    # 旧 database.py 建的订单表名与模型不一致
+    inspector = sa.inspect(conn)
+    if inspector.has_table('order') and not inspector.has_table('orders'):
+        conn.execute(sa.text(f"ALTER TABLE {conn.dialect.identifier_preparer.quote('order')} RENAME TO orders"))
+
+    # 已存在的表跳过
+    metadata.create_all(conn)
+
+    if not conn.execute(sa.select(sa.func.count()).select_from(category)).scalar():
+        conn.execute(category.insert(), DEFAULT_CATEGORIES)
@@ -0,0 +1,13 @@
+"""图片后台处理状态和派生图"""
+import sqlalchemy as sa
+
+from . import add_column
+
+VERSION = 2
+DESCRIPTION = '乐器图片增加处理状态和派生图列'
+
+
+def upgrade(conn):
+    add_column(conn, 'instrument_image',
+               sa.Column('status', sa.Enum('pending', 'ready', 'failed'), server_default=sa.text("'ready'")))
+    add_column(conn, 'instrument_image', sa.Column('variants', sa.Text))
@@ -0,0 +1,15 @@
+"""试听音频转码和波形"""
+import sqlalchemy as sa
+
+from . import add_column
+
+VERSION = 3
+DESCRIPTION = '乐器增加试听音频处理结果列'
+
+
+def upgrade(conn):
+    add_column(conn, 'instrument', sa.Column('audio_status', sa.Enum('pending', 'ready', 'failed')))
+    add_column(conn, 'instrument', sa.Column('audio_preview_url', sa.String(200)))
+    add_column(conn, 'instrument', sa.Column('audio_peaks_url', sa.String(200)))
+    add_column(conn, 'instrument', sa.Column('audio_duration', sa.Float))
+    add_column(conn, 'instrument', sa.Column('audio_bitrate', sa.Integer))
@@ -0,0 +1,18 @@
+"""按路由实际查询补充索引（见 index_advisor.py）"""
+from . import add_index
+
+VERSION = 4
+DESCRIPTION = '补充查询所需索引'
+
+
+def upgrade(conn):
+    add_index(conn, 'user', 'idx_user_phone', 'phone')
+    add_index(conn, 'user', 'idx_user_created', 'created_at')
+    add_index(conn, 'instrument', 'idx_instrument_created', 'created_at')
+    add_index(conn, 'instrument', 'idx_instrument_updated', 'updated_at')
+    add_index(conn, 'instrument_image', 'idx_image_instrument_main', 'instrument_id', 'is_main', 'sort_order')
+    add_index(conn, 'view_history', 'idx_view_history_user', 'user_id', 'viewed_at')
+    add_index(conn, 'orders', 'idx_orders_buyer', 'buyer_id', 'created_at')
+    add_index(conn, 'orders', 'idx_orders_seller', 'seller_id', 'created_at')
+    add_index(conn, 'orders', 'idx_orders_created', 'created_at')
+    add_index(conn, 'orders', 'idx_orders_status', 'status')
@@ -0,0 +1,9 @@
+"""分面计数的覆盖索引"""
+from . import add_index
+
+VERSION = 5
+DESCRIPTION = '分面计数覆盖索引'
+
+
+def upgrade(conn):
+    add_index(conn, 'instrument', 'idx_status_facets', 'status', 'category_id', 'instrument_condition', 'price')
@@ -0,0 +1,32 @@
+"""手机号唯一索引：注册直接插入，由唯一约束判重"""
+import sqlalchemy as sa
+
+from . import add_index
+
+VERSION = 6
+DESCRIPTION = '手机号唯一索引'
+
+
+def upgrade(conn):
+    user = sa.Table('user', sa.MetaData(), autoload_with=conn)
+    # 空字符串与 NULL 同义，统一成 NULL，唯一索引不限制 NULL
+    conn.execute(user.update().where(user.c.phone == '').values(phone=None))
+
+    # 旧版修改资料时不检查手机号重复：保留最早注册的账号，其余账号的手机号清空
+    duplicates = conn.execute(
+        sa.select(user.c.phone, sa.func.min(user.c.id))
+        .where(user.c.phone.is_not(None))
+        .group_by(user.c.phone)
+        .having(sa.func.count() > 1)
+    ).all()
+    for phone, keep_id in duplicates:
+        cleared = conn.execute(
+            sa.select(user.c.id).where(user.c.phone == phone, user.c.id != keep_id)
+        ).scalars().all()
+        conn.execute(user.update().where(user.c.id.in_(cleared)).values(phone=None))
+        # 日志里不写手机号本身
+        print(f"⚠️ 用户 {[keep_id] + cleared} 使用同一手机号，保留用户 {keep_id}，已清空用户 {cleared} 的手机号")
+
+    if 'idx_user_phone' in {index['name'] for index in sa.inspect(conn).get_indexes('user')}:
+        sa.Index('idx_user_phone', user.c.phone).drop(conn)
+    add_index(conn, 'user', 'uq_user_phone', 'phone', unique=True)
@@ -0,0 +1,31 @@
+"""仪表板按天统计表（见 rollups.py），建表后按历史数据回填"""
+import sqlalchemy as sa
+
+from . import add_index
+
+VERSION = 7
+DESCRIPTION = '仪表板按天统计表'
+
+
+def upgrade(conn):
+    from ..rollups import rebuild
+
+    table = sa.Table(
+        'daily_stat', sa.MetaData(),
+        sa.Column('day', sa.Date, primary_key=True),
+        sa.Column('new_users', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('new_instruments', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('new_orders', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('completed_orders', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('completed_sales', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime)
+    )
+    table.create(conn, checkfirst=True)
+
+    # 对账按完成时间统计已完成订单：(status, updated_at) 取代只有 status 的索引
+    add_index(conn, 'orders', 'idx_orders_status_updated', 'status', 'updated_at')
+    if 'idx_orders_status' in {index['name'] for index in sa.inspect(conn).get_indexes('orders')}:
+        orders = sa.Table('orders', sa.MetaData(), autoload_with=conn)
+        sa.Index('idx_orders_status', orders.c.status).drop(conn)
+
+    rebuild(conn)
@@ -0,0 +1,18 @@
+"""令牌吊销信息入库（见 tokens.py），多 worker 共享"""
+import sqlalchemy as sa
+
+from . import add_column, add_index
+
+VERSION = 8
+DESCRIPTION = '令牌吊销表和用户令牌版本'
+
+
+def upgrade(conn):
+    add_column(conn, 'user', sa.Column('token_version', sa.Integer, server_default='0'))
+    table = sa.Table(
+        'revoked_token', sa.MetaData(),
+        sa.Column('jti', sa.String(32), primary_key=True),
+        sa.Column('expires_at', sa.DateTime, nullable=False)
+    )
+    table.create(conn, checkfirst=True)
+    add_index(conn, 'revoked_token', 'idx_revoked_token_expires', 'expires_at')
@@ -1,10 +1,15 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
 import uuid
 
-db = SQLAlchemy()
+from .media import media_url
+from .db_routing import RoutingSession
+from .passwords import password_hasher
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     """用户模型"""
@@ -21,6 +26,7 @@ class User(UserMixin, db.Model):
     role = db.Column(db.Enum('user', 'seller', 'admin'), default='user')
     credit_score = db.Column(db.Integer, default=100)
     is_verified = db.Column(db.Boolean, default=False)
+    token_version = db.Column(db.Integer, default=0, server_default='0')  # 密码、角色、验证状态变化时加一，旧令牌作废
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -31,18 +37,23 @@ class User(UserMixin, db.Model):
     orders_as_seller = db.relationship('Order', foreign_keys='Order.seller_id', backref='seller', lazy='dynamic')
     cart_items = db.relationship('Cart', backref='user', lazy='dynamic')
     
+    __table_args__ = (
+        db.Index('uq_user_phone', 'phone', unique=True),  # 手机号登录，注册时由唯一约束判重
+        db.Index('idx_user_created', 'created_at'),  # 仪表板今日新增
+    )
+    
     def set_password(self, password):
-        """设置密码"""
-        self.password_hash = generate_password_hash(password)
+        """设置密码（在密码哈希池中计算）"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """验证密码"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def get_avatar_url(self):
         """获取头像URL"""
         if self.avatar:
-            return f'/static/uploads/{self.avatar}'
+            return media_url(self.avatar)
         return '/static/images/default-avatar.png'
     
     @property
@@ -95,6 +106,11 @@ class Instrument(db.Model):
     favorite_count = db.Column(db.Integer, default=0)
     location = db.Column(db.String(200))
     audio_url = db.Column(db.String(200))
+    audio_status = db.Column(db.Enum('pending', 'ready', 'failed'))
+    audio_preview_url = db.Column(db.String(200))  # 转码后的试听文件
+    audio_peaks_url = db.Column(db.String(200))  # 波形峰值 JSON
+    audio_duration = db.Column(db.Float)  # 秒
+    audio_bitrate = db.Column(db.Integer)  # kbps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -102,8 +118,28 @@ class Instrument(db.Model):
     images = db.relationship('InstrumentImage', backref='instrument', lazy='dynamic', cascade='all, delete-orphan')
     favorites = db.relationship('Favorite', backref='instrument', lazy='dynamic')
     
-    def to_dict(self, include_user=True, include_images=True):
-        """转换为字典"""
+    __table_args__ = (
+        db.Index('idx_status_created', 'status', 'created_at'),
+        db.Index('idx_category_status', 'category_id', 'status'),
+        db.Index('idx_user_status', 'user_id', 'status'),
+        db.Index('idx_instrument_created', 'created_at'),  # 仪表板今日新增
+        db.Index('idx_instrument_updated', 'updated_at'),  # 搜索索引增量刷新
+        db.Index('idx_status_facets', 'status', 'category_id', 'instrument_condition', 'price'),  # 分面计数只扫索引
+    )
+    
+    def to_dict(self, include_user=True, include_images=True, related=None):
+        """转换为字典
+
+        related 为 serialize_instruments 预加载好的 (分类, 卖家, 图片列表)，
+        不传时按需懒加载。
+        """
+        if related is None:
+            category = self.category_ref
+            owner = self.owner if include_user else None
+            images = self.images.order_by(InstrumentImage.is_main.desc(), InstrumentImage.sort_order).all() if include_images else []
+        else:
+            category, owner, images = related
+        
         data = {
             'id': self.id,
             'title': self.title,
@@ -118,31 +154,42 @@ class Instrument(db.Model):
             'view_count': self.view_count,
             'favorite_count': self.favorite_count,
             'location': self.location,
-            'audio_url': self.audio_url,
+            'audio_url': media_url(self.audio_url),
+            'audio_status': self.audio_status,
+            'audio_preview_url': media_url(self.audio_preview_url),
+            'audio_peaks_url': media_url(self.audio_peaks_url),
+            'audio_duration': self.audio_duration,
+            'audio_bitrate': self.audio_bitrate,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'category_name': self.category_ref.name if self.category_ref else None
+            'category_name': category.name if category else None
         }
         
-        if include_user and self.owner:
+        if include_user and owner:
             data['user'] = {
-                'id': self.owner.id,
-                'username': self.owner.username,
-                'real_name': self.owner.real_name,
-                'avatar': self.owner.get_avatar_url(),
-                'credit_score': self.owner.credit_score
+                'id': owner.id,
+                'username': owner.username,
+                'real_name': owner.real_name,
+                'avatar': owner.get_avatar_url(),
+                'credit_score': owner.credit_score
             }
         
         if include_images:
-            data['images'] = [img.to_dict() for img in self.images.order_by(InstrumentImage.is_main.desc(), InstrumentImage.sort_order).all()]
-            main_image = self.images.filter_by(is_main=True).first()
+            data['images'] = [img.to_dict() for img in images]
+            main_image = next((img for img in images if img.is_main), None)
             data['main_image'] = main_image.image_url if main_image else None
+            main_image_data = data['images'][images.index(main_image)] if main_image else None
+            data['main_image_thumb'] = main_image_data['thumb_url'] if main_image_data else None
+            data['main_image_srcset'] = main_image_data['srcset'] if main_image_data else None
+            data['main_image_srcset_webp'] = main_image_data['srcset_webp'] if main_image_data else None
         
         return data
     
     def increment_view_count(self):
-        """增加浏览次数"""
-        self.view_count += 1
-        db.session.commit()
+        """增加浏览次数（写入缓冲，由 view_counter 批量原子落库）"""
+        from .view_counter import view_counter
+        from .ranking import hot_ranking
+        view_counter.increment(self.id)
+        hot_ranking.record_view(self.id)
 
 class InstrumentImage(db.Model):
     """乐器图片模型"""
@@ -153,16 +200,73 @@ class InstrumentImage(db.Model):
     image_url = db.Column(db.String(200), nullable=False)
     is_main = db.Column(db.Boolean, default=False)
     sort_order = db.Column(db.Integer, default=0)
+    status = db.Column(db.Enum('pending', 'ready', 'failed'), default='ready')
+    variants = db.Column(db.Text)  # JSON：{宽度: {'src': 路径, 'webp': 路径}}，由 image_pipeline 写入
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # 按乐器取图片，主图在前
+        db.Index('idx_image_instrument_main', 'instrument_id', 'is_main', 'sort_order'),
+    )
+    
     def to_dict(self):
+        variants = json.loads(self.variants) if self.variants else {}
+        widths = sorted(int(width) for width in variants)
+        full_url = media_url(self.image_url)
+        
+        # 列表卡片用不小于 IMAGE_THUMB_WIDTH 的最窄一档，派生图未就绪时退回原图
+        thumb_width = current_app.config.get('IMAGE_THUMB_WIDTH', 320)
+        thumb = next((w for w in widths if w >= thumb_width), widths[-1] if widths else None)
+        
         return {
             'id': self.id,
             'image_url': self.image_url,
             'is_main': self.is_main,
-            'full_url': f'/static/uploads/{self.image_url}'
+            'full_url': full_url,
+            'status': self.status,
+            'thumb_url': media_url(variants[str(thumb)]['src']) if thumb else full_url,
+            'srcset': ', '.join(f"{media_url(variants[str(w)]['src'])} {w}w" for w in widths),
+            'srcset_webp': ', '.join(f"{media_url(variants[str(w)]['webp'])} {w}w" for w in widths)
         }
 
+def serialize_instruments(instruments, include_user=True, include_images=True):
+    """批量序列化乐器
+
+    分类、卖家、图片各用一次 IN 查询加载，列表接口的查询数不再随条数增长。
+    """
+    instruments = list(instruments)
+    if not instruments:
+        return []
+    
+    category_ids = {inst.category_id for inst in instruments if inst.category_id}
+    categories = {}
+    if category_ids:
+        categories = {c.id: c for c in Category.query.filter(Category.id.in_(category_ids)).all()}
+    
+    owners = {}
+    if include_user:
+        user_ids = {inst.user_id for inst in instruments}
+        owners = {u.id: u for u in User.query.filter(User.id.in_(user_ids)).all()}
+    
+    images = {inst.id: [] for inst in instruments}
+    if include_images:
+        rows = InstrumentImage.query.filter(
+            InstrumentImage.instrument_id.in_(images.keys())
+        ).order_by(
+            InstrumentImage.instrument_id, InstrumentImage.is_main.desc(), InstrumentImage.sort_order
+        ).all()
+        for img in rows:
+            images[img.instrument_id].append(img)
+    
+    return [
+        inst.to_dict(
+            include_user=include_user,
+            include_images=include_images,
+            related=(categories.get(inst.category_id), owners.get(inst.user_id), images[inst.id])
+        )
+        for inst in instruments
+    ]
+
 class Favorite(db.Model):
     """收藏模型"""
     __tablename__ = 'favorite'
@@ -202,6 +306,19 @@ class Cart(db.Model):
             'instrument': self.instrument.to_dict() if self.instrument else None
         }
 
+class ViewHistory(db.Model):
+    """浏览历史模型"""
+    __tablename__ = 'view_history'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    instrument_id = db.Column(db.Integer, db.ForeignKey('instrument.id'), nullable=False)
+    viewed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_view_history_user', 'user_id', 'viewed_at'),
+    )
+
 class Order(db.Model):
     """订单模型"""
     __tablename__ = 'orders'
@@ -221,7 +338,16 @@ class Order(db.Model):
     # 关系
     instrument = db.relationship('Instrument', backref='orders')
     
-    def to_dict(self):
+    __table_args__ = (
+        db.Index('idx_orders_buyer', 'buyer_id', 'created_at'),
+        db.Index('idx_orders_seller', 'seller_id', 'created_at'),
+        db.Index('idx_orders_created', 'created_at'),  # 仪表板今日新增
+        db.Index('idx_orders_status_updated', 'status', 'updated_at'),  # 按天汇总已完成订单（rollups.py）
+    )
+    
+    def to_dict(self, instrument_data=None):
+        if instrument_data is None and self.instrument:
+            instrument_data = self.instrument.to_dict()
         return {
             'id': self.id,
             'instrument_id': self.instrument_id,
@@ -233,5 +359,28 @@ class Order(db.Model):
             'meeting_time': self.meeting_time.isoformat() if self.meeting_time else None,
             'meeting_place': self.meeting_place,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'instrument': self.instrument.to_dict() if self.instrument else None
-        }
\ No newline at end of file
+            'instrument': instrument_data
+        }
+
+class DailyStat(db.Model):
+    """按天汇总的统计（UTC 日期），由 rollups.py 维护"""
+    __tablename__ = 'daily_stat'
+    
+    day = db.Column(db.Date, primary_key=True)
+    new_users = db.Column(db.Integer, nullable=False, default=0)
+    new_instruments = db.Column(db.Integer, nullable=False, default=0)
+    new_orders = db.Column(db.Integer, nullable=False, default=0)
+    completed_orders = db.Column(db.Integer, nullable=False, default=0)  # 当天完成的订单
+    completed_sales = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # 当天完成订单的金额
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RevokedToken(db.Model):
+    """已吊销、尚未过期的令牌（登出、刷新令牌轮换），由 tokens.py 维护"""
+    __tablename__ = 'revoked_token'
+    
+    jti = db.Column(db.String(32), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('idx_revoked_token_expires', 'expires_at'),  # 清理过期条目
+    )
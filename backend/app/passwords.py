@@ -0,0 +1,104 @@
+"""密码哈希服务
+
+注册、登录、改密码都要算一次慢哈希，开学时集中注册/登录会占满 CPU，拖慢同一 worker 上的其他请求。
+这里把哈希计算放进有界的线程池或进程池：
+- PASSWORD_HASH_ALGORITHM 选择算法：bcrypt（默认，代价由 PASSWORD_BCRYPT_ROUNDS 控制，默认 10 不比原来的 scrypt 慢），
+  或 Werkzeug 支持的 scrypt、pbkdf2:sha256:<迭代次数>；
+- 同时计算的哈希不超过 PASSWORD_HASH_WORKERS 个，排队的也有上限（PASSWORD_HASH_QUEUE），
+  等待超过 PASSWORD_HASH_WAIT 秒直接报忙（登录接口返回 503），不会把整个 worker 的线程都压在哈希上；
+  bcrypt 和 hashlib 计算时释放 GIL，线程池（默认）即可并行，process 模式改用进程池，sync 在请求线程内计算；
+- 校验同时兼容旧的 Werkzeug 哈希；开启 PASSWORD_REHASH_ON_LOGIN 后，登录成功时如果算法或代价与当前配置不同，
+  用明文重新哈希并保存（每次升级多算一次哈希，默认关闭）。
+"""
+import os
+import threading
+
+import bcrypt
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from .workers import ProcessLocalExecutor
+
+# bcrypt 只使用前 72 字节，超出部分显式截断（bcrypt 5 起超长会直接报错）
+BCRYPT_MAX_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    """哈希队列已满"""
+
+
+def _is_bcrypt(password_hash):
+    return password_hash.startswith(('$2a$', '$2b$', '$2y$'))
+
+
+def hash_password(password, algorithm='bcrypt', rounds=10):
+    """计算密码哈希（在工作线程或进程中执行）"""
+    if algorithm == 'bcrypt':
+        salt = bcrypt.gensalt(rounds)
+        return bcrypt.hashpw(password.encode('utf-8')[:BCRYPT_MAX_BYTES], salt).decode('ascii')
+    return generate_password_hash(password, method=algorithm)
+
+
+def verify_password(password_hash, password):
+    """校验密码，bcrypt 和 Werkzeug 格式的哈希都支持（在工作线程或进程中执行）"""
+    if _is_bcrypt(password_hash):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8')[:BCRYPT_MAX_BYTES], password_hash.encode('ascii'))
+        except ValueError:
+            return False
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """有界的密码哈希执行器"""
+
+    def __init__(self):
+        self._executor = ProcessLocalExecutor()
+        self.algorithm = 'bcrypt'
+        self.rounds = 10
+        self.rehash_on_login = False
+        self.mode = 'thread'
+        self.max_workers = os.cpu_count() or 1
+        self.wait = 5
+        self._slots = threading.BoundedSemaphore(self.max_workers * 4)
+
+    def init_app(self, app):
+        self.algorithm = app.config.get('PASSWORD_HASH_ALGORITHM', 'bcrypt')
+        self.rounds = app.config.get('PASSWORD_BCRYPT_ROUNDS', 10)
+        self.rehash_on_login = app.config.get('PASSWORD_REHASH_ON_LOGIN', False)
+        self.mode = app.config.get('PASSWORD_HASH_MODE', 'thread')
+        self.max_workers = app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+        self.wait = app.config.get('PASSWORD_HASH_WAIT', 5)
+        # 计算中 + 排队中的任务总数上限
+        self._slots = threading.BoundedSemaphore(self.max_workers + app.config.get('PASSWORD_HASH_QUEUE', 32))
+        self._executor.reset()
+        app.extensions['password_hasher'] = self
+
+    def _run(self, func, *args):
+        if self.mode == 'sync':
+            return func(*args)
+        slots = self._slots
+        if not slots.acquire(timeout=self.wait):
+            raise PasswordHasherBusy('登录请求过多，请稍后重试')
+        try:
+            return self._executor.get(self.mode, self.max_workers).submit(func, *args).result()
+        finally:
+            slots.release()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.algorithm, self.rounds)
+
+    def verify(self, password_hash, password):
+        return self._run(verify_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """哈希的算法或代价与当前配置不同"""
+        if self.algorithm == 'bcrypt':
+            if not _is_bcrypt(password_hash):
+                return True
+            return int(password_hash.split('$')[2]) != self.rounds
+        # Werkzeug 格式为 “方法:参数$盐$哈希”，方法部分需与配置一致
+        method = password_hash.split('$', 1)[0]
+        return not (method == self.algorithm or method.startswith(self.algorithm + ':'))
+
+
+password_hasher = PasswordHasher()
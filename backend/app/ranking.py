@@ -0,0 +1,146 @@
+"""热门乐器排行
+
+在内存中维护最近 HOT_RANKING_WINDOW_DAYS 天内在售乐器的热度榜：
+- 每隔 HOT_RANKING_REFRESH_INTERVAL 秒从数据库全量刷新一次，同一时间只有一个请求刷新，
+  其他请求直接返回刷新前的榜单；
+- 两次刷新之间由浏览、收藏事件增量更新；
+- 乐器离开 available 状态（下单、售出、下架）时立即移出榜单。
+
+热度按时间衰减（类 Hacker News 公式）：
+    score = (浏览数 + 收藏数 * HOT_RANKING_FAVORITE_WEIGHT + 1) / (发布小时数 + 2) ** HOT_RANKING_GRAVITY
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import attributes
+
+from .models import db, Instrument
+
+
+class HotRanking:
+    """热门排行榜"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # 刷新时持有，不与读榜单共用锁
+        self._refresh_lock = threading.Lock()
+        self._entries = {}
+        self._ranked = []
+        self._dirty = False
+        self._loaded = False
+        self._last_refresh = 0.0
+        self.refresh_interval = 60
+        self.window_days = 7
+        self.gravity = 1.5
+        self.favorite_weight = 2
+        self.size = 100
+
+    def init_app(self, app):
+        self.refresh_interval = app.config.get('HOT_RANKING_REFRESH_INTERVAL', 60)
+        self.window_days = app.config.get('HOT_RANKING_WINDOW_DAYS', 7)
+        self.gravity = app.config.get('HOT_RANKING_GRAVITY', 1.5)
+        self.favorite_weight = app.config.get('HOT_RANKING_FAVORITE_WEIGHT', 2)
+        self.size = app.config.get('HOT_RANKING_SIZE', 100)
+        app.extensions['hot_ranking'] = self
+
+    def score(self, view_count, favorite_count, created_at, now=None):
+        """计算热度"""
+        now = now or datetime.utcnow()
+        age_hours = max((now - created_at).total_seconds() / 3600, 0) if created_at else 0
+        points = (view_count or 0) + (favorite_count or 0) * self.favorite_weight + 1
+        return points / (age_hours + 2) ** self.gravity
+
+    def refresh(self):
+        """从数据库重建候选集"""
+        since = datetime.utcnow() - timedelta(days=self.window_days)
+        rows = db.session.query(
+            Instrument.id, Instrument.view_count, Instrument.favorite_count, Instrument.created_at
+        ).filter(
+            Instrument.status == 'available',
+            Instrument.created_at >= since
+        ).all()
+        with self._lock:
+            self._entries = {
+                row.id: [row.view_count or 0, row.favorite_count or 0, row.created_at]
+                for row in rows
+            }
+            self._dirty = True
+            self._loaded = True
+            self._last_refresh = time.monotonic()
+
+    def top(self, limit):
+        """返回热度最高的乐器ID列表"""
+        if not self._loaded:
+            # 首次加载没有旧榜单可返回，并发请求等同一次加载
+            with self._refresh_lock:
+                if not self._loaded:
+                    self.refresh()
+        elif time.monotonic() - self._last_refresh >= self.refresh_interval \
+                and self._refresh_lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            finally:
+                self._refresh_lock.release()
+        with self._lock:
+            if self._dirty:
+                now = datetime.utcnow()
+                since = now - timedelta(days=self.window_days)
+                ranked = sorted(
+                    (
+                        (self.score(views, favorites, created_at, now), instrument_id)
+                        for instrument_id, (views, favorites, created_at) in self._entries.items()
+                        if created_at is None or created_at >= since
+                    ),
+                    reverse=True
+                )
+                self._ranked = [instrument_id for _, instrument_id in ranked[:self.size]]
+                self._dirty = False
+            return self._ranked[:limit]
+
+    def record_view(self, instrument_id, amount=1):
+        with self._lock:
+            entry = self._entries.get(instrument_id)
+            if entry is not None:
+                entry[0] += amount
+                self._dirty = True
+
+    def record_favorite(self, instrument_id, delta):
+        with self._lock:
+            entry = self._entries.get(instrument_id)
+            if entry is not None:
+                entry[1] = max(0, entry[1] + delta)
+                self._dirty = True
+
+    def remove(self, instrument_id):
+        with self._lock:
+            if self._entries.pop(instrument_id, None) is not None:
+                self._dirty = True
+
+
+hot_ranking = HotRanking()
+
+
+# ---------- 乐器离开在售状态时立即移出榜单 ----------
+@event.listens_for(db.session, 'after_flush')
+def _collect_unavailable(session, flush_context):
+    removed = session.info.setdefault('hot_ranking_removed', set())
+    for obj in session.dirty:
+        if isinstance(obj, Instrument) and obj.status != 'available' \
+                and attributes.get_history(obj, 'status').has_changes():
+            removed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Instrument):
+            removed.add(obj.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_unavailable(session):
+    for instrument_id in session.info.pop('hot_ranking_removed', ()):
+        hot_ranking.remove(instrument_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_unavailable(session):
+    session.info.pop('hot_ranking_removed', None)
@@ -0,0 +1,286 @@
+"""仪表板统计的按天汇总
+
+仪表板原来每次加载都对 user、instrument、orders 做全表 COUNT 和 SUM，耗时随数据量增长。
+这里在 daily_stat 表中按 UTC 日期维护计数，仪表板和 GET /api/statistics/timeseries 只读这张表
+（每天一行），与原始表的大小无关：
+- 新增用户、乐器、订单按 created_at 计入当天，已完成订单数和金额计入完成当天；
+- 增量：会话 flush 时收集新增/删除的用户、乐器、订单和变为 completed 的订单，
+  事务提交后一次性累加到 daily_stat，回滚则丢弃；
+- 对账：后台线程每隔 ROLLUP_RECONCILE_INTERVAL 秒按原始表重算最近 ROLLUP_RECONCILE_DAYS 天，
+  修正增量漏记（进程崩溃、绕过 ORM 的批量写入、与对账同时提交的累加）；
+  更早的数据用 flask --app run rebuild-rollups 按全部历史重建（迁移 v0007 建表时已回填一次）。
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from time import sleep
+
+from sqlalchemy import bindparam, case, event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import attributes
+
+from .models import db, User, Instrument, Order, DailyStat
+from .workers import ProcessLocalThread
+
+METRICS = ('new_users', 'new_instruments', 'new_orders', 'completed_orders', 'completed_sales')
+GRANULARITIES = ('day', 'week', 'month')
+# 时间序列最长跨度（天）
+MAX_RANGE_DAYS = 3660
+
+# 按 created_at 计数的模型 -> 指标
+CREATED_METRICS = {User: 'new_users', Instrument: 'new_instruments', Order: 'new_orders'}
+
+
+def _as_date(value):
+    # func.date() 在 SQLite 上返回字符串，在 MySQL 上返回 date
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _between(column, start, end):
+    """[start, end] 这些天的范围条件，直接比较列，能用上索引"""
+    criteria = []
+    if start is not None:
+        criteria.append(column >= datetime.combine(start, time.min))
+    if end is not None:
+        criteria.append(column < datetime.combine(end + timedelta(days=1), time.min))
+    return criteria
+
+
+def daily_counts(conn, start=None, end=None):
+    """按原始表统计 [start, end] 每天的指标，返回 {日期: Counter}；不给范围时统计全部历史"""
+    counts = defaultdict(Counter)
+    for model, metric in CREATED_METRICS.items():
+        created_at = model.__table__.c.created_at
+        day = func.date(created_at)
+        rows = conn.execute(
+            select(day, func.count())
+            .where(created_at.is_not(None), *_between(created_at, start, end))
+            .group_by(day)
+        )
+        for value, count in rows:
+            counts[_as_date(value)][metric] = count
+
+    # 完成是订单的终态，之后不再修改，updated_at 即完成时间
+    orders = Order.__table__
+    day = func.date(orders.c.updated_at)
+    rows = conn.execute(
+        select(day, func.count(), func.sum(orders.c.total_price))
+        .where(orders.c.status == 'completed', orders.c.updated_at.is_not(None),
+               *_between(orders.c.updated_at, start, end))
+        .group_by(day)
+    )
+    for value, count, sales in rows:
+        counts[_as_date(value)]['completed_orders'] = count
+        counts[_as_date(value)]['completed_sales'] = Decimal(str(sales or 0))
+    return counts
+
+
+def write_days(conn, values, accumulate):
+    """把 {日期: Counter} 写入 daily_stat，accumulate 为真时在原值上累加，否则覆盖"""
+    if not values:
+        return
+    table = DailyStat.__table__
+    now = datetime.utcnow()
+    existing = {_as_date(day) for day in conn.execute(
+        select(table.c.day).where(table.c.day.in_(list(values)))
+    ).scalars()}
+
+    def assignments():
+        return {
+            metric: table.c[metric] + bindparam(f'v_{metric}') if accumulate else bindparam(f'v_{metric}')
+            for metric in METRICS
+        }
+
+    def params(day, counter):
+        return dict({f'v_{metric}': counter.get(metric, 0) for metric in METRICS}, v_day=day)
+
+    update = table.update().where(table.c.day == bindparam('v_day')).values(updated_at=now, **assignments())
+    updates = [params(day, counter) for day, counter in values.items() if day in existing]
+    if updates:
+        conn.execute(update, updates)
+
+    inserts = [
+        dict({metric: counter.get(metric, 0) for metric in METRICS}, day=day, updated_at=now)
+        for day, counter in values.items() if day not in existing
+    ]
+    if not inserts:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(table.insert(), inserts)
+    except IntegrityError:
+        # 其他进程刚插入了其中某天，逐行重试，已存在的改为更新
+        for row in inserts:
+            try:
+                with conn.begin_nested():
+                    conn.execute(table.insert(), row)
+            except IntegrityError:
+                conn.execute(update, params(row['day'], row))
+
+
+def rebuild(conn):
+    """按全部历史重建 daily_stat，返回天数"""
+    counts = daily_counts(conn)
+    conn.execute(DailyStat.__table__.delete())
+    write_days(conn, counts, accumulate=False)
+    return len(counts)
+
+
+def _bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return day + timedelta(days=1)
+
+
+class DailyRollup:
+    """daily_stat 的读取和定期对账"""
+
+    def __init__(self):
+        self._worker = ProcessLocalThread(self._run, 'daily-rollup')
+        self._app = None
+        self.reconcile_interval = 600
+        self.reconcile_days = 2
+
+    def init_app(self, app):
+        self._app = app
+        self.reconcile_interval = app.config.get('ROLLUP_RECONCILE_INTERVAL', 600)
+        self.reconcile_days = app.config.get('ROLLUP_RECONCILE_DAYS', 2)
+        app.extensions['daily_rollup'] = self
+
+    # ---------- 写入 ----------
+    def add(self, deltas):
+        """事务提交后累加增量，失败时留给对账修正"""
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as conn:
+                    write_days(conn, deltas, accumulate=True)
+        except Exception as e:
+            print(f"按天统计累加失败（等待对账修正）: {e}")
+        self._ensure_worker()
+
+    def reconcile(self, days=None):
+        """按原始表重算最近 days 天（含今天），返回重算的天数"""
+        days = days or self.reconcile_days
+        end = datetime.utcnow().date()
+        start = end - timedelta(days=days - 1)
+        with self._app.app_context():
+            with db.engine.begin() as conn:
+                counts = daily_counts(conn, start, end)
+                # 没有数据的日期也写入 0，覆盖多记的增量
+                write_days(conn, {start + timedelta(days=i): counts.get(start + timedelta(days=i), Counter())
+                                  for i in range(days)}, accumulate=False)
+        return days
+
+    def _ensure_worker(self):
+        # 不对账时不启动线程
+        if self.reconcile_interval:
+            self._worker.ensure()
+
+    def _run(self):
+        while True:
+            sleep(self.reconcile_interval)
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"按天统计对账失败: {e}")
+
+    # ---------- 读取 ----------
+    def totals(self, today=None):
+        """全部历史的合计和今天的值，返回 (合计, 今天)，一条查询"""
+        self._ensure_worker()
+        today = today or datetime.utcnow().date()
+        table = DailyStat.__table__
+        columns = [func.coalesce(func.sum(table.c[metric]), 0) for metric in METRICS]
+        columns += [func.coalesce(func.sum(case((table.c.day == today, table.c[metric]), else_=0)), 0)
+                    for metric in METRICS]
+        row = db.session.execute(select(*columns)).one()
+
+        def convert(values):
+            # MySQL 的 SUM 对整数列也返回 Decimal，计数统一转回 int
+            return {metric: Decimal(str(value)) if metric == 'completed_sales' else int(value)
+                    for metric, value in zip(METRICS, values)}
+
+        return convert(row[:len(METRICS)]), convert(row[len(METRICS):])
+
+    def series(self, start, end, granularity='day'):
+        """[start, end] 按天/周/月的指标序列，没有数据的区间补 0；每个区间以起始日期标识"""
+        self._ensure_worker()
+        table = DailyStat.__table__
+        buckets = {}
+        bucket = _bucket_start(start, granularity)
+        while bucket <= end:
+            buckets[bucket] = Counter()
+            bucket = _next_bucket(bucket, granularity)
+
+        rows = db.session.execute(
+            select(table.c.day, *(table.c[metric] for metric in METRICS))
+            .where(table.c.day >= start, table.c.day <= end)
+        )
+        for row in rows:
+            buckets[_bucket_start(_as_date(row[0]), granularity)].update(dict(zip(METRICS, row[1:])))
+
+        return [
+            dict({metric: counter.get(metric, 0) for metric in METRICS if metric != 'completed_sales'},
+                 date=bucket.isoformat(), completed_sales=float(counter.get('completed_sales', 0)))
+            for bucket, counter in buckets.items()
+        ]
+
+
+daily_rollup = DailyRollup()
+
+
+# ---------- 领域写入的增量 ----------
+def _add_completed(deltas, order, sign):
+    deltas['completed_orders'] += sign
+    deltas['completed_sales'] += sign * Decimal(str(order.total_price or 0))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_deltas(session, flush_context):
+    deltas = session.info.setdefault('rollup_deltas', defaultdict(Counter))
+    today = datetime.utcnow().date()
+    for obj in session.new:
+        metric = CREATED_METRICS.get(type(obj))
+        if metric is not None and obj.created_at is not None:
+            deltas[obj.created_at.date()][metric] += 1
+        if isinstance(obj, Order) and obj.status == 'completed':
+            _add_completed(deltas[today], obj, 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            history = attributes.get_history(obj, 'status')
+            if 'completed' in history.added and 'completed' not in history.deleted:
+                _add_completed(deltas[today], obj, 1)
+
+    for obj in session.deleted:
+        metric = CREATED_METRICS.get(type(obj))
+        if metric is not None and obj.created_at is not None:
+            deltas[obj.created_at.date()][metric] -= 1
+        if isinstance(obj, Order) and obj.status == 'completed' and obj.updated_at is not None:
+            _add_completed(deltas[obj.updated_at.date()], obj, -1)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_deltas(session):
+    deltas = session.info.pop('rollup_deltas', None)
+    if deltas:
+        daily_rollup.add(deltas)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_deltas(session):
+    session.info.pop('rollup_deltas', None)
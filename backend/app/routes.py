@@ -1,14 +1,62 @@
-from flask import Blueprint, request, jsonify, render_template, send_from_directory
+from flask import Blueprint, request, jsonify, render_template, current_app
+from flask_mail import Message
 from flask_login import login_required, current_user
-from sqlalchemy import desc, asc, or_
-from datetime import datetime, timedelta
+from sqlalchemy import desc, asc, case, text
+from sqlalchemy.orm import joinedload
+from datetime import date, datetime, timedelta
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 
-from . import db
-from .models import User, Category, Instrument, InstrumentImage, Favorite, Cart, Order
-from .utils import save_uploaded_file, allowed_file
+from . import db, mail
+from .models import User, Category, Instrument, InstrumentImage, Favorite, Cart, Order, serialize_instruments
+from .search import search_index
+from .view_counter import view_counter
+from .view_history import view_history
+from .ranking import hot_ranking
+from .cache import response_cache
+from .user_cache import user_cache
+from .etag import instruments_etag, value_etag, json_with_etag, add_conditional_headers
+from .image_pipeline import image_processor
+from .audio_pipeline import audio_processor
+from .chunked_upload import chunked_uploads, UploadError
+from .media import media_server
+from .db_pool import pool_monitor
+from .facets import build_filters, facet_counts
+from .rollups import daily_rollup, GRANULARITIES, MAX_RANGE_DAYS
+from .utils import save_uploaded_file, save_content_addressed, allowed_file, keyset_paginate, encode_cursor, decode_cursor
 
 main_bp = Blueprint('main', __name__)
+main_bp.after_request(add_conditional_headers)
+
+# 列表接口允许的排序字段
+INSTRUMENT_SORT_COLUMNS = set(Instrument.__table__.columns.keys())
+
+def _cursor_paginate(query, sort_column, sort_value, descending, sort_by, page_size):
+    """按 cursor 参数做键集分页，返回 (本页记录, 分页信息)
+
+    cursor 为空表示第一页；总数只有在 with_total=true 时才计算。
+    """
+    signature = f"{sort_by}:{'desc' if descending else 'asc'}"
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor, signature) if cursor else None
+    
+    pagination = {'page_size': page_size}
+    if request.args.get('with_total', 'false').lower() == 'true':
+        pagination['total'] = query.order_by(None).count()
+    
+    items, has_next = keyset_paginate(query, sort_column, Instrument.id, after, page_size, descending)
+    pagination['has_next'] = has_next
+    pagination['next_cursor'] = encode_cursor(signature, sort_value(items[-1]), items[-1].id) if has_next else None
+    return items, pagination
+
+def _with_facets(payload, facets):
+    """请求了分面计数时附加到列表响应中"""
+    if facets is not None:
+        payload['facets'] = facets
+    return payload
 
 # ========== 首页和静态页面 ==========
 @main_bp.route('/')
@@ -42,6 +90,7 @@ def api_index():
 
 # ========== 分类相关API ==========
 @main_bp.route('/categories', methods=['GET'])
+@response_cache.cached(tags=('categories',))
 def get_categories():
     """获取所有分类"""
     categories = Category.query.order_by(Category.sort_order, Category.name).all()
@@ -52,6 +101,7 @@ def get_categories():
 
 # ========== 乐器相关API ==========
 @main_bp.route('/instruments', methods=['GET'])
+@response_cache.cached(tags=('instruments',), anonymous_only=True)
 def get_instruments():
     """获取乐器列表（支持分页、搜索、筛选）"""
     page = request.args.get('page', 1, type=int)
@@ -61,79 +111,102 @@ def get_instruments():
     condition = request.args.get('condition')
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
-    sort_by = request.args.get('sort_by', 'created_at')
+    sort_by = request.args.get('sort_by', 'relevance' if keyword else 'created_at')
     sort_order = request.args.get('sort_order', 'desc')
     
     # 构建查询
     query = Instrument.query.filter_by(status='available')
     
-    # 搜索条件
+    # 搜索条件：走全文索引，只取按相关度排好的前 SEARCH_MAX_HITS 个ID作为候选，
+    # 列表、总数和分面都在候选内计算（IN 列表有上限）；全部命中数和上限随分页信息返回
+    relevance = None
+    search_info = {}
     if keyword:
-        query = query.filter(
-            or_(
-                Instrument.title.ilike(f'%{keyword}%'),
-                Instrument.description.ilike(f'%{keyword}%'),
-                Instrument.brand.ilike(f'%{keyword}%'),
-                Instrument.model.ilike(f'%{keyword}%')
-            )
-        )
-    
-    # 筛选条件
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    
-    if condition:
-        query = query.filter_by(instrument_condition=condition)
-    
-    if min_price is not None:
-        query = query.filter(Instrument.price >= min_price)
+        hits, matched_ids = search_index.search(keyword)
+        relevance = {instrument_id: rank for rank, (instrument_id, _) in enumerate(hits)}
+        query = query.filter(Instrument.id.in_(list(relevance)))
+        search_info = {
+            'search_matched': len(matched_ids),
+            'search_limit': search_index.max_hits,
+            'search_truncated': len(matched_ids) > len(hits)
+        }
     
-    if max_price is not None:
-        query = query.filter(Instrument.price <= max_price)
+    # 筛选条件：分面计数时每个分面要去掉自身的条件，所以按分面分开保存
+    filters = build_filters(category_id, condition, min_price, max_price)
+    facets = None
+    if request.args.get('facets', 'false').lower() == 'true':
+        facets = facet_counts(query, filters)
+    query = query.filter(*filters.values())
     
     # 排序
-    sort_column = getattr(Instrument, sort_by, Instrument.created_at)
-    if sort_order == 'asc':
-        query = query.order_by(asc(sort_column))
+    if sort_by == 'relevance' and relevance:
+        sort_column = case(relevance, value=Instrument.id, else_=len(relevance))
+        sort_value = lambda inst: relevance.get(inst.id, len(relevance))
+        descending = False
     else:
-        query = query.order_by(desc(sort_column))
+        if sort_by not in INSTRUMENT_SORT_COLUMNS:
+            sort_by = 'created_at'
+        sort_column = getattr(Instrument, sort_by)
+        sort_value = lambda inst: getattr(inst, sort_by)
+        descending = sort_order != 'asc'
+    
+    # 游标分页（可选）
+    if request.args.get('cursor') is not None:
+        try:
+            instruments, pagination = _cursor_paginate(query, sort_column, sort_value, descending, sort_by, page_size)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        pagination.update(search_info)
+        return json_with_etag(instruments_etag(instruments, pagination, facets), lambda: _with_facets({
+            'success': True,
+            'instruments': serialize_instruments(instruments),
+            'pagination': pagination
+        }, facets))
+    
+    # 按 id 兜底排序，排序值相同时翻页结果稳定
+    query = query.order_by(*(desc(column) if descending else asc(column) for column in (sort_column, Instrument.id)))
     
     # 分页
     pagination = query.paginate(page=page, per_page=page_size, error_out=False)
     
     instruments = pagination.items
     
-    return jsonify({
+    pagination_data = {
+        'page': pagination.page,
+        'page_size': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'has_next': pagination.has_next,
+        'has_prev': pagination.has_prev,
+        **search_info
+    }
+    
+    # ETag 只依赖本页行版本，If-None-Match 命中时不必序列化
+    return json_with_etag(instruments_etag(instruments, pagination_data, facets), lambda: _with_facets({
         'success': True,
-        'instruments': [inst.to_dict() for inst in instruments],
-        'pagination': {
-            'page': pagination.page,
-            'page_size': pagination.per_page,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev
-        }
-    })
+        'instruments': serialize_instruments(instruments),
+        'pagination': pagination_data
+    }, facets))
 
 @main_bp.route('/instruments/hot', methods=['GET'])
+@response_cache.cached(tags=('instruments',))
 def get_hot_instruments():
     """获取热门乐器"""
     limit = request.args.get('limit', 6, type=int)
     
-    # 获取最近7天的热门乐器（浏览量+收藏数）
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
-    instruments = Instrument.query.filter(
-        Instrument.status == 'available',
-        Instrument.created_at >= seven_days_ago
-    ).order_by(
-        desc(Instrument.view_count + Instrument.favorite_count * 2)
-    ).limit(limit).all()
-    
-    return jsonify({
+    # 从内存热度榜取ID（最近7天、按时间衰减的浏览+收藏热度）
+    instrument_ids = hot_ranking.top(limit)
+    instruments = []
+    if instrument_ids:
+        instruments = Instrument.query.filter(
+            Instrument.id.in_(instrument_ids),
+            Instrument.status == 'available'
+        ).all()
+        instruments.sort(key=lambda inst: instrument_ids.index(inst.id))
+    
+    return json_with_etag(instruments_etag(instruments), lambda: {
         'success': True,
-        'instruments': [inst.to_dict() for inst in instruments]
+        'instruments': serialize_instruments(instruments)
     })
 
 @main_bp.route('/instruments/<int:instrument_id>', methods=['GET'])
@@ -144,15 +217,9 @@ def get_instrument_detail(instrument_id):
     # 增加浏览次数
     instrument.increment_view_count()
     
-    # 记录浏览历史（如果用户已登录）
+    # 记录浏览历史（如果用户已登录），异步批量写入
     if current_user.is_authenticated:
-        from .models import ViewHistory
-        history = ViewHistory(
-            user_id=current_user.id,
-            instrument_id=instrument_id
-        )
-        db.session.add(history)
-        db.session.commit()
+        view_history.record(current_user.id, instrument_id)
     
     # 检查是否收藏
     is_favorited = False
@@ -162,13 +229,21 @@ def get_instrument_detail(instrument_id):
             instrument_id=instrument_id
         ).first() is not None
     
-    result = instrument.to_dict()
-    result['is_favorited'] = is_favorited
+    def build():
+        result = instrument.to_dict()
+        result['view_count'] = (instrument.view_count or 0) + view_counter.pending(instrument_id)
+        result['is_favorited'] = is_favorited
+        return {
+            'success': True,
+            'instrument': result
+        }
     
-    return jsonify({
-        'success': True,
-        'instrument': result
-    })
+    # 浏览量每次都在变，详情用弱 ETag（不含浏览量），其余内容不变时返回 304
+    etag = value_etag(
+        instrument.id, instrument.updated_at, instrument.status, instrument.favorite_count,
+        is_favorited, response_cache.tag_version('instruments')
+    )
+    return json_with_etag(etag, build, weak=True)
 
 @main_bp.route('/instruments', methods=['POST'])
 @login_required
@@ -200,7 +275,7 @@ def create_instrument():
         original_price=data.get('original_price'),
         category_id=int(category_id),
         user_id=current_user.id,
-        condition=data.get('condition', 'good'),
+        instrument_condition=data.get('condition', 'good'),
         brand=data.get('brand', '').strip(),
         model=data.get('model', '').strip(),
         location=data.get('location', '').strip()
@@ -209,34 +284,59 @@ def create_instrument():
     db.session.add(instrument)
     db.session.flush()  # 获取instrument.id
     
-    # 处理图片上传
-    images = request.files.getlist('images')
+    # 图片和音频既可以随表单直接上传，也可以填分片上传完成后的 upload_id
+    image_paths = [
+        save_content_addressed(image_file, 'instruments')
+        for image_file in request.files.getlist('images')
+        if image_file and allowed_file(image_file.filename)
+    ]
+    audio_file = request.files.get('audio')
+    try:
+        image_paths += [
+            chunked_uploads.claim(upload_id, current_user.id, 'image')
+            for upload_id in data.getlist('images') if upload_id
+        ]
+        if data.get('audio'):
+            instrument.audio_url = chunked_uploads.claim(data['audio'], current_user.id, 'audio')
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+    
+    # 处理图片（派生图在后台生成，先标记为 pending）
     main_image_index = int(data.get('main_image_index', 0))
+    pending_images = []
     
-    for i, image_file in enumerate(images):
-        if image_file and allowed_file(image_file.filename):
-            filename = save_uploaded_file(image_file, 'instruments')
-            if filename:
-                instrument_image = InstrumentImage(
-                    instrument_id=instrument.id,
-                    image_url=filename,
-                    is_main=(i == main_image_index)
-                )
-                db.session.add(instrument_image)
+    for i, filename in enumerate(image_paths):
+        if filename:
+            instrument_image = InstrumentImage(
+                instrument_id=instrument.id,
+                image_url=filename,
+                is_main=(i == main_image_index),
+                status='pending'
+            )
+            db.session.add(instrument_image)
+            pending_images.append(instrument_image)
     
     # 处理音频上传
-    audio_file = request.files.get('audio')
     if audio_file and allowed_file(audio_file.filename, {'mp3', 'wav'}):
         filename = save_uploaded_file(audio_file, 'audios')
         if filename:
             instrument.audio_url = filename
     
+    # 试听文件和波形在后台生成
+    if instrument.audio_url:
+        instrument.audio_status = 'pending'
+    
     db.session.commit()
+    image_processor.submit(pending_images)
+    if instrument.audio_url:
+        audio_processor.submit(instrument)
     
     return jsonify({
         'success': True,
         'message': '乐器发布成功',
-        'instrument_id': instrument.id
+        'instrument_id': instrument.id,
+        'images': [img.to_dict() for img in pending_images]
     })
 
 @main_bp.route('/instruments/<int:instrument_id>', methods=['PUT'])
@@ -262,7 +362,7 @@ def update_instrument(instrument_id):
         except ValueError:
             pass
     if 'condition' in data:
-        instrument.condition = data['condition']
+        instrument.instrument_condition = data['condition']
     if 'brand' in data:
         instrument.brand = data['brand'].strip()
     if 'model' in data:
@@ -274,22 +374,26 @@ def update_instrument(instrument_id):
     
     # 处理新图片
     images = request.files.getlist('images')
+    pending_images = []
     if images and any(img.filename for img in images):
         # 删除旧图片
         InstrumentImage.query.filter_by(instrument_id=instrument_id).delete()
         
         for i, image_file in enumerate(images):
             if image_file and allowed_file(image_file.filename):
-                filename = save_uploaded_file(image_file, 'instruments')
+                filename = save_content_addressed(image_file, 'instruments')
                 if filename:
                     instrument_image = InstrumentImage(
                         instrument_id=instrument.id,
                         image_url=filename,
-                        is_main=(i == 0)  # 第一张为主图
+                        is_main=(i == 0),  # 第一张为主图
+                        status='pending'
                     )
                     db.session.add(instrument_image)
+                    pending_images.append(instrument_image)
     
     db.session.commit()
+    image_processor.submit(pending_images)
     
     return jsonify({
         'success': True,
@@ -349,6 +453,7 @@ def toggle_favorite(instrument_id):
         message = '收藏成功'
     
     db.session.commit()
+    hot_ranking.record_favorite(instrument_id, 1 if is_favorited else -1)
     
     return jsonify({
         'success': True,
@@ -361,16 +466,16 @@ def toggle_favorite(instrument_id):
 @login_required
 def get_user_favorites():
     """获取用户的收藏列表"""
-    favorites = Favorite.query.filter_by(user_id=current_user.id).all()
+    favorites = Favorite.query.filter_by(user_id=current_user.id).options(
+        joinedload(Favorite.instrument)
+    ).all()
     
-    instruments = []
-    for fav in favorites:
-        if fav.instrument and fav.instrument.status == 'available':
-            instruments.append(fav.instrument.to_dict())
+    instruments = [fav.instrument for fav in favorites
+                   if fav.instrument and fav.instrument.status == 'available']
     
     return jsonify({
         'success': True,
-        'instruments': instruments
+        'instruments': serialize_instruments(instruments)
     })
 
 # ========== 购物车相关API ==========
@@ -378,23 +483,26 @@ def get_user_favorites():
 @login_required
 def get_cart():
     """获取购物车"""
-    cart_items = Cart.query.filter_by(user_id=current_user.id).all()
+    cart_items = Cart.query.filter_by(user_id=current_user.id).options(
+        joinedload(Cart.instrument)
+    ).all()
+    cart_items = [item for item in cart_items
+                  if item.instrument and item.instrument.status == 'available']
+    instrument_dicts = serialize_instruments([item.instrument for item in cart_items])
     
     total_price = 0
     items = []
     
-    for item in cart_items:
-        if item.instrument and item.instrument.status == 'available':
-            instrument_data = item.instrument.to_dict()
-            item_total = instrument_data['price'] * item.quantity
-            total_price += item_total
-            
-            items.append({
-                'id': item.id,
-                'instrument': instrument_data,
-                'quantity': item.quantity,
-                'item_total': item_total
-            })
+    for item, instrument_data in zip(cart_items, instrument_dicts):
+        item_total = instrument_data['price'] * item.quantity
+        total_price += item_total
+        
+        items.append({
+            'id': item.id,
+            'instrument': instrument_data,
+            'quantity': item.quantity,
+            'item_total': item_total
+        })
     
     return jsonify({
         'success': True,
@@ -528,13 +636,23 @@ def create_order():
 def get_user_orders():
     """获取用户订单"""
     # 作为买家
-    orders_as_buyer = Order.query.filter_by(buyer_id=current_user.id).all()
+    orders_as_buyer = Order.query.filter_by(buyer_id=current_user.id).options(
+        joinedload(Order.instrument)
+    ).all()
     # 作为卖家
-    orders_as_seller = Order.query.filter_by(seller_id=current_user.id).all()
+    orders_as_seller = Order.query.filter_by(seller_id=current_user.id).options(
+        joinedload(Order.instrument)
+    ).all()
+    
+    all_orders = orders_as_buyer + orders_as_seller
+    instrument_dicts = dict(zip(
+        [order.instrument_id for order in all_orders if order.instrument],
+        serialize_instruments([order.instrument for order in all_orders if order.instrument])
+    ))
     
     orders = []
-    for order in orders_as_buyer + orders_as_seller:
-        orders.append(order.to_dict())
+    for order in all_orders:
+        orders.append(order.to_dict(instrument_data=instrument_dicts.get(order.instrument_id)))
     
     return jsonify({
         'success': True,
@@ -616,14 +734,14 @@ def get_user_instruments():
     
     return jsonify({
         'success': True,
-        'instruments': [inst.to_dict() for inst in instruments]
+        'instruments': serialize_instruments(instruments)
     })
 
 # ========== 静态文件服务 ==========
 @main_bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     """提供上传的文件"""
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    return media_server.serve_upload(filename)
     # 在已有的routes.py基础上添加以下路由
 
 @main_bp.route('/search/suggestions', methods=['GET'])
@@ -634,11 +752,16 @@ def get_search_suggestions():
     if not keyword or len(keyword) < 2:
         return jsonify({'success': True, 'suggestions': []})
     
-    # 搜索乐器标题和品牌
-    instruments = Instrument.query.filter(
-        Instrument.status == 'available',
-        Instrument.title.ilike(f'%{keyword}%')
-    ).limit(10).all()
+    # 从全文索引取相关度最高的乐器
+    hits, _ = search_index.search(keyword, limit=10)
+    instrument_ids = [instrument_id for instrument_id, _ in hits]
+    instruments = []
+    if instrument_ids:
+        instruments = Instrument.query.filter(
+            Instrument.status == 'available',
+            Instrument.id.in_(instrument_ids)
+        ).all()
+        instruments.sort(key=lambda inst: instrument_ids.index(inst.id))
     
     # 搜索分类
     categories = Category.query.filter(
@@ -686,28 +809,105 @@ def upload_instrument_images(instrument_id):
     is_main = request.form.get('is_main', 'false').lower() == 'true'
     
     uploaded_files = []
+    pending_images = []
     
     for file in files:
         if file and allowed_file(file.filename):
-            filename = save_uploaded_file(file, 'instruments')
+            filename = save_content_addressed(file, 'instruments')
             if filename:
                 instrument_image = InstrumentImage(
                     instrument_id=instrument_id,
                     image_url=filename,
-                    is_main=is_main and len(uploaded_files) == 0  # 第一个文件为主图
+                    is_main=is_main and len(uploaded_files) == 0,  # 第一个文件为主图
+                    status='pending'
                 )
                 db.session.add(instrument_image)
                 uploaded_files.append(filename)
+                pending_images.append(instrument_image)
     
+    # 图片变化也算内容修改，刷新行版本
+    instrument.updated_at = datetime.utcnow()
     db.session.commit()
+    image_processor.submit(pending_images)
     
     return jsonify({
         'success': True,
         'message': f'成功上传 {len(uploaded_files)} 张图片',
-        'files': uploaded_files
+        'files': uploaded_files,
+        'images': [img.to_dict() for img in pending_images]
     })
 
+# ========== 分片上传API ==========
+def _upload_info(meta):
+    return {
+        'upload_id': meta['upload_id'],
+        'kind': meta['kind'],
+        'size': meta['size'],
+        'offset': meta['offset'],
+        'status': meta['status']
+    }
+
+@main_bp.route('/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    """创建分片上传"""
+    data = request.get_json() or {}
+    
+    try:
+        meta = chunked_uploads.create(
+            current_user.id,
+            data.get('filename', '').strip(),
+            data.get('size'),
+            data.get('kind')
+        )
+    except UploadError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+    
+    return jsonify({
+        'success': True,
+        'upload': _upload_info(meta),
+        'chunk_size': chunked_uploads.chunk_size
+    }), 201
+
+@main_bp.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def get_upload_status(upload_id):
+    """查询分片上传进度（用于断点续传）"""
+    try:
+        meta = chunked_uploads.status(upload_id, current_user.id)
+    except UploadError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+    
+    return jsonify({'success': True, 'upload': _upload_info(meta)})
+
+@main_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def append_upload_chunk(upload_id):
+    """追加一个分片，请求体为原始字节"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'success': False, 'message': '请提供分片偏移'}), 400
+    
+    try:
+        meta = chunked_uploads.append(upload_id, current_user.id, offset, request.stream, request.content_length)
+    except UploadError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+    
+    return jsonify({'success': True, 'upload': _upload_info(meta)})
+
+@main_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    """完成分片上传"""
+    try:
+        meta = chunked_uploads.complete(upload_id, current_user.id)
+    except UploadError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+    
+    return jsonify({'success': True, 'upload': _upload_info(meta)})
+
 @main_bp.route('/users/<int:user_id>/instruments', methods=['GET'])
+@response_cache.cached(tags=('instruments',))
 def get_user_instruments_list(user_id):
     """获取指定用户的乐器列表"""
     user = User.query.get_or_404(user_id)
@@ -718,26 +918,45 @@ def get_user_instruments_list(user_id):
     query = Instrument.query.filter_by(
         user_id=user_id,
         status='available'
-    ).order_by(desc(Instrument.created_at))
+    )
     
-    pagination = query.paginate(page=page, per_page=page_size, error_out=False)
+    user_data = {
+        'id': user.id,
+        'username': user.username,
+        'avatar': user.get_avatar_url(),
+        'credit_score': user.credit_score
+    }
+    
+    # 游标分页（可选）
+    if request.args.get('cursor') is not None:
+        try:
+            instruments, pagination = _cursor_paginate(
+                query, Instrument.created_at, lambda inst: inst.created_at, True, 'created_at', page_size
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return json_with_etag(instruments_etag(instruments, user_data, pagination), lambda: {
+            'success': True,
+            'instruments': serialize_instruments(instruments),
+            'user': user_data,
+            'pagination': pagination
+        })
+    
+    pagination = query.order_by(desc(Instrument.created_at)).paginate(page=page, per_page=page_size, error_out=False)
     instruments = pagination.items
     
-    return jsonify({
+    pagination_data = {
+        'page': pagination.page,
+        'page_size': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages
+    }
+    
+    return json_with_etag(instruments_etag(instruments, user_data, pagination_data), lambda: {
         'success': True,
-        'instruments': [inst.to_dict() for inst in instruments],
-        'user': {
-            'id': user.id,
-            'username': user.username,
-            'avatar': user.get_avatar_url(),
-            'credit_score': user.credit_score
-        },
-        'pagination': {
-            'page': pagination.page,
-            'page_size': pagination.per_page,
-            'total': pagination.total,
-            'pages': pagination.pages
-        }
+        'instruments': serialize_instruments(instruments),
+        'user': user_data,
+        'pagination': pagination_data
     })
 
 @main_bp.route('/statistics/dashboard', methods=['GET'])
@@ -747,56 +966,115 @@ def get_dashboard_statistics():
     if not current_user.is_admin:
         return jsonify({'success': False, 'message': '需要管理员权限'}), 403
     
-    # 统计信息
-    total_users = User.query.count()
-    total_instruments = Instrument.query.count()
-    total_orders = Order.query.count()
-    
-    # 今日新增
-    today = datetime.utcnow().date()
-    today_users = User.query.filter(
-        db.func.date(User.created_at) == today
-    ).count()
-    
-    today_instruments = Instrument.query.filter(
-        db.func.date(Instrument.created_at) == today
-    ).count()
-    
-    today_orders = Order.query.filter(
-        db.func.date(Order.created_at) == today
-    ).count()
-    
-    # 销售额统计
-    total_sales = db.session.query(
-        db.func.sum(Order.total_price)
-    ).filter(
-        Order.status == 'completed'
-    ).scalar() or 0
+    # 来自 daily_stat 按天汇总（每天一行），与用户、乐器、订单表的大小无关
+    totals, today = daily_rollup.totals()
     
     return jsonify({
         'success': True,
         'statistics': {
             'users': {
-                'total': total_users,
-                'today': today_users
+                'total': totals['new_users'],
+                'today': today['new_users']
             },
             'instruments': {
-                'total': total_instruments,
-                'today': today_instruments
+                'total': totals['new_instruments'],
+                'today': today['new_instruments']
             },
             'orders': {
-                'total': total_orders,
-                'today': today_orders
+                'total': totals['new_orders'],
+                'today': today['new_orders']
             },
             'sales': {
-                'total': float(total_sales) if total_sales else 0
+                'total': float(totals['completed_sales'])
             }
         }
     })
 
+@main_bp.route('/statistics/timeseries', methods=['GET'])
+@login_required
+def get_statistics_timeseries():
+    """按天/周/月的统计序列（仅管理员）
+
+    参数 from、to 为 YYYY-MM-DD（UTC 日期，含两端），默认最近 30 天；granularity 为 day/week/month。
+    """
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '需要管理员权限'}), 403
+    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'success': False, 'message': '统计粒度只能是 day、week 或 month'}), 400
+    
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else datetime.utcnow().date()
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'success': False, 'message': '日期格式应为 YYYY-MM-DD'}), 400
+    
+    if start > end:
+        return jsonify({'success': False, 'message': '开始日期不能晚于结束日期'}), 400
+    if (end - start).days >= MAX_RANGE_DAYS:
+        return jsonify({'success': False, 'message': f'时间跨度不能超过 {MAX_RANGE_DAYS} 天'}), 400
+    
+    return jsonify({
+        'success': True,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'granularity': granularity,
+        'series': daily_rollup.series(start, end, granularity)
+    })
+
+@main_bp.route('/cache/stats', methods=['GET'])
+@login_required
+def get_cache_statistics():
+    """获取响应缓存和用户缓存命中统计（仅管理员）"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '需要管理员权限'}), 403
+    
+    return jsonify({
+        'success': True,
+        'cache': response_cache.stats(),
+        'user_cache': user_cache.stats()
+    })
+
+# ========== 健康检查 ==========
+@main_bp.route('/health/db', methods=['GET'])
+def database_health():
+    """数据库连通性与连接池饱和度"""
+    start = time.perf_counter()
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception as e:
+        db.session.rollback()
+        # 公开接口，报错细节（主机名、驱动信息等）只写日志
+        print(f"数据库健康检查失败: {e!r}")
+        return jsonify({
+            'success': False,
+            'message': '数据库不可用',
+            'pool': pool_monitor.stats()
+        }), 503
+    latency = time.perf_counter() - start
+    
+    return jsonify({
+        'success': True,
+        'latency_ms': round(latency * 1000, 3),
+        'pool': pool_monitor.stats()
+    })
+
+# 通知邮件的发送线程，独立于请求的事件循环，超时返回后仍能继续发送
+_mail_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='contact-mail')
+
+def _notify_seller(seller_email, title, buyer_name, buyer_email, message):
+    """邮件通知卖家有人咨询（SMTP 往返较慢，在线程中执行）"""
+    mail.send(Message(
+        subject=f'【校园二手乐器】{buyer_name} 咨询了你的「{title}」',
+        recipients=[seller_email],
+        body=f'{message}\n\n买家联系方式：{buyer_email}',
+        reply_to=buyer_email
+    ))
+
 @main_bp.route('/instruments/<int:instrument_id>/contact', methods=['POST'])
 @login_required
-def contact_seller(instrument_id):
+async def contact_seller(instrument_id):
     """联系卖家"""
     instrument = Instrument.query.get_or_404(instrument_id)
     
@@ -810,10 +1088,22 @@ def contact_seller(instrument_id):
     if not message:
         return jsonify({'success': False, 'message': '请输入消息内容'}), 400
     
-    # 这里可以集成消息系统或邮件通知
-    # 暂时返回卖家联系方式
     seller = instrument.owner
     
+    # 配置了邮件服务时通知卖家；SMTP 慢或不可用时超时后先返回，邮件在后台线程继续发送
+    notified = False
+    if seller.email and current_app.config.get('MAIL_USERNAME'):
+        # 只传普通值，发送线程不再访问请求的数据库会话
+        send = _mail_executor.submit(copy_context().run, _notify_seller, seller.email, instrument.title,
+                                     current_user.username, current_user.email, message)
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(send)), current_app.config['CONTACT_NOTIFY_TIMEOUT'])
+            notified = True
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            print(f"联系卖家邮件发送失败 (instrument_id={instrument_id}): {e}")
+    
     contact_info = {
         'seller_id': seller.id,
         'seller_name': seller.real_name or seller.username,
@@ -835,5 +1125,6 @@ def contact_seller(instrument_id):
     return jsonify({
         'success': True,
         'message': '联系方式已获取',
-        'contact_info': contact_info
+        'contact_info': contact_info,
+        'notified': notified
     })
\ No newline at end of file
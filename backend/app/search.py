@@ -0,0 +1,310 @@
+"""乐器全文检索
+
+进程内倒排索引，替代 ilike('%kw%') 全表扫描：
+- 中日韩文字按二元组切分（同时收录单字，支持单字查询），其他文字按单词切分；
+- 拉丁词按前缀匹配，查询词不少于 3 个字符时再经三元组索引补上词中间的命中（caster 命中 stratocaster）；
+- 按字段加权的 BM25 打分，结果按相关度排序；
+- 发布、修改、下架在事务提交后增量更新索引；
+- 每隔 SEARCH_REFRESH_INTERVAL 秒从数据库拉取 updated_at 变化的行，
+  多进程部署时其他进程的写入也能最终同步。
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import attributes
+
+from .models import db, Instrument
+
+# 字段权重：标题命中比描述命中更重要
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'brand': 2.0,
+    'model': 2.0,
+    'description': 1.0
+}
+
+# 影响索引内容的字段，其余字段（浏览量等）变化不触发重建
+INDEXED_ATTRS = tuple(FIELD_WEIGHTS) + ('status',)
+
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+_TOKEN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+|[a-z0-9]+')
+
+# 拉丁词的词中匹配用的 n-gram 长度，更短的查询词只按前缀匹配
+INFIX_GRAM = 3
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text, for_query=False):
+    """切词
+
+    索引时 CJK 片段输出单字和二元组；查询时长度>=2 的片段只用二元组，
+    以保证多字查询的精确度。拉丁字母和数字按单词小写输出。
+    """
+    tokens = []
+    if not text:
+        return tokens
+    for piece in _TOKEN_RE.findall(text.lower()):
+        if not _CJK_RE.match(piece):
+            tokens.append(piece)
+            continue
+        if len(piece) == 1:
+            tokens.append(piece)
+            continue
+        if not for_query:
+            tokens.extend(piece)
+        tokens.extend(piece[i:i + 2] for i in range(len(piece) - 1))
+    return tokens
+
+
+def _grams(term):
+    return {term[i:i + INFIX_GRAM] for i in range(len(term) - INFIX_GRAM + 1)}
+
+
+def _document_terms(fields):
+    """计算文档的加权词频"""
+    terms = Counter()
+    for name, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(fields.get(name)):
+            terms[token] += weight
+    return terms
+
+
+class SearchIndex:
+    """倒排索引"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._doc_lengths = {}
+        self._doc_terms = {}
+        self._total_length = 0.0
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._grams = {}
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._last_synced_at = None
+        self.refresh_interval = 30
+        self.max_hits = 1000
+
+    def init_app(self, app):
+        self.refresh_interval = app.config.get('SEARCH_REFRESH_INTERVAL', 30)
+        self.max_hits = app.config.get('SEARCH_MAX_HITS', 1000)
+        app.extensions['search_index'] = self
+
+    # ---------- 索引维护 ----------
+    def add(self, instrument_id, fields):
+        """加入或更新一篇文档；非在售状态的乐器从索引中移除"""
+        with self._lock:
+            self._remove(instrument_id)
+            if fields.get('status', 'available') != 'available':
+                return
+            terms = _document_terms(fields)
+            if not terms:
+                return
+            for term, tf in terms.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = {}
+                    self._vocabulary_dirty = True
+                    self._add_grams(term)
+                posting[instrument_id] = tf
+            length = sum(terms.values())
+            self._doc_terms[instrument_id] = terms
+            self._doc_lengths[instrument_id] = length
+            self._total_length += length
+
+    def remove(self, instrument_id):
+        with self._lock:
+            self._remove(instrument_id)
+
+    def _remove(self, instrument_id):
+        terms = self._doc_terms.pop(instrument_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(instrument_id, None)
+            if not posting:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+                self._remove_grams(term)
+        self._total_length -= self._doc_lengths.pop(instrument_id, 0)
+
+    def _add_grams(self, term):
+        if _CJK_RE.match(term):
+            return
+        for gram in _grams(term):
+            self._grams.setdefault(gram, set()).add(term)
+
+    def _remove_grams(self, term):
+        if _CJK_RE.match(term):
+            return
+        for gram in _grams(term):
+            terms = self._grams.get(gram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._grams[gram]
+
+    def rebuild(self):
+        """从数据库全量重建索引"""
+        started_at = datetime.utcnow()
+        rows = db.session.query(
+            Instrument.id, Instrument.title, Instrument.description,
+            Instrument.brand, Instrument.model
+        ).filter(Instrument.status == 'available').all()
+        with self._lock:
+            self._postings = {}
+            self._doc_lengths = {}
+            self._doc_terms = {}
+            self._total_length = 0.0
+            self._vocabulary_dirty = True
+            self._grams = {}
+            for row in rows:
+                self.add(row.id, {
+                    'title': row.title,
+                    'description': row.description,
+                    'brand': row.brand,
+                    'model': row.model
+                })
+            self._loaded = True
+            self._last_refresh = time.monotonic()
+            self._last_synced_at = started_at
+
+    def refresh(self):
+        """拉取上次同步以来有更新的乐器，补齐其他进程的写入"""
+        # 留出余量，避免与未提交事务的时间戳擦肩而过
+        since = self._last_synced_at - timedelta(seconds=self.refresh_interval)
+        started_at = datetime.utcnow()
+        rows = db.session.query(
+            Instrument.id, Instrument.title, Instrument.description,
+            Instrument.brand, Instrument.model, Instrument.status
+        ).filter(Instrument.updated_at >= since).all()
+        with self._lock:
+            for row in rows:
+                self.add(row.id, row._asdict())
+            self._last_refresh = time.monotonic()
+            self._last_synced_at = started_at
+
+    def ensure_fresh(self):
+        if not self._loaded:
+            self.rebuild()
+        elif time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+
+    # ---------- 查询 ----------
+    def _expand(self, token):
+        """拉丁词按前缀扩展，不少于 INFIX_GRAM 个字符时再加上词中包含它的词
+        （兼容原来的子串匹配习惯），CJK 词精确匹配"""
+        if _CJK_RE.match(token):
+            return [token] if token in self._postings else []
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, token)
+        matches = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            matches.append(term)
+        if len(token) < INFIX_GRAM:
+            return matches
+
+        # 三元组的候选词取交集后再确认确实包含查询词
+        candidates = None
+        for gram in sorted(_grams(token), key=lambda gram: len(self._grams.get(gram, ()))):
+            terms = self._grams.get(gram)
+            if not terms:
+                return matches
+            candidates = set(terms) if candidates is None else candidates & terms
+            if not candidates:
+                return matches
+        prefixed = set(matches)
+        matches.extend(term for term in candidates if token in term and term not in prefixed)
+        return matches
+
+    def search(self, keyword, limit=None):
+        """搜索，返回 (按相关度降序排列的前 limit 个 (乐器ID, 得分), 全部命中的乐器ID集合)
+
+        所有查询词都需命中（AND 语义）。命中总数可能超过 limit，以集合大小为准。
+        """
+        self.ensure_fresh()
+        limit = limit or self.max_hits
+        query_tokens = list(dict.fromkeys(tokenize(keyword, for_query=True)))
+        if not query_tokens:
+            return [], set()
+
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if not doc_count:
+                return [], set()
+            avg_length = self._total_length / doc_count
+            scores = None
+            for token in query_tokens:
+                token_scores = {}
+                for term in self._expand(token):
+                    posting = self._postings[term]
+                    idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for doc_id, tf in posting.items():
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / avg_length)
+                        score = idf * tf * (BM25_K1 + 1) / (tf + norm)
+                        if score > token_scores.get(doc_id, 0):
+                            token_scores[doc_id] = score
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {doc_id: scores[doc_id] + s for doc_id, s in token_scores.items() if doc_id in scores}
+                if not scores:
+                    return [], set()
+
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked, set(scores)
+
+
+search_index = SearchIndex()
+
+
+# ---------- 增量更新：事务提交后同步索引 ----------
+@event.listens_for(db.session, 'after_flush')
+def _collect_instrument_changes(session, flush_context):
+    pending = session.info.setdefault('search_pending', {})
+    for obj in session.new:
+        if isinstance(obj, Instrument):
+            pending[obj.id] = {name: getattr(obj, name) for name in INDEXED_ATTRS}
+    for obj in session.dirty:
+        if isinstance(obj, Instrument) and any(
+            attributes.get_history(obj, name).has_changes() for name in INDEXED_ATTRS
+        ):
+            pending[obj.id] = {name: getattr(obj, name) for name in INDEXED_ATTRS}
+    for obj in session.deleted:
+        if isinstance(obj, Instrument):
+            pending[obj.id] = None
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_instrument_changes(session):
+    pending = session.info.pop('search_pending', None)
+    if not pending or not search_index._loaded:
+        return
+    for instrument_id, fields in pending.items():
+        if fields is None:
+            search_index.remove(instrument_id)
+        else:
+            search_index.add(instrument_id, fields)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_instrument_changes(session):
+    session.info.pop('search_pending', None)
@@ -0,0 +1,185 @@
+"""API 客户端的 Bearer 令牌认证
+
+登录时带上 issue_tokens=true 换取一对令牌（不建立 cookie 会话）：
+- 访问令牌（TOKEN_ACCESS_TTL，默认 15 分钟）携带路由需要的 user_id、role、is_verified，
+  请求头 Authorization: Bearer <令牌> 即可通过 login_required，不查 user 表；
+  视图用到令牌之外的字段（头像、邮箱等）时才按需加载用户；
+- 刷新令牌（TOKEN_REFRESH_TTL，默认 30 天）只能用于 POST /api/auth/token/refresh，
+  每次刷新都会作废旧的刷新令牌并签发新的一对；刷新令牌带密码哈希的指纹，改密码后全部失效；
+- 吊销信息存在数据库里，所有 worker 共享：
+  登出、刷新令牌轮换时把 jti 写入 revoked_token（过期后清理）；
+  改密码、角色或验证状态时在同一次 flush 里把 user.token_version 加一，
+  令牌中的版本号与之不同即作废（访问令牌里的声明因此不会比数据库旧），不依赖时钟精度；
+  每次校验令牌是一条按主键的查询。
+"""
+import hashlib
+from datetime import datetime
+
+from flask_login import UserMixin
+from sqlalchemy import event, exists, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import attributes
+
+from .models import db, User, RevokedToken
+from .user_cache import user_cache
+from .utils import generate_token, decode_token
+
+# 变化后需要作废该用户已签发令牌的字段
+CLAIM_ATTRS = ('password_hash', 'role', 'is_verified')
+
+
+class DatabaseRevocationStore:
+    """数据库中的吊销列表"""
+
+    def __init__(self, prune_every=1000):
+        self.prune_every = prune_every
+        self._revoked = 0
+
+    def revoke(self, jti, expires_at):
+        table = RevokedToken.__table__
+        with db.engine.begin() as conn:
+            try:
+                with conn.begin_nested():
+                    conn.execute(table.insert().values(jti=jti, expires_at=datetime.utcfromtimestamp(expires_at)))
+            except IntegrityError:
+                # 已经吊销过（并发的登出或刷新）
+                pass
+            # 每吊销 prune_every 个令牌清理一次已过期的条目
+            self._revoked += 1
+            if self._revoked % self.prune_every == 0:
+                conn.execute(table.delete().where(table.c.expires_at < datetime.utcnow()))
+
+    def check(self, jti, user_id):
+        """返回 (jti 是否已吊销, 用户当前的令牌版本)，用户不存在时版本为 None"""
+        row = db.session.execute(
+            select(
+                exists().where(RevokedToken.jti == jti),
+                select(User.token_version).where(User.id == user_id).scalar_subquery()
+            )
+        ).one()
+        return bool(row[0]), row[1]
+
+
+class TokenUser(UserMixin):
+    """由访问令牌声明构造的当前用户
+
+    id、role、is_verified 直接取自令牌；其他属性和方法第一次访问时才加载完整用户并转发。
+    """
+
+    def __init__(self, claims):
+        object.__setattr__(self, 'claims', claims)
+        object.__setattr__(self, '_user', None)
+
+    @property
+    def id(self):
+        return self.claims['user_id']
+
+    @property
+    def role(self):
+        return self.claims['role']
+
+    @property
+    def is_verified(self):
+        return self.claims['is_verified']
+
+    @property
+    def is_seller(self):
+        return self.role in ['seller', 'admin']
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def user(self):
+        if self._user is None:
+            object.__setattr__(self, '_user', user_cache.load(self.id))
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+
+
+class TokenAuth:
+    """令牌签发、校验和吊销"""
+
+    def __init__(self):
+        self.store = DatabaseRevocationStore()
+        self.access_ttl = 900
+        self.refresh_ttl = 30 * 24 * 3600
+
+    def init_app(self, app):
+        self.access_ttl = app.config.get('TOKEN_ACCESS_TTL', 900)
+        self.refresh_ttl = app.config.get('TOKEN_REFRESH_TTL', 30 * 24 * 3600)
+        app.extensions['token_auth'] = self
+
+    @staticmethod
+    def password_fingerprint(user):
+        return hashlib.sha256(user.password_hash.encode('utf-8')).hexdigest()[:16]
+
+    def issue(self, user):
+        """签发访问令牌和刷新令牌"""
+        return {
+            'token_type': 'Bearer',
+            'access_token': generate_token(user.id, self.access_ttl, role=user.role,
+                                           is_verified=bool(user.is_verified), ver=user.token_version or 0),
+            'expires_in': self.access_ttl,
+            'refresh_token': generate_token(user.id, self.refresh_ttl, 'refresh',
+                                            pwd=self.password_fingerprint(user), ver=user.token_version or 0)
+        }
+
+    @staticmethod
+    def bearer_token(request):
+        header = request.headers.get('Authorization', '')
+        scheme, _, token = header.partition(' ')
+        return token.strip() if scheme.lower() == 'bearer' and token.strip() else None
+
+    def _valid(self, payload):
+        if payload is None:
+            return False
+        revoked, version = self.store.check(payload['jti'], payload['user_id'])
+        return not revoked and version is not None and payload.get('ver', 0) == (version or 0)
+
+    def load_from_request(self, request):
+        """Flask-Login request_loader：校验 Authorization 头中的访问令牌"""
+        token = self.bearer_token(request)
+        if token is None:
+            return None
+        payload = decode_token(token)
+        return TokenUser(payload) if self._valid(payload) else None
+
+    def refresh(self, refresh_token):
+        """用刷新令牌换一对新令牌，返回 (令牌, 错误信息)"""
+        payload = decode_token(refresh_token, 'refresh')
+        if not self._valid(payload):
+            return None, '刷新令牌无效或已过期'
+        user = db.session.get(User, payload['user_id'])
+        if user is None or payload.get('pwd') != self.password_fingerprint(user):
+            return None, '刷新令牌无效或已过期'
+        if not user.is_verified and user.role == 'seller':
+            return None, '卖家账号需要先验证身份'
+        # 轮换：旧的刷新令牌只能用一次
+        self.store.revoke(payload['jti'], payload['exp'])
+        return self.issue(user), None
+
+    def revoke(self, *tokens):
+        """吊销访问令牌或刷新令牌（无效的令牌忽略）"""
+        for token, token_type in tokens:
+            payload = decode_token(token, token_type) if token else None
+            if payload is not None:
+                self.store.revoke(payload['jti'], payload['exp'])
+
+
+token_auth = TokenAuth()
+
+
+# ---------- 密码、角色、验证状态变化后作废旧令牌 ----------
+@event.listens_for(db.session, 'before_flush')
+def _bump_token_version(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, User) and any(attributes.get_history(obj, attr).has_changes() for attr in CLAIM_ATTRS):
+            # 与字段修改同一条 UPDATE 提交，提交后重新读取新版本
+            obj.token_version = func.coalesce(User.token_version, 0) + 1
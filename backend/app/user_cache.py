@@ -0,0 +1,173 @@
+"""登录用户的身份缓存
+
+Flask-Login 每个请求都会调用 load_user 查一次 user 表。这里在进程内缓存用户的分离快照
+（LRU + TTL，复用 cache.MemoryCacheBackend）：
+- 命中时用 session.merge(快照, load=False) 得到挂在当前会话上的实例，不访问数据库，
+  视图里修改 current_user 后照常提交；
+- 事务提交时，flush 过的 User（资料、密码、角色、验证状态等任何字段变化）立即从缓存删除；
+- 其他 worker 的写入靠 USER_CACHE_TTL 兜底，即最长陈旧时间；
+  配置 USER_CACHE_CHANNEL=redis 时通过 Redis 发布/订阅把失效广播给所有 worker
+  （使用 CACHE_REDIS_URL，需要安装 redis 包）；
+- 命中率、失效次数和命中快照的最大/平均年龄见 GET /api/cache/stats。
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from .cache import MemoryCacheBackend
+from .models import db, User
+from .workers import ProcessLocalThread
+
+CHANNEL_NAME = 'instrument-trading:user-invalidate'
+
+
+class UserIdentityCache:
+    """用户快照缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backend = MemoryCacheBackend()
+        self._app = None
+        self._redis = None
+        self._subscriber = ProcessLocalThread(self._subscribe, 'user-cache-channel')
+        self.enabled = True
+        self.ttl = 30
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'broadcasts_received': 0,
+            'age_total': 0.0,
+            'age_max': 0.0
+        }
+
+    def init_app(self, app):
+        self._app = app
+        self.enabled = app.config.get('USER_CACHE_ENABLED', True)
+        self.ttl = app.config.get('USER_CACHE_TTL', 30)
+        self._backend = MemoryCacheBackend(app.config.get('USER_CACHE_MAX_ENTRIES', 10000))
+        self._redis = None
+        if app.config.get('USER_CACHE_CHANNEL') == 'redis':
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError('USER_CACHE_CHANNEL=redis 需要先安装 redis 包')
+            self._redis = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+        app.extensions['user_cache'] = self
+
+    # ---------- 读取 ----------
+    def load(self, user_id):
+        """按 ID 取用户，返回挂在当前会话上的实例"""
+        if not self.enabled:
+            return db.session.get(User, user_id)
+        self._ensure_subscriber()
+
+        entry = self._backend.get(user_id)
+        if entry is not None:
+            snapshot, loaded_at = entry
+            self._record_hit(time.monotonic() - loaded_at)
+            return db.session.merge(snapshot, load=False)
+
+        self._count('misses')
+        user = db.session.get(User, user_id)
+        if user is not None:
+            self._backend.set(user_id, (self._snapshot(user), time.monotonic()), self.ttl)
+        return user
+
+    @staticmethod
+    def _snapshot(user):
+        """复制已加载的列属性，得到不属于任何会话的分离实例"""
+        snapshot = User(**{column.key: getattr(user, column.key) for column in User.__mapper__.column_attrs})
+        make_transient_to_detached(snapshot)
+        return snapshot
+
+    # ---------- 失效 ----------
+    def invalidate(self, *user_ids, broadcast=True):
+        """删除这些用户的快照，并通知其他 worker"""
+        for user_id in user_ids:
+            self._backend.delete(user_id)
+        with self._lock:
+            self._stats['invalidations'] += len(user_ids)
+        if broadcast and self._redis is not None and user_ids:
+            try:
+                for user_id in user_ids:
+                    self._redis.publish(CHANNEL_NAME, str(user_id))
+            except Exception as e:
+                # 广播失败时其他 worker 最迟在 TTL 后读到新数据
+                print(f"用户缓存失效广播失败: {e}")
+
+    def clear(self):
+        self._backend = MemoryCacheBackend(self._backend.max_entries)
+
+    def _ensure_subscriber(self):
+        if self._redis is not None:
+            self._subscriber.ensure()
+
+    def _subscribe(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL_NAME)
+                # 订阅断开期间错过的失效无从补回，清空本地缓存
+                self.clear()
+                for message in pubsub.listen():
+                    self._backend.delete(int(message['data']))
+                    with self._lock:
+                        self._stats['broadcasts_received'] += 1
+            except Exception as e:
+                print(f"用户缓存失效订阅中断，5 秒后重连: {e}")
+                time.sleep(5)
+
+    # ---------- 统计 ----------
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _record_hit(self, age):
+        with self._lock:
+            self._stats['hits'] += 1
+            self._stats['age_total'] += age
+            self._stats['age_max'] = max(self._stats['age_max'], age)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        # 命中快照的年龄即该次读取可能的最大陈旧时间，上限为 ttl
+        stats['age_avg_seconds'] = round(stats.pop('age_total') / stats['hits'], 3) if stats['hits'] else 0.0
+        stats['age_max_seconds'] = round(stats.pop('age_max'), 3)
+        stats['ttl_seconds'] = self.ttl
+        stats['size'] = len(self._backend)
+        stats['channel'] = 'redis' if self._redis is not None else None
+        return stats
+
+
+user_cache = UserIdentityCache()
+
+
+# ---------- 用户数据提交后失效 ----------
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('user_cache_changed', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_changed_users(session):
+    changed = session.info.pop('user_cache_changed', None)
+    if changed:
+        user_cache.invalidate(*changed)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('user_cache_changed', None)
@@ -1,11 +1,16 @@
 import os
 import uuid
+import json
+import base64
+import binascii
 from datetime import datetime, timedelta
+from decimal import Decimal
 import jwt
+import hashlib
 from werkzeug.utils import secure_filename
 from flask import current_app
+from sqlalchemy import and_, or_, asc, desc
 import re
-from PIL import Image
 import io
 
 def allowed_file(filename, allowed_extensions=None):
@@ -29,31 +34,56 @@ def save_uploaded_file(file, subfolder=''):
         upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
         os.makedirs(upload_dir, exist_ok=True)
         
-        # 保存文件
+        # 保存文件（缩略图等派生图由 image_pipeline 在后台生成）
         file_path = os.path.join(upload_dir, new_filename)
         file.save(file_path)
         
-        # 如果是图片，生成缩略图
-        if ext in ['jpg', 'jpeg', 'png', 'gif']:
-            generate_thumbnail(file_path)
-        
         return os.path.join(subfolder, new_filename)
     return None
 
-def generate_thumbnail(file_path, size=(300, 300)):
-    """生成缩略图"""
-    try:
-        img = Image.open(file_path)
-        img.thumbnail(size, Image.Resampling.LANCZOS)
-        
-        # 保存缩略图
-        thumb_path = file_path.replace('.', '_thumb.')
-        img.save(thumb_path)
-        
-        return thumb_path
-    except Exception as e:
-        print(f"生成缩略图失败: {e}")
+def save_content_addressed(file, subfolder=''):
+    """按内容哈希保存上传文件，内容相同的文件只存一份
+
+    边写临时文件边计算 SHA-256，路径形如 instruments/ab/abcdef...jpg，返回相对路径。
+    """
+    if not (file and allowed_file(file.filename)):
         return None
+    
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
+    os.makedirs(upload_dir, exist_ok=True)
+    
+    hasher = hashlib.sha256()
+    temp_path = os.path.join(upload_dir, f'.{uuid.uuid4().hex}.part')
+    with open(temp_path, 'wb') as out:
+        while True:
+            chunk = file.stream.read(64 * 1024)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            out.write(chunk)
+    
+    return move_to_content_path(temp_path, hasher.hexdigest(), subfolder, ext)
+
+def hash_file(path):
+    """分块计算文件的 SHA-256"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def move_to_content_path(temp_path, digest, subfolder, ext):
+    """把已写好的临时文件移动到内容哈希路径，已存在相同内容时丢弃临时文件"""
+    relative_path = os.path.join(subfolder, digest[:2], f'{digest}.{ext}')
+    final_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(temp_path, final_path)
+    
+    return relative_path
 
 def validate_email(email):
     """验证邮箱格式"""
@@ -65,21 +95,33 @@ def validate_phone(phone):
     pattern = r'^1[3-9]\d{9}$'
     return re.match(pattern, phone) is not None
 
-def generate_token(user_id, expires_in=3600):
-    """生成JWT令牌"""
-    payload = {
-        'user_id': user_id,
-        'exp': datetime.utcnow() + timedelta(seconds=expires_in)
-    }
+def generate_token(user_id, expires_in=3600, token_type='access', **claims):
+    """生成JWT令牌，claims 为附加声明；每个令牌有唯一的 jti，用于吊销"""
+    now = datetime.utcnow()
+    payload = dict(
+        claims,
+        user_id=user_id,
+        type=token_type,
+        jti=uuid.uuid4().hex,
+        iat=now,
+        exp=now + timedelta(seconds=expires_in)
+    )
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
-def verify_token(token):
-    """验证JWT令牌"""
+def decode_token(token, token_type='access'):
+    """验证JWT令牌并返回全部声明，签名错误、过期或类型不符时返回 None"""
     try:
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload['user_id']
     except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
         return None
+    if payload.get('type', 'access') != token_type:
+        return None
+    return payload
+
+def verify_token(token, token_type='access'):
+    """验证JWT令牌"""
+    payload = decode_token(token, token_type)
+    return payload['user_id'] if payload else None
 
 def format_price(price):
     """格式化价格显示"""
@@ -104,6 +146,79 @@ def paginate_query(query, page, per_page):
     """分页查询"""
     return query.paginate(page=page, per_page=per_page, error_out=False)
 
+def _encode_cursor_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+def _decode_cursor_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+    return value
+
+def encode_cursor(signature, sort_value, last_id):
+    """生成不透明的分页游标（记录排序方式和上一页最后一行的位置）"""
+    payload = json.dumps([signature, _encode_cursor_value(sort_value), last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, signature):
+    """解析分页游标，游标无效或与当前排序方式不符时抛出 ValueError"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_signature, sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        sort_value = _decode_cursor_value(sort_value)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError('无效的分页游标')
+    if cursor_signature != signature or not isinstance(last_id, int):
+        raise ValueError('无效的分页游标')
+    return sort_value, last_id
+
+def keyset_paginate(query, sort_column, id_column, after=None, per_page=12, descending=True):
+    """键集（游标）分页
+
+    按 (排序列, id) 定位下一页，不做 COUNT 也不做 OFFSET 扫描，翻到多深都一样快。
+    after 为上一页最后一行的 (排序值, id)。
+    NULL 按 MySQL/SQLite 的习惯视为最小值。
+    返回 (本页记录, 是否还有下一页)。
+    """
+    if after is not None:
+        last_value, last_id = after
+        if descending:
+            if last_value is None:
+                condition = and_(sort_column.is_(None), id_column < last_id)
+            else:
+                condition = or_(
+                    sort_column < last_value,
+                    and_(sort_column == last_value, id_column < last_id),
+                    sort_column.is_(None)
+                )
+        else:
+            if last_value is None:
+                condition = or_(
+                    sort_column.isnot(None),
+                    and_(sort_column.is_(None), id_column > last_id)
+                )
+            else:
+                condition = or_(
+                    sort_column > last_value,
+                    and_(sort_column == last_value, id_column > last_id)
+                )
+        query = query.filter(condition)
+    
+    if descending:
+        query = query.order_by(desc(sort_column), desc(id_column))
+    else:
+        query = query.order_by(asc(sort_column), asc(id_column))
+    
+    items = query.limit(per_page + 1).all()
+    has_next = len(items) > per_page
+    return items[:per_page], has_next
+
 def calculate_distance(lat1, lon1, lat2, lon2):
     """计算两个坐标之间的距离（米）"""
     from math import radians, sin, cos, sqrt, atan2
@@ -0,0 +1,99 @@
+"""浏览量写缓冲
+
+详情页的浏览量先在进程内按乐器累加，由后台线程定期批量落库：
+UPDATE instrument SET view_count = view_count + n WHERE id = ?
+
+- VIEW_COUNT_FLUSH_INTERVAL：落库间隔（秒），为 0 时每次浏览立即落库；
+- VIEW_COUNT_MAX_PENDING：未落库浏览数上限，达到后立即触发落库。
+进程崩溃时最多丢失一个间隔内、且不超过上限的浏览数；正常退出时会先落库。
+"""
+import atexit
+import threading
+from collections import Counter
+
+from sqlalchemy import bindparam
+
+from .models import db, Instrument
+from .workers import ProcessLocalThread
+
+
+class ViewCounter:
+    """按乐器聚合浏览量的写缓冲"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        # 缓冲中的浏览总数，避免每次浏览都对整个缓冲求和
+        self._pending_total = 0
+        self._wakeup = threading.Event()
+        self._worker = ProcessLocalThread(self._run, 'view-counter')
+        self._app = None
+        self.flush_interval = 10
+        self.max_pending = 1000
+
+    def init_app(self, app):
+        self._app = app
+        self.flush_interval = app.config.get('VIEW_COUNT_FLUSH_INTERVAL', 10)
+        self.max_pending = app.config.get('VIEW_COUNT_MAX_PENDING', 1000)
+        app.extensions['view_counter'] = self
+        atexit.register(self.flush)
+
+    def increment(self, instrument_id, amount=1):
+        """记录一次浏览"""
+        if not self.flush_interval:
+            self._apply({instrument_id: amount})
+            return
+
+        with self._lock:
+            self._pending[instrument_id] += amount
+            self._pending_total += amount
+            overflow = self._pending_total >= self.max_pending
+        self._worker.ensure()
+        if overflow:
+            self._wakeup.set()
+
+    def pending(self, instrument_id):
+        """尚未落库的浏览数，用于在响应中展示最新值"""
+        with self._lock:
+            return self._pending.get(instrument_id, 0)
+
+    def flush(self):
+        """把缓冲的浏览量写入数据库"""
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+            total, self._pending_total = self._pending_total, 0
+        if not batch:
+            return
+        try:
+            with self._app.app_context():
+                self._apply(batch)
+        except Exception as e:
+            # 落库失败时放回缓冲，下次重试
+            with self._lock:
+                self._pending.update(batch)
+                self._pending_total += total
+            print(f"浏览量落库失败: {e}")
+
+    def _apply(self, batch):
+        table = Instrument.__table__
+        stmt = table.update().where(
+            table.c.id == bindparam('instrument_id')
+        ).values(
+            view_count=table.c.view_count + bindparam('increment'),
+            # 浏览量不算内容修改，保持 updated_at 不变
+            updated_at=table.c.updated_at
+        )
+        with db.engine.begin() as conn:
+            conn.execute(stmt, [
+                {'instrument_id': instrument_id, 'increment': amount}
+                for instrument_id, amount in batch.items()
+            ])
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,119 @@
+"""浏览历史异步写入
+
+详情页只把 (用户, 乐器, 时间) 放进有界队列就返回，由后台线程批量插入 view_history：
+- VIEW_HISTORY_QUEUE_SIZE：队列容量，满了直接丢弃新记录（过载保护，不阻塞请求）；
+- VIEW_HISTORY_BATCH_SIZE：每批最多插入的行数；
+- VIEW_HISTORY_FLUSH_INTERVAL：攒批的最长等待时间（秒）；
+- VIEW_HISTORY_DEDUP_WINDOW：同一用户在该时间窗口（秒）内重复浏览同一乐器只记一次。
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+from .models import db, ViewHistory
+from .workers import ProcessLocalThread
+
+
+class ViewHistoryRecorder:
+    """浏览历史写入队列"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = ProcessLocalThread(self._run, 'view-history')
+        self._app = None
+        self._recent = {}
+        self._last_purge = time.monotonic()
+        self.batch_size = 200
+        self.flush_interval = 2
+        self.dedup_window = 1800
+        self.stats = {'queued': 0, 'deduplicated': 0, 'dropped': 0, 'written': 0, 'failed': 0}
+
+    def init_app(self, app):
+        self._app = app
+        self._queue = queue.Queue(maxsize=app.config.get('VIEW_HISTORY_QUEUE_SIZE', 10000))
+        self.batch_size = app.config.get('VIEW_HISTORY_BATCH_SIZE', 200)
+        self.flush_interval = app.config.get('VIEW_HISTORY_FLUSH_INTERVAL', 2)
+        self.dedup_window = app.config.get('VIEW_HISTORY_DEDUP_WINDOW', 1800)
+        app.extensions['view_history'] = self
+        atexit.register(self.drain)
+
+    def record(self, user_id, instrument_id):
+        """记录一次浏览，立即返回"""
+        now = time.monotonic()
+        key = (user_id, instrument_id)
+        with self._lock:
+            last_seen = self._recent.get(key)
+            if last_seen is not None and now - last_seen < self.dedup_window:
+                self.stats['deduplicated'] += 1
+                return
+            self._recent[key] = now
+            self._purge_recent(now)
+
+        try:
+            self._queue.put_nowait({
+                'user_id': user_id,
+                'instrument_id': instrument_id,
+                'viewed_at': datetime.utcnow()
+            })
+        except queue.Full:
+            with self._lock:
+                self.stats['dropped'] += 1
+                self._recent.pop(key, None)
+            return
+
+        with self._lock:
+            self.stats['queued'] += 1
+        self._worker.ensure()
+
+    def drain(self):
+        """把队列中剩余的记录全部写入数据库"""
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _purge_recent(self, now):
+        # 定期清理去重表，防止无限增长
+        if now - self._last_purge < self.dedup_window:
+            return
+        self._recent = {key: seen for key, seen in self._recent.items() if now - seen < self.dedup_window}
+        self._last_purge = now
+
+    def _take_batch(self, block=True):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(ViewHistory.__table__.insert(), batch)
+            with self._lock:
+                self.stats['written'] += len(batch)
+        except Exception as e:
+            with self._lock:
+                self.stats['failed'] += len(batch)
+            print(f"浏览历史写入失败: {e}")
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+
+view_history = ViewHistoryRecorder()
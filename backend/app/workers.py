@@ -0,0 +1,61 @@
+"""后台执行器和后台线程
+
+- ProcessLocalExecutor：图片、音频处理和密码哈希共用的按进程创建的线程池/进程池；
+- ProcessLocalThread：浏览量、浏览历史、按天统计、用户缓存等按进程启动的后台线程。
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ProcessLocalExecutor:
+    """按进程创建的执行器：gunicorn fork 出 worker 后在各自进程内重新创建
+
+    mode 为 process 时使用进程池，子进程用 spawn 启动：gthread worker 里其他线程
+    可能正持有锁（日志、连接池等），fork 出的子进程会继承这些锁的加锁状态而卡死；
+    其他取值使用线程池。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def get(self, mode, max_workers):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                if mode == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=max_workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def reset(self):
+        """配置变化后下次使用时重新创建"""
+        with self._lock:
+            self._executor = None
+
+
+class ProcessLocalThread:
+    """按进程启动的后台守护线程：fork 出来的 worker 里没有父进程的线程，第一次使用时重新启动"""
+
+    def __init__(self, target, name):
+        self._lock = threading.Lock()
+        self._target = target
+        self._name = name
+        self._thread = None
+        self._pid = None
+
+    def ensure(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._target, name=self._name, daemon=True)
+            self._thread.start()
@@ -0,0 +1,71 @@
+"""压测脚本共用的工具：启动/停止服务进程、延迟统计"""
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seed.py 生成的压测用户共用的密码
+BENCH_PASSWORD = 'bench123'
+
+SERVER_COMMANDS = {
+    'devserver': [sys.executable, 'run.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, port, env=None):
+    """在 backend 目录启动服务并等待就绪，env 为额外的环境变量"""
+    env = dict(os.environ, PORT=str(port), DEBUG='False', GUNICORN_ACCESS_LOG='', **(env or {}))
+    process = subprocess.Popen(SERVER_COMMANDS[name], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    # 大数据量时启动要重建搜索索引，留足时间
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} 启动失败，退出码 {process.returncode}')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/categories', timeout=1).read()
+            return process
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'{name} 300 秒内没有就绪')
+
+
+def stop_server(process):
+    # 发给整个进程组，gunicorn 的 worker 一并退出
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def summarize(latencies, errors, elapsed):
+    """延迟秒数列表 -> 请求数、吞吐和 p50/p95/p99（毫秒）"""
+    if not latencies:
+        return {'requests': 0, 'errors': errors}
+    ordered = sorted(latencies)
+    cuts = statistics.quantiles(ordered, n=100) if len(ordered) > 1 else ordered * 99
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 1),
+        'p50_ms': round(cuts[49] * 1000, 2),
+        'p95_ms': round(cuts[94] * 1000, 2),
+        'p99_ms': round(cuts[98] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2)
+    }
@@ -0,0 +1,90 @@
+"""对比开发服务器（python run.py）和 gunicorn（wsgi:app）的吞吐与延迟
+
+两种入口各启动一次，用同一个数据库，以相同并发压同一组只读接口：
+
+    python bench/compare_serving.py --concurrency 32 --duration 20
+    python bench/compare_serving.py --paths /api/instruments /api/instruments/hot --output serving.json
+
+gunicorn 的 worker/线程数沿用 gunicorn.conf.py 的环境变量（WEB_CONCURRENCY、GUNICORN_THREADS）。
+结果打印为表格，--output 时另存为 JSON。
+"""
+import argparse
+import json
+import os
+import socket
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import free_port, start_server, stop_server, summarize
+
+DEFAULT_PATHS = ['/api/instruments', '/api/instruments?sort_by=price&sort_order=asc',
+                 '/api/instruments/hot', '/api/categories']
+
+
+def drive(base_url, paths, concurrency, duration):
+    """并发请求 duration 秒，返回 (延迟秒数列表, 错误数, 实际耗时)"""
+    deadline = time.perf_counter() + duration
+
+    def worker(offset):
+        latencies, errors, index = [], 0, offset
+        while time.perf_counter() < deadline:
+            url = base_url + paths[index % len(paths)]
+            index += 1
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                latencies.append(time.perf_counter() - start)
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                errors += 1
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies = [value for result in results for value in result[0]]
+    return latencies, sum(result[1] for result in results), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比开发服务器和 gunicorn 的吞吐与延迟')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15, help='每种入口的压测秒数')
+    parser.add_argument('--warmup', type=float, default=2, help='正式计时前的预热秒数')
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('--servers', nargs='+', default=['devserver', 'gunicorn'], choices=['devserver', 'gunicorn'])
+    parser.add_argument('--output', help='结果 JSON 文件')
+    args = parser.parse_args()
+
+    report = {
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'paths': args.paths,
+        'cpu_count': os.cpu_count(),
+        'results': {}
+    }
+    for name in args.servers:
+        port = free_port()
+        process = start_server(name, port)
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            drive(base_url, args.paths, args.concurrency, args.warmup)
+            report['results'][name] = summarize(*drive(base_url, args.paths, args.concurrency, args.duration))
+        finally:
+            stop_server(process)
+
+    print(f"{'入口':<12}{'请求数':>10}{'错误':>8}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for name, result in report['results'].items():
+        print(f"{name:<12}{result['requests']:>10}{result['errors']:>8}{result.get('throughput_rps', 0):>14}"
+              f"{result.get('p50_ms', '-'):>10}{result.get('p95_ms', '-'):>10}{result.get('p99_ms', '-'):>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""密码哈希算法/代价与登录吞吐的对照
+
+先在本进程内测每种配置单核每秒能校验多少次密码，以及 --threads 个线程并行时的总数；
+加 --server 时再分别以该配置启动服务，压测 POST /api/auth/login，给出每核登录吞吐：
+
+    python bench/password_hashing.py
+    python bench/password_hashing.py --configs bcrypt:10 bcrypt:12 scrypt --server gunicorn --output hashing.json
+
+配置写法：bcrypt:<代价> 或 Werkzeug 的方法名（scrypt、pbkdf2:sha256:600000）。
+登录压测使用 seed.py 生成的前 --login-users 个压测用户；预热阶段这些用户的哈希会被升级成当前配置，
+正式计时的每次登录只算一次哈希。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 追加在末尾：run 要解析为 bench/run.py 而不是 backend/run.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.passwords import hash_password, verify_password
+from common import BENCH_PASSWORD, free_port, start_server, stop_server
+from run import discover, run_scenario
+
+DEFAULT_CONFIGS = ['bcrypt:10', 'bcrypt:12', 'scrypt', 'pbkdf2:sha256:600000']
+
+
+def parse_config(spec):
+    """'bcrypt:12' -> ('bcrypt', 12)，其他原样作为 Werkzeug 方法名"""
+    if spec.startswith('bcrypt'):
+        _, _, rounds = spec.partition(':')
+        return 'bcrypt', int(rounds or 12)
+    return spec, None
+
+
+def measure_verify(password_hash, threads, seconds):
+    """threads 个线程持续校验 seconds 秒，返回每秒校验次数"""
+    deadline = time.perf_counter() + seconds
+
+    def worker(_):
+        count = 0
+        while time.perf_counter() < deadline:
+            verify_password(password_hash, BENCH_PASSWORD)
+            count += 1
+        return count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        total = sum(executor.map(worker, range(threads)))
+    return total / (time.perf_counter() - started)
+
+
+def measure_login(spec, args, cpu_count):
+    algorithm, rounds = parse_config(spec)
+    env = {'SESSION_COOKIE_SECURE': 'False', 'PASSWORD_HASH_ALGORITHM': algorithm}
+    if rounds is not None:
+        env['PASSWORD_BCRYPT_ROUNDS'] = str(rounds)
+    port = free_port()
+    process = start_server(args.server, port, env)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        ctx = discover(base_url, args.login_users)
+
+        def make_request(rng, ctx):
+            return 'POST', '/api/auth/login', {
+                'username': f"bench_{rng.randrange(ctx['users'])}", 'password': BENCH_PASSWORD
+            }
+
+        # 预热：把用到的压测用户的哈希升级为当前配置
+        run_scenario(base_url, ctx, False, make_request, args.concurrency, args.warmup, 0)
+        result = run_scenario(base_url, ctx, False, make_request, args.concurrency, args.duration, 1)
+    finally:
+        stop_server(process)
+    result['throughput_per_core'] = round(result.get('throughput_rps', 0) / cpu_count, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='密码哈希算法/代价与登录吞吐的对照')
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS)
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1, help='并行校验的线程数')
+    parser.add_argument('--seconds', type=float, default=3, help='每种配置的校验计时秒数')
+    parser.add_argument('--server', choices=['devserver', 'gunicorn'], help='同时压测登录接口')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--login-users', type=int, default=32)
+    parser.add_argument('--output', help='结果 JSON 文件')
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    report = {'cpu_count': cpu_count, 'threads': args.threads, 'results': {}}
+    for spec in args.configs:
+        algorithm, rounds = parse_config(spec)
+        password_hash = hash_password(BENCH_PASSWORD, algorithm, rounds)
+        result = {
+            'verify_per_core': round(measure_verify(password_hash, 1, args.seconds), 1),
+            'verify_parallel': round(measure_verify(password_hash, args.threads, args.seconds), 1)
+        }
+        if args.server:
+            result['login'] = measure_login(spec, args, cpu_count)
+        report['results'][spec] = result
+        print(f'{spec}: {result}', flush=True)
+
+    print(f"\n{'配置':<24}{'单核校验/s':>12}{f'{args.threads} 线程校验/s':>16}"
+          + (f"{'登录 req/s':>12}{'每核登录 req/s':>16}{'登录 p95(ms)':>14}" if args.server else ''))
+    for spec, result in report['results'].items():
+        line = f"{spec:<24}{result['verify_per_core']:>12}{result['verify_parallel']:>16}"
+        if args.server:
+            login = result['login']
+            line += f"{login.get('throughput_rps', 0):>12}{login['throughput_per_core']:>16}{login.get('p95_ms', '-'):>14}"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
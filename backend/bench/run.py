@@ -0,0 +1,253 @@
+"""API 压测
+
+依次压测各热点接口，每个场景以 --concurrency 个并发客户端持续 --duration 秒，
+统计 p50/p95/p99 延迟、吞吐和每个请求执行的 SQL 条数（读取 X-Query-Count 响应头），
+结果打印为表格并保存为 JSON，便于不同版本之间对比：
+
+    DATABASE_URL=sqlite:////tmp/bench.db python bench/seed.py
+    DATABASE_URL=sqlite:////tmp/bench.db python bench/run.py --output before.json
+    DATABASE_URL=sqlite:////tmp/bench.db python bench/run.py --output after.json --baseline before.json
+    python bench/run.py --scenarios 'list:*' detail --concurrency 32
+
+默认自行启动服务（--server devserver/gunicorn，打开 QUERY_COUNT_HEADER），
+也可以用 --url 压测已经在运行的服务（需要该服务设置 QUERY_COUNT_HEADER=true 才有 SQL 条数）。
+登录态场景使用 seed.py 生成的 bench_<序号> 用户，每个并发客户端登录一个用户。
+"""
+import argparse
+import fnmatch
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+
+from common import BACKEND_DIR, BENCH_PASSWORD, free_port, start_server, stop_server, summarize
+
+KEYWORDS = ['吉他', 'Yamaha', '电钢琴', '小提琴', '萨克斯', 'Roland', '尤克里里', '二胡']
+
+# 列表接口的筛选条件：名称 -> 生成查询参数的函数
+LIST_FILTERS = {
+    'none': lambda rng, ctx: {},
+    'category': lambda rng, ctx: {'category_id': rng.choice(ctx['categories'])},
+    'condition': lambda rng, ctx: {'condition': rng.choice(['new', 'like_new', 'good', 'fair', 'poor'])},
+    'price': lambda rng, ctx: {'min_price': rng.choice([0, 200, 500]), 'max_price': rng.choice([1000, 2000, 5000])},
+    'keyword': lambda rng, ctx: {'keyword': rng.choice(KEYWORDS)},
+    'combined': lambda rng, ctx: {'category_id': rng.choice(ctx['categories']), 'condition': 'good',
+                                  'min_price': 200, 'max_price': 3000},
+    'facets': lambda rng, ctx: {'category_id': rng.choice(ctx['categories']), 'facets': 'true'}
+}
+
+LIST_SORTS = {
+    'newest': {'sort_by': 'created_at', 'sort_order': 'desc'},
+    'price_asc': {'sort_by': 'price', 'sort_order': 'asc'},
+    'price_desc': {'sort_by': 'price', 'sort_order': 'desc'},
+    'popular': {'sort_by': 'view_count', 'sort_order': 'desc'}
+}
+
+
+def build_scenarios():
+    """场景名 -> (是否需要登录, 生成 (方法, 路径, JSON 请求体) 的函数)"""
+    scenarios = {}
+    for filter_name, make_filter in LIST_FILTERS.items():
+        for sort_name, sort in LIST_SORTS.items():
+            def request_list(rng, ctx, make_filter=make_filter, sort=sort):
+                params = dict(make_filter(rng, ctx), page=rng.randint(1, 3), **sort)
+                return 'GET', f'/api/instruments?{urlencode(params)}', None
+            scenarios[f'list:{filter_name}:{sort_name}'] = (False, request_list)
+
+    scenarios['detail'] = (False, lambda rng, ctx: ('GET', f"/api/instruments/{rng.randint(1, ctx['max_instrument_id'])}", None))
+    scenarios['hot'] = (False, lambda rng, ctx: ('GET', '/api/instruments/hot', None))
+    scenarios['suggestions'] = (False, lambda rng, ctx: ('GET', f"/api/search/suggestions?{urlencode({'q': rng.choice(KEYWORDS)})}", None))
+    scenarios['cart'] = (True, lambda rng, ctx: ('GET', '/api/cart', None))
+    scenarios['orders'] = (True, lambda rng, ctx: ('GET', '/api/orders', None))
+    scenarios['login'] = (False, lambda rng, ctx: ('POST', '/api/auth/login', {
+        'username': f"bench_{rng.randrange(ctx['users'])}", 'password': BENCH_PASSWORD
+    }))
+    return scenarios
+
+
+class Client:
+    """带独立 cookie 的 HTTP 客户端，相当于一个浏览器"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def send(self, method, path, body=None):
+        """返回 (状态码, SQL 条数或 None)"""
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            status, headers = e.code, e.headers
+        count = headers.get('X-Query-Count')
+        return status, int(count) if count is not None else None
+
+    def login(self, username):
+        status, _ = self.send('POST', '/api/auth/login', {'username': username, 'password': BENCH_PASSWORD})
+        if status != 200:
+            raise RuntimeError(f'{username} 登录失败（{status}），请先用 seed.py 生成压测数据，'
+                               f'并确认服务的 SESSION_COOKIE_SECURE=False')
+
+
+def discover(base_url, users):
+    """从接口读出分类和乐器 ID 范围"""
+    client = Client(base_url)
+    with client.opener.open(base_url + '/api/categories') as response:
+        categories = [category['id'] for category in json.load(response)['categories']]
+    with client.opener.open(base_url + '/api/instruments?sort_by=id&sort_order=desc&page_size=1') as response:
+        instruments = json.load(response)['instruments']
+    if not instruments:
+        raise RuntimeError('数据库中没有乐器，请先运行 bench/seed.py')
+    return {'categories': categories, 'max_instrument_id': instruments[0]['id'], 'users': users}
+
+
+def run_scenario(base_url, ctx, needs_login, make_request, concurrency, duration, seed):
+    """并发执行一个场景 duration 秒，返回统计结果"""
+    clients = [Client(base_url) for _ in range(concurrency)]
+    if needs_login:
+        for index, client in enumerate(clients):
+            client.login(f"bench_{index % ctx['users']}")
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = clients[index]
+        latencies, queries, errors = [], [], 0
+        while time.perf_counter() < deadline:
+            method, path, body = make_request(rng, ctx)
+            start = time.perf_counter()
+            try:
+                status, count = client.send(method, path, body)
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if count is not None:
+                queries.append(count)
+        return latencies, queries, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [value for result in results for value in result[0]]
+    queries = [value for result in results for value in result[1]]
+    summary = summarize(latencies, sum(result[2] for result in results), elapsed)
+    summary['queries_per_request'] = round(sum(queries) / len(queries), 2) if queries else None
+    summary['queries_max'] = max(queries) if queries else None
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(new, old):
+    if not new or not old:
+        return '-'
+    return f'{(new - old) / old * 100:+.1f}%'
+
+
+def print_report(report, baseline=None):
+    print(f"\n{'场景':<28}{'请求数':>8}{'错误':>6}{'吞吐(req/s)':>13}{'p50(ms)':>10}{'p95(ms)':>10}"
+          f"{'p99(ms)':>10}{'SQL/请求':>10}" + (f"{'p95 变化':>10}{'吞吐变化':>10}" if baseline else ''))
+    for name, result in report['results'].items():
+        line = (f"{name:<28}{result['requests']:>8}{result['errors']:>6}{result.get('throughput_rps', 0):>13}"
+                f"{result.get('p50_ms', '-'):>10}{result.get('p95_ms', '-'):>10}{result.get('p99_ms', '-'):>10}"
+                f"{result.get('queries_per_request') if result.get('queries_per_request') is not None else '-':>10}")
+        if baseline:
+            old = baseline['results'].get(name, {})
+            line += f"{change(result.get('p95_ms'), old.get('p95_ms')):>10}" \
+                    f"{change(result.get('throughput_rps'), old.get('throughput_rps')):>10}"
+        print(line)
+
+
+def main():
+    scenarios = build_scenarios()
+    parser = argparse.ArgumentParser(description='API 压测')
+    parser.add_argument('--url', help='压测已在运行的服务，例如 http://127.0.0.1:5000')
+    parser.add_argument('--server', default='gunicorn', choices=['devserver', 'gunicorn'], help='未指定 --url 时启动的服务')
+    parser.add_argument('--no-cache', action='store_true', help='关闭响应缓存（只对自行启动的服务有效）')
+    parser.add_argument('--scenarios', nargs='+', default=['*'], help='场景名，支持通配符，例如 list:*:newest')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help='每个场景的压测秒数')
+    parser.add_argument('--warmup', type=float, default=1, help='每个场景正式计时前的预热秒数')
+    parser.add_argument('--users', type=int, default=5000, help='seed.py 生成的用户数')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='结果 JSON 文件')
+    parser.add_argument('--baseline', help='上一次的结果 JSON，打印 p95 和吞吐的变化')
+    parser.add_argument('--list', action='store_true', help='只列出场景名')
+    args = parser.parse_args()
+
+    selected = [name for name in scenarios if any(fnmatch.fnmatch(name, pattern) for pattern in args.scenarios)]
+    if args.list or not selected:
+        print('\n'.join(selected or scenarios))
+        return
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        env = {'QUERY_COUNT_HEADER': 'true', 'SESSION_COOKIE_SECURE': 'False'}
+        if args.no_cache:
+            env['CACHE_ENABLED'] = 'False'
+        process = start_server(args.server, port, env)
+        base_url = f'http://127.0.0.1:{port}'
+
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'server': args.url or args.server,
+        'cache': not args.no_cache,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'cpu_count': os.cpu_count(),
+        'results': {}
+    }
+    try:
+        ctx = discover(base_url, args.users)
+        for name in selected:
+            needs_login, make_request = scenarios[name]
+            if args.warmup:
+                run_scenario(base_url, ctx, needs_login, make_request, args.concurrency, args.warmup, args.seed)
+            result = run_scenario(base_url, ctx, needs_login, make_request, args.concurrency, args.duration, args.seed)
+            report['results'][name] = result
+            print(f"{name}: {result.get('throughput_rps', 0)} req/s, p95 {result.get('p95_ms', '-')} ms", flush=True)
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
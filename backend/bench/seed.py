@@ -0,0 +1,252 @@
+"""生成压测用的合成数据
+
+通过应用的模型写入 DATABASE_URL 指向的数据库（请使用单独的压测库）：
+
+    DATABASE_URL=sqlite:////tmp/bench.db python bench/seed.py
+    DATABASE_URL=mysql+pymysql://root:pw@localhost/bench python bench/seed.py --users 5000 --instruments 300000
+
+默认生成 5000 个用户、20 万件乐器（每件 1~4 张图片）、10 万条收藏、2 万个订单和 1 万条购物车记录。
+价格、成色、分类、浏览量和发布时间按接近真实的分布随机生成，--seed 相同时结果可复现。
+所有压测用户的密码都是 BENCH_PASSWORD，用户名为 bench_<序号>。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import bindparam
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models import db, User, Category, Instrument, InstrumentImage, Favorite, Cart, Order
+from common import BENCH_PASSWORD
+
+BRANDS = {
+    '吉他': ['Yamaha', 'Taylor', 'Martin', 'Fender', 'Gibson', 'Epiphone', '红棉', '卡马'],
+    '钢琴': ['Yamaha', 'Kawai', '珠江', '星海', 'Roland', 'Casio'],
+    '小提琴': ['Stentor', '凤灵', '金音', 'Yamaha'],
+    '鼓': ['Pearl', 'Tama', 'Roland', 'Alesis', '星际'],
+    '管乐': ['Yamaha', 'Selmer', 'Jupiter', '金声'],
+    '电子乐器': ['Roland', 'Korg', 'Nord', 'Casio', 'Arturia'],
+    '其他': ['Kala', 'Hohner', 'Suzuki', '敦煌']
+}
+KINDS = {
+    '吉他': ['民谣吉他', '古典吉他', '电吉他', '电贝斯', '尤克里里'],
+    '钢琴': ['立式钢琴', '电钢琴', '数码钢琴'],
+    '小提琴': ['小提琴', '中提琴', '大提琴'],
+    '鼓': ['电子鼓', '架子鼓', '非洲鼓', '卡洪鼓'],
+    '管乐': ['长笛', '萨克斯', '单簧管', '小号'],
+    '电子乐器': ['合成器', 'MIDI键盘', '效果器', '音箱'],
+    '其他': ['口琴', '古筝', '二胡', '竹笛', '琵琶']
+}
+ADJECTIVES = ['九成新', '自用', '毕业出', '闲置', '低价转', '送琴包', '音色好', '成色不错']
+CONDITIONS = (['new', 'like_new', 'good', 'fair', 'poor'], [5, 25, 45, 20, 5])
+STATUSES = (['available', 'sold', 'pending', 'removed'], [80, 12, 3, 5])
+ORDER_STATUSES = (['pending', 'paid', 'shipped', 'completed', 'cancelled'], [15, 10, 10, 55, 10])
+LOCATIONS = ['东区宿舍', '西区宿舍', '图书馆', '音乐学院', '南门', '北门', '体育馆']
+
+
+def batched(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+def progress(label, done, total, started):
+    print(f"\r{label}: {done}/{total}（{time.time() - started:.0f}s）", end='', flush=True)
+    if done >= total:
+        print()
+
+
+def seed_users(count, batch_size, rng, now):
+    # 每个用户单独计算密码哈希太慢，所有压测用户共用同一个哈希
+    template = User()
+    template.set_password(BENCH_PASSWORD)
+    password_hash = template.password_hash
+
+    started, ids = time.time(), []
+    for start, size in batched(count, batch_size):
+        users = [
+            User(
+                username=f'bench_{i}',
+                email=f'bench_{i}@bench.local',
+                phone=f'139{i:08d}',
+                password_hash=password_hash,
+                real_name=f'压测用户{i}',
+                student_id=f'2024{i:06d}',
+                # 前 30% 的用户是卖家（发布乐器），卖家必须已验证才能登录
+                role='seller' if i < count * 3 // 10 else 'user',
+                is_verified=i < count * 3 // 10 or rng.random() < 0.5,
+                created_at=now - timedelta(days=rng.uniform(0, 730))
+            )
+            for i in range(start, start + size)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        # 提交后属性会过期，读取要逐行回查，所以在提交前取 id
+        ids.extend(user.id for user in users)
+        db.session.commit()
+        progress('用户', start + size, count, started)
+    return ids
+
+
+def seed_instruments(count, user_ids, categories, max_images, batch_size, rng, now):
+    started, rows = time.time(), []
+    sellers = user_ids[:max(1, len(user_ids) * 3 // 10)]
+    for start, size in batched(count, batch_size):
+        instruments = []
+        for _ in range(size):
+            category = rng.choice(categories)
+            kinds = KINDS.get(category.name, KINDS['其他'])
+            brand = rng.choice(BRANDS.get(category.name, BRANDS['其他']))
+            kind = rng.choice(kinds)
+            # 二手乐器价格大致服从对数正态分布，集中在几百到几千元
+            price = Decimal(str(round(min(max(rng.lognormvariate(6.6, 1.0), 20), 80000), 2)))
+            created_at = now - timedelta(days=rng.expovariate(1 / 90))
+            instruments.append(Instrument(
+                title=f'{rng.choice(ADJECTIVES)} {brand} {kind}',
+                description=f'{brand} {kind}，{rng.choice(ADJECTIVES)}，可在{rng.choice(LOCATIONS)}面交。',
+                price=price,
+                original_price=(price * Decimal('1.6')).quantize(Decimal('0.01')),
+                category_id=category.id,
+                user_id=rng.choice(sellers),
+                instrument_condition=rng.choices(*CONDITIONS)[0],
+                brand=brand,
+                model=f'{kind[:2]}-{rng.randint(100, 999)}',
+                status=rng.choices(*STATUSES)[0],
+                view_count=int(rng.paretovariate(1.2) * 5),
+                location=rng.choice(LOCATIONS),
+                created_at=created_at,
+                updated_at=created_at
+            ))
+        db.session.add_all(instruments)
+        db.session.flush()
+
+        for instrument in instruments:
+            for index in range(rng.randint(1, max_images)):
+                db.session.add(InstrumentImage(
+                    instrument_id=instrument.id,
+                    image_url=f'instruments/bench_{instrument.id}_{index}.jpg',
+                    is_main=index == 0,
+                    sort_order=index,
+                    created_at=instrument.created_at
+                ))
+        rows.extend((instrument.id, instrument.user_id, instrument.price, instrument.status)
+                    for instrument in instruments)
+        db.session.commit()
+        progress('乐器', start + size, count, started)
+    return rows
+
+
+def seed_favorites(count, user_ids, instruments, batch_size, rng):
+    started, seen, favorite_counts = time.time(), set(), {}
+    for start, size in batched(count, batch_size):
+        favorites = []
+        while len(favorites) < size:
+            # 热门乐器集中了大部分收藏
+            instrument_id = instruments[min(int(rng.paretovariate(1.1)) - 1, len(instruments) - 1)][0] \
+                if rng.random() < 0.3 else rng.choice(instruments)[0]
+            key = (rng.choice(user_ids), instrument_id)
+            if key in seen:
+                continue
+            seen.add(key)
+            favorite_counts[instrument_id] = favorite_counts.get(instrument_id, 0) + 1
+            favorites.append(Favorite(user_id=key[0], instrument_id=instrument_id))
+        db.session.add_all(favorites)
+        db.session.commit()
+        progress('收藏', start + size, count, started)
+
+    # 收藏数与收藏记录保持一致
+    table = Instrument.__table__
+    stmt = table.update().where(table.c.id == bindparam('instrument_id')).values(
+        favorite_count=bindparam('favorite_count'), updated_at=table.c.updated_at
+    )
+    db.session.execute(stmt, [
+        {'instrument_id': instrument_id, 'favorite_count': favorite_count}
+        for instrument_id, favorite_count in favorite_counts.items()
+    ])
+    db.session.commit()
+
+
+def seed_orders(count, user_ids, instruments, batch_size, rng, now):
+    started = time.time()
+    for start, size in batched(count, batch_size):
+        orders = []
+        for _ in range(size):
+            instrument_id, seller_id, price, _ = rng.choice(instruments)
+            buyer_id = rng.choice(user_ids)
+            created_at = now - timedelta(days=rng.expovariate(1 / 60))
+            orders.append(Order(
+                instrument_id=instrument_id,
+                buyer_id=buyer_id,
+                seller_id=seller_id,
+                total_price=price,
+                status=rng.choices(*ORDER_STATUSES)[0],
+                payment_method=rng.choice(['wechat', 'alipay', 'cash']),
+                meeting_place=rng.choice(LOCATIONS),
+                created_at=created_at,
+                updated_at=created_at
+            ))
+        db.session.add_all(orders)
+        db.session.commit()
+        progress('订单', start + size, count, started)
+
+
+def seed_carts(count, user_ids, instruments, batch_size, rng):
+    started, seen = time.time(), set()
+    available = [row for row in instruments if row[3] == 'available'] or instruments
+    for start, size in batched(count, batch_size):
+        items = []
+        while len(items) < size:
+            key = (rng.choice(user_ids), rng.choice(available)[0])
+            if key in seen:
+                continue
+            seen.add(key)
+            items.append(Cart(user_id=key[0], instrument_id=key[1]))
+        db.session.add_all(items)
+        db.session.commit()
+        progress('购物车', start + size, count, started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成压测用的合成数据')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--instruments', type=int, default=200000)
+    parser.add_argument('--max-images', type=int, default=4, help='每件乐器的最多图片数')
+    parser.add_argument('--favorites', type=int, default=100000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--carts', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42, help='随机种子，相同种子生成相同数据')
+    args = parser.parse_args()
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    with app.app_context():
+        if User.query.filter(User.username.like('bench\\_%', escape='\\')).first():
+            print('数据库中已有压测数据，请换一个空库（DATABASE_URL）')
+            return 1
+        categories = Category.query.order_by(Category.id).all()
+        if not categories:
+            print('没有分类数据，请先执行 flask migrate')
+            return 1
+
+        started = time.time()
+        user_ids = seed_users(args.users, args.batch_size, rng, now)
+        instruments = seed_instruments(args.instruments, user_ids, categories, args.max_images,
+                                       args.batch_size, rng, now)
+        seed_favorites(min(args.favorites, len(user_ids) * len(instruments) // 2), user_ids, instruments,
+                       args.batch_size, rng)
+        seed_orders(args.orders, user_ids, instruments, args.batch_size, rng, now)
+        seed_carts(min(args.carts, len(user_ids) * len(instruments) // 2), user_ids, instruments,
+                   args.batch_size, rng)
+        print(f'完成，用时 {time.time() - started:.0f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""gunicorn 配置（gunicorn -c gunicorn.conf.py wsgi:app）
+
+- 默认 gthread worker：每个 worker 进程内多线程处理请求，上传、联系卖家发邮件等慢 I/O
+  只占一个线程，不会卡住同一进程的其他请求；async def 视图在所在线程的事件循环中运行；
+- 平滑重启：kill -HUP <master pid> 逐个替换 worker，旧 worker 处理完当前请求
+  （最多 GUNICORN_GRACEFUL_TIMEOUT 秒）后退出；GUNICORN_MAX_REQUESTS 可让 worker 定期轮换；
+- worker 退出前把缓冲的浏览量和浏览历史写入数据库。
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# 进程数默认 CPU 核数 * 2 + 1，WEB_CONCURRENCY 是 Heroku 等平台的约定变量
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))  # 秒，worker 无响应超过该时间会被重启
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))  # 秒，重启/停止时等待处理中的请求
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# 处理一定数量请求后轮换 worker（0 表示不轮换），抖动避免所有 worker 同时重启。
+# 新 worker 要重建搜索索引、热度榜和响应缓存，轮换过频会在压测中表现为秒级的 p99
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# 预加载时迁移只在 master 中执行一次，worker 共享只读内存；代码变更需要完整重启而不是 HUP
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+# 开发时代码变更自动重载
+reload = os.environ.get('GUNICORN_RELOAD', 'false').lower() == 'true'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None  # 设为空关闭访问日志
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+# 反向代理传来的 X-Forwarded-* 头
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def post_fork(server, worker):
+    """预加载模式下 master 打开过的数据库连接不能在 worker 间共用"""
+    if not preload_app:
+        return
+    from app.models import db
+    from wsgi import app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    """worker 退出前把缓冲中的写入落库"""
+    from app.view_counter import view_counter
+    from app.view_history import view_history
+    view_counter.flush()
+    view_history.drain()
@@ -0,0 +1,164 @@
+"""索引检查工具
+
+按 routes.py / auth.py 中的查询形状构造同样的 SQL，在当前配置的数据库上执行 EXPLAIN，
+报告没有用上索引的全表扫描。新增筛选条件或排序后运行一次，发现全表扫描时以状态码 1 退出：
+
+    python index_advisor.py            # 只列出有问题的查询
+    python index_advisor.py --verbose  # 同时打印每条查询的执行计划
+
+判断方式：
+- SQLite：EXPLAIN QUERY PLAN 中出现不带 USING INDEX 的 SCAN <表>；
+- MySQL：EXPLAIN 的 type 为 ALL 且 possible_keys 为空（没有任何可用索引，
+  小表上优化器主动选择全表扫描不算问题）；
+- PostgreSQL：关闭 enable_seqscan 后执行计划中仍有 Seq Scan。
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import desc, func, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.models import db, User, Category, Instrument, InstrumentImage, Favorite, Cart, Order, ViewHistory, DailyStat
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN <语句>"""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = 'EXPLAIN QUERY PLAN ' if compiler.dialect.name == 'sqlite' else 'EXPLAIN '
+    sql = compiler.process(element.statement, **kw)
+    # 返回的是执行计划，不能套用原语句各列的结果类型转换
+    compiler._result_columns = []
+    return prefix + sql
+
+
+def query_shapes():
+    """(名称, 查询, 允许全表扫描的原因)；原因为 None 表示必须走索引"""
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    available = Instrument.query.filter_by(status='available')
+
+    return [
+        # ---------- auth.py ----------
+        ('auth.login', User.query.filter(or_(User.username == '13800000000', User.email == '13800000000',
+                                             User.phone == '13800000000')), None),
+        ('load_user', User.query.filter_by(id=1), None),
+
+        # ---------- 乐器列表 ----------
+        ('get_instruments 最新', available.order_by(desc(Instrument.created_at), desc(Instrument.id)).limit(12), None),
+        ('get_instruments 分类', available.filter_by(category_id=1).order_by(desc(Instrument.created_at)).limit(12), None),
+        ('get_instruments 价格区间', available.filter(Instrument.price >= 100, Instrument.price <= 500)
+            .order_by(Instrument.price).limit(12), None),
+        ('get_instruments 关键词', available.filter(Instrument.id.in_([1, 2, 3])), None),
+        ('get_instruments 分面计数', db.session.query(Instrument.category_id, Instrument.instrument_condition,
+            func.count(Instrument.id)).filter(Instrument.status == 'available')
+            .group_by(Instrument.category_id, Instrument.instrument_condition), None),
+        ('get_hot_instruments / ranking.refresh', db.session.query(Instrument.id, Instrument.view_count)
+            .filter(Instrument.status == 'available', Instrument.created_at >= now - timedelta(days=7)), None),
+        ('search.refresh 增量', db.session.query(Instrument.id).filter(Instrument.updated_at >= now - timedelta(minutes=1)), None),
+        ('get_user_instruments', Instrument.query.filter_by(user_id=1).order_by(desc(Instrument.created_at)), None),
+        ('get_user_instruments_list', Instrument.query.filter_by(user_id=1, status='available')
+            .order_by(desc(Instrument.created_at)).limit(12), None),
+
+        # ---------- 图片 ----------
+        ('serialize_instruments 图片', InstrumentImage.query.filter(InstrumentImage.instrument_id.in_([1, 2, 3]))
+            .order_by(InstrumentImage.instrument_id, InstrumentImage.is_main.desc(), InstrumentImage.sort_order), None),
+        ('Instrument.to_dict 图片', InstrumentImage.query.filter_by(instrument_id=1)
+            .order_by(InstrumentImage.is_main.desc(), InstrumentImage.sort_order), None),
+
+        # ---------- 收藏、购物车、订单、浏览历史 ----------
+        ('get_instrument_detail 是否收藏', Favorite.query.filter_by(user_id=1, instrument_id=1), None),
+        ('get_user_favorites', Favorite.query.filter_by(user_id=1), None),
+        ('get_cart', Cart.query.filter_by(user_id=1), None),
+        ('get_user_orders 买家', Order.query.filter_by(buyer_id=1), None),
+        ('get_user_orders 卖家', Order.query.filter_by(seller_id=1), None),
+        ('浏览历史', ViewHistory.query.filter_by(user_id=1).order_by(desc(ViewHistory.viewed_at)).limit(20), None),
+
+        # ---------- 仪表板 ----------
+        ('dashboard 合计', db.session.query(func.sum(DailyStat.new_users)), '每天一行的汇总表'),
+        ('statistics/timeseries', DailyStat.query.filter(DailyStat.day >= today.date() - timedelta(days=29),
+                                                         DailyStat.day <= today.date()), None),
+        ('rollups 对账 新增用户', db.session.query(func.date(User.created_at), func.count())
+            .filter(User.created_at >= today).group_by(func.date(User.created_at)), None),
+        ('rollups 对账 新增乐器', db.session.query(func.date(Instrument.created_at), func.count())
+            .filter(Instrument.created_at >= today).group_by(func.date(Instrument.created_at)), None),
+        ('rollups 对账 新增订单', db.session.query(func.date(Order.created_at), func.count())
+            .filter(Order.created_at >= today).group_by(func.date(Order.created_at)), None),
+        ('rollups 对账 已完成订单', db.session.query(func.date(Order.updated_at), func.sum(Order.total_price))
+            .filter(Order.status == 'completed', Order.updated_at >= today).group_by(func.date(Order.updated_at)), None),
+
+        # ---------- 分类 ----------
+        ('get_categories', Category.query.order_by(Category.sort_order, Category.name), '分类表只有几行'),
+        ('get_search_suggestions 分类', Category.query.filter(Category.name.ilike('%吉他%')).limit(5), '以通配符开头的模糊匹配无法走索引，分类表只有几行'),
+    ]
+
+
+def full_scans(conn, statement):
+    """返回 (执行计划文本行, 全表扫描的表名列表)"""
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+
+    rows = conn.execute(Explain(statement)).mappings().all()
+    plan, tables = [], []
+    for row in rows:
+        if dialect == 'sqlite':
+            detail = row['detail']
+            plan.append(detail)
+            if detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail:
+                tables.append(detail.split()[1])
+        elif dialect == 'mysql':
+            plan.append(', '.join(f'{key}={value}' for key, value in row.items()))
+            if row.get('type') == 'ALL' and not row.get('possible_keys'):
+                tables.append(row.get('table'))
+        else:
+            line = next(iter(row.values()))
+            plan.append(line)
+            if 'Seq Scan on' in line:
+                tables.append(line.split('Seq Scan on', 1)[1].split()[0])
+    return plan, tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查路由查询是否走索引')
+    parser.add_argument('--verbose', action='store_true', help='打印每条查询的执行计划')
+    args = parser.parse_args()
+
+    app = create_app()
+    problems = 0
+    with app.app_context():
+        with db.engine.connect() as conn:
+            for name, query, allowed in query_shapes():
+                with conn.begin():
+                    plan, tables = full_scans(conn, query.statement)
+                if tables and allowed is None:
+                    problems += 1
+                    print(f"❌ {name}: 全表扫描 {', '.join(tables)}")
+                elif tables:
+                    print(f"⚠️ {name}: 全表扫描 {', '.join(tables)}（允许：{allowed}）")
+                elif args.verbose:
+                    print(f"✅ {name}")
+                if args.verbose:
+                    for line in plan:
+                        print(f"      {line}")
+
+    print(f"\n发现 {problems} 条需要索引的查询" if problems else "\n所有查询都能用上索引")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,11 @@
 import os
 import sys
 from app import create_app
-from database import init_db
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# 检查并初始化数据库
-print("🔧 正在检查数据库...")
-try:
-    init_db()
-    print("✅ 数据库初始化完成")
-except Exception as e:
-    print(f"⚠️ 数据库初始化失败: {e}")
-    print("尝试继续启动...")
-
-# 创建Flask应用
+# 创建Flask应用（启动时只检查数据库结构版本，需要时执行迁移，不会删除数据）
 app = create_app()
 
 @app.route('/')
@@ -115,13 +105,6 @@ def home():
     
     return render_template_string(template, port=port, debug=debug)
 
-@app.route('/static/<path:filename>')
-def serve_static(filename):
-    """提供静态文件"""
-    from flask import send_from_directory
-    static_folder = os.path.join(os.path.dirname(__file__), 'static')
-    return send_from_directory(static_folder, filename)
-
 if __name__ == '__main__':
     # 确保上传目录存在
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -138,7 +121,7 @@ if __name__ == '__main__':
     print(f"🔗 静态文件: http://127.0.0.1:{os.environ.get('PORT', 5000)}/static")
     print("="*50)
     print("\n📋 可用命令:")
-    print("  • python database.py - 重新初始化数据库")
+    print("  • python database.py - 创建数据库并升级表结构（不删除数据）")
     print("  • python run.py - 启动服务器")
     print("  • curl http://localhost:5000/api/categories - 测试API")
     print("\n🚀 正在启动服务器...\n")
@@ -0,0 +1,114 @@
+"""测试夹具：内存 SQLite 上的应用和 SQL 计数"""
+import os
+import sys
+import threading
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.config import Config
+from app.models import db, User, Category, Instrument, InstrumentImage, Favorite, Cart, Order
+
+PASSWORD = 'secret123'
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    DATABASE_REPLICA_URLS = []
+    SESSION_COOKIE_SECURE = False
+    WTF_CSRF_ENABLED = False
+    # 关掉进程内缓存和后台刷新，每次请求的 SQL 条数才是确定的
+    CACHE_ENABLED = False
+    USER_CACHE_ENABLED = False
+    VIEW_COUNT_FLUSH_INTERVAL = 0
+    ROLLUP_RECONCILE_INTERVAL = 0
+    IMAGE_PROCESSING_MODE = 'sync'
+    AUDIO_PROCESSING_MODE = 'sync'
+    PASSWORD_HASH_MODE = 'sync'
+    PASSWORD_BCRYPT_ROUNDS = 4
+
+
+class QueryCounter:
+    """统计当前线程执行的 SQL 条数（忽略后台线程）"""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._thread = threading.get_ident()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.count += 1
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        app.config['SEED_USER_IDS'] = seed()
+    return app
+
+
+@pytest.fixture(scope='session')
+def user_ids(app):
+    return app.config['SEED_USER_IDS']
+
+
+@pytest.fixture
+def login(app):
+    def login(username):
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+        assert response.status_code == 200
+        return client
+    return login
+
+
+@pytest.fixture(scope='session')
+def query_counter(app):
+    with app.app_context():
+        return QueryCounter(db.engine)
+
+
+def seed():
+    """数据量不同的两组用户：light 发布 2 件、收藏/加购/下单各 2 件；
+    seller 发布其余 38 件，heavy 收藏/加购/下单各 20 件"""
+    categories = [Category(name=f'分类{i}') for i in range(3)]
+    db.session.add_all(categories)
+    users = {}
+    for name, role in [('seller', 'seller'), ('light', 'seller'), ('heavy', 'user')]:
+        user = User(username=name, email=f'{name}@example.com', role=role, is_verified=True)
+        user.set_password(PASSWORD)
+        users[name] = user
+    db.session.add_all(users.values())
+    db.session.flush()
+
+    instruments = []
+    for i in range(40):
+        owner = users['light'] if i >= 38 else users['seller']
+        instrument = Instrument(
+            title=f'Yamaha 吉他 {i}', description='民谣吉他', price=Decimal(100 + i),
+            category_id=categories[i % 3].id, user_id=owner.id, brand='Yamaha'
+        )
+        db.session.add(instrument)
+        instruments.append(instrument)
+    db.session.flush()
+    for instrument in instruments:
+        for index in range(2):
+            db.session.add(InstrumentImage(instrument_id=instrument.id, image_url=f'instruments/{instrument.id}_{index}.jpg',
+                                           is_main=index == 0, sort_order=index))
+
+    for name, count in [('light', 2), ('heavy', 20)]:
+        user = users[name]
+        for instrument in instruments[:count]:
+            db.session.add(Favorite(user_id=user.id, instrument_id=instrument.id))
+            db.session.add(Cart(user_id=user.id, instrument_id=instrument.id))
+            db.session.add(Order(instrument_id=instrument.id, buyer_id=user.id, seller_id=users['seller'].id,
+                                 total_price=instrument.price))
+    db.session.commit()
+    return {name: user.id for name, user in users.items()}
@@ -0,0 +1,75 @@
+"""分片上传：偏移校验、魔数校验、完成后发布时引用"""
+import os
+
+import pytest
+
+from app.chunked_upload import chunked_uploads
+from app.models import db, Instrument
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 56
+
+
+@pytest.fixture
+def client(app, login, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    return login('light')
+
+
+def create_upload(client, size, filename='photo.png', kind='image'):
+    response = client.post('/api/uploads', json={'filename': filename, 'size': size, 'kind': kind})
+    assert response.status_code == 201
+    return response.get_json()['upload']['upload_id']
+
+
+def put_chunk(client, upload_id, offset, data):
+    return client.put(f'/api/uploads/{upload_id}?offset={offset}', data=data,
+                      content_type='application/octet-stream')
+
+
+def test_offset_mismatch_is_rejected(client):
+    upload_id = create_upload(client, len(PNG))
+    assert put_chunk(client, upload_id, 0, PNG[:32]).status_code == 200
+    # 重发已收到的分片或跳过一段都不允许
+    assert put_chunk(client, upload_id, 0, PNG[:32]).status_code == 409
+    assert put_chunk(client, upload_id, 40, PNG[40:]).status_code == 409
+    assert client.get(f'/api/uploads/{upload_id}').get_json()['upload']['offset'] == 32
+
+
+def test_content_not_matching_kind_is_rejected(client):
+    upload_id = create_upload(client, 64)
+    response = put_chunk(client, upload_id, 0, b'<html>' + b'\x00' * 58)
+    assert response.status_code == 400
+    # 上传被终止，相关文件全部删除
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+    assert not [name for name in os.listdir(chunked_uploads.directory) if name.startswith(upload_id)]
+
+
+def test_complete_and_claim_once_after_commit(app, client, user_ids):
+    upload_id = create_upload(client, len(PNG))
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 400
+    assert put_chunk(client, upload_id, 0, PNG).status_code == 200
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+    assert response.get_json()['upload']['status'] == 'complete'
+
+    with app.test_request_context():
+        # 与发布接口相同，先写入乐器再引用；事务回滚后上传仍可引用
+        db.session.add(Instrument(title='claim', description='claim', price=100, category_id=1,
+                                  user_id=user_ids['light']))
+        db.session.flush()
+        path = chunked_uploads.claim(upload_id, user_ids['light'], 'image')
+        assert chunked_uploads.status(upload_id, user_ids['light'])['status'] == 'claimed'
+        db.session.rollback()
+        assert chunked_uploads.status(upload_id, user_ids['light'])['status'] == 'complete'
+
+        # 提交后才删除，之后不能再次引用
+        instrument = Instrument(title='claim', description='claim', price=100, category_id=1,
+                                user_id=user_ids['light'])
+        db.session.add(instrument)
+        db.session.flush()
+        assert chunked_uploads.claim(upload_id, user_ids['light'], 'image') == path
+        assert chunked_uploads.status(upload_id, user_ids['light'])['status'] == 'claimed'
+        db.session.commit()
+        assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+        assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], path))
+        db.session.delete(instrument)
+        db.session.commit()
@@ -0,0 +1,38 @@
+"""读写分离：写操作后的读主库截止时间通过 cookie 或 X-DB-Primary-Until 请求头带回"""
+import time
+
+import pytest
+
+from app.db_routing import ReplicaRouter, PRIMARY_UNTIL_HEADER
+
+
+@pytest.fixture
+def router():
+    router = ReplicaRouter()
+    router.replicas = ['replica_0']
+    router.sticky_seconds = 10
+    return router
+
+
+def read_key(app, router, headers=None):
+    with app.test_request_context('/api/cart', headers=headers or {}):
+        return router.read_key()
+
+
+def test_write_returns_primary_until_header(app, router):
+    started = time.time()
+    with app.test_request_context('/api/cart', method='POST'):
+        router.stick_to_primary()
+        response = router._add_primary_header(app.response_class())
+    until = float(response.headers[PRIMARY_UNTIL_HEADER])
+    # 响应头保留到毫秒
+    assert started + router.sticky_seconds - 0.001 <= until <= time.time() + router.sticky_seconds + 0.001
+
+
+def test_echoed_header_keeps_reads_on_primary(app, router):
+    assert read_key(app, router) == 'replica_0'
+    assert read_key(app, router, {PRIMARY_UNTIL_HEADER: str(time.time() + 5)}) is None
+    # 过期、格式错误或超出粘滞时长（伪造）的值都忽略
+    assert read_key(app, router, {PRIMARY_UNTIL_HEADER: str(time.time() - 1)}) == 'replica_0'
+    assert read_key(app, router, {PRIMARY_UNTIL_HEADER: 'soon'}) == 'replica_0'
+    assert read_key(app, router, {PRIMARY_UNTIL_HEADER: str(time.time() + 3600)}) == 'replica_0'
@@ -0,0 +1,60 @@
+"""列表接口的 SQL 条数回归测试
+
+每个接口在数据量（页大小、条目数）不同的两种情况下执行的 SQL 条数必须相同，防止 N+1 查询回归。
+先请求一次预热（热门榜、搜索索引等懒加载的刷新不计入），再计数第二次请求。
+"""
+import pytest
+
+# 接口 -> 预期的 SQL 条数
+ANONYMOUS_LISTS = {
+    '/api/instruments?page_size={n}': 5,
+    '/api/instruments?page_size={n}&keyword=yamaha': 5,
+    '/api/instruments?page_size={n}&cursor=': 4,
+    '/api/instruments/hot?limit={n}': 4,
+    '/api/users/{seller}/instruments?page_size={n}': 6,
+}
+
+USER_LISTS = {
+    '/api/users/favorites': 5,
+    '/api/cart': 5,
+    '/api/orders': 6,
+    '/api/users/instruments': 5,
+}
+
+
+def count_queries(client, query_counter, url):
+    client.get(url)
+    query_counter.count = 0
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return query_counter.count, response.get_json()
+
+
+def item_count(data):
+    data = data.get('data', data)
+    if isinstance(data, dict):
+        for key in ('instruments', 'items', 'orders'):
+            if key in data:
+                return len(data[key])
+    return len(data)
+
+
+@pytest.mark.parametrize('url', list(ANONYMOUS_LISTS))
+def test_anonymous_list_query_count(app, query_counter, user_ids, url):
+    client = app.test_client()
+    counts = {}
+    for n in (2, 30):
+        counts[n], data = count_queries(client, query_counter, url.format(n=n, seller=user_ids['seller']))
+        assert item_count(data) == n
+    assert counts == {2: ANONYMOUS_LISTS[url], 30: ANONYMOUS_LISTS[url]}
+
+
+@pytest.mark.parametrize('url', list(USER_LISTS))
+def test_user_list_query_count(query_counter, login, url):
+    # light 的各类条目都是 2 件；heavy 收藏/购物车/订单 20 件，seller 发布 38 件
+    many = 'seller' if url == '/api/users/instruments' else 'heavy'
+    counts = {}
+    for username, expected in (('light', 2), (many, 38 if many == 'seller' else 20)):
+        counts[username], data = count_queries(login(username), query_counter, url)
+        assert item_count(data) == expected
+    assert counts == {'light': USER_LISTS[url], many: USER_LISTS[url]}
@@ -0,0 +1,54 @@
+"""全文检索：命中总数、候选上限、拉丁词的词中匹配"""
+from app.search import SearchIndex
+
+
+def make_index(documents):
+    index = SearchIndex()
+    index._loaded = True
+    index.refresh_interval = 10 ** 9
+    for instrument_id, title in documents.items():
+        index.add(instrument_id, {'title': title})
+    return index
+
+
+def test_latin_infix_match():
+    index = make_index({1: 'Fender Stratocaster', 2: 'Fender Telecaster', 3: 'Gibson Les Paul'})
+    assert {instrument_id for instrument_id, _ in index.search('caster')[0]} == {1, 2}
+    assert {instrument_id for instrument_id, _ in index.search('strat')[0]} == {1}
+    # 短于三个字符只按前缀匹配
+    assert index.search('te')[1] == {2}
+
+
+def test_infix_grams_follow_removals():
+    index = make_index({1: 'Stratocaster'})
+    index.remove(1)
+    assert index.search('caster') == ([], set())
+    assert not index._grams
+
+
+def test_search_reports_all_matches_beyond_limit():
+    index = make_index({instrument_id: 'Yamaha guitar' for instrument_id in range(1, 21)})
+    hits, matched = index.search('yamaha', limit=5)
+    assert len(hits) == 5
+    assert matched == set(range(1, 21))
+
+
+def test_list_is_capped_to_top_hits(app, monkeypatch):
+    from app.search import search_index
+    client = app.test_client()
+    data = client.get('/api/instruments?keyword=yamaha&page_size=10').get_json()
+    assert data['pagination']['total'] == 40
+    assert data['pagination']['search_matched'] == 40
+    assert not data['pagination']['search_truncated']
+
+    monkeypatch.setattr(search_index, 'max_hits', 5)
+    data = client.get('/api/instruments?keyword=yamaha&page_size=10&facets=true').get_json()
+    # 列表、总数和分面只覆盖相关度最高的候选，全部命中数和上限单独返回
+    assert data['pagination']['total'] == 5
+    assert sum(item['count'] for item in data['facets']['category']) == 5
+    assert data['pagination']['search_matched'] == 40
+    assert data['pagination']['search_limit'] == 5
+    assert data['pagination']['search_truncated']
+
+    hits, _ = search_index.search('yamaha')
+    assert [item['id'] for item in data['instruments']] == [instrument_id for instrument_id, _ in hits]
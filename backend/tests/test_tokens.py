@@ -0,0 +1,85 @@
+"""Bearer 令牌：吊销信息入库由所有 worker 共享，令牌版本号不受时钟精度影响"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.models import db, User
+from app.passwords import password_hasher
+from app.tokens import TokenAuth
+from conftest import PASSWORD
+
+_counter = iter(range(1000))
+
+
+@pytest.fixture
+def username(app):
+    name = f'token_user_{next(_counter)}'
+    with app.app_context():
+        user = User(username=name, email=f'{name}@example.com', is_verified=True)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+    return name
+
+
+def issue_tokens(client, username, password=PASSWORD):
+    response = client.post('/api/auth/login', json={'username': username, 'password': password, 'issue_tokens': True})
+    assert response.status_code == 200
+    return response.get_json()['tokens']
+
+
+def bearer(tokens):
+    return {'Authorization': f"Bearer {tokens['access_token']}"}
+
+
+def test_logout_is_enforced_by_other_workers(app, username):
+    client = app.test_client(use_cookies=False)
+    tokens = issue_tokens(client, username)
+    response = client.post('/api/auth/logout', headers=bearer(tokens), json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 200
+
+    # 另一个 worker 的 TokenAuth 实例同样拒绝已吊销的令牌
+    other_worker = TokenAuth()
+    with app.app_context():
+        assert other_worker.refresh(tokens['refresh_token'])[0] is None
+    with app.test_request_context('/api/cart', headers=bearer(tokens)):
+        from flask import request
+        assert other_worker.load_from_request(request) is None
+
+
+def test_refresh_token_is_single_use(app, username):
+    client = app.test_client(use_cookies=False)
+    tokens = issue_tokens(client, username)
+    assert client.post('/api/auth/token/refresh', json={'refresh_token': tokens['refresh_token']}).status_code == 200
+    assert client.post('/api/auth/token/refresh', json={'refresh_token': tokens['refresh_token']}).status_code == 401
+
+
+def test_password_change_revokes_tokens_issued_in_the_same_second(app, username):
+    client = app.test_client(use_cookies=False)
+    tokens = issue_tokens(client, username)
+    response = client.post('/api/auth/change_password', headers=bearer(tokens), json={
+        'old_password': PASSWORD, 'new_password': 'changed123', 'confirm_password': 'changed123'
+    })
+    assert response.status_code == 200
+    assert client.get('/api/cart', headers=bearer(tokens)).status_code == 401
+    assert client.post('/api/auth/token/refresh', json={'refresh_token': tokens['refresh_token']}).status_code == 401
+    assert client.get('/api/cart', headers=bearer(issue_tokens(client, username, 'changed123'))).status_code == 200
+
+
+def test_login_rehash_is_opt_in_and_keeps_existing_tokens(app, username, monkeypatch):
+    with app.app_context():
+        user = User.query.filter_by(username=username).one()
+        user.password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+        db.session.commit()
+    client = app.test_client(use_cookies=False)
+    earlier = issue_tokens(client, username)
+    with app.app_context():
+        # 默认不升级
+        assert password_hasher.needs_rehash(User.query.filter_by(username=username).one().password_hash)
+    
+    monkeypatch.setattr(password_hasher, 'rehash_on_login', True)
+    tokens = issue_tokens(client, username)
+    with app.app_context():
+        assert not password_hasher.needs_rehash(User.query.filter_by(username=username).one().password_hash)
+    # 密码没变，升级哈希不吊销已签发的令牌
+    assert client.get('/api/cart', headers=bearer(tokens)).status_code == 200
+    assert client.get('/api/cart', headers=bearer(earlier)).status_code == 200
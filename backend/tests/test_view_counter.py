@@ -0,0 +1,40 @@
+"""浏览量写缓冲：达到上限触发落库，落库失败时缓冲和计数一起放回"""
+import pytest
+
+from app.view_counter import ViewCounter
+
+
+@pytest.fixture
+def counter(app, monkeypatch):
+    counter = ViewCounter()
+    counter._app = app
+    counter.flush_interval = 3600
+    counter.max_pending = 5
+    monkeypatch.setattr(counter._worker, 'ensure', lambda: None)
+    return counter
+
+
+def test_overflow_wakes_flusher(counter):
+    for _ in range(4):
+        counter.increment(1)
+    assert not counter._wakeup.is_set()
+    counter.increment(2)
+    assert counter._wakeup.is_set()
+
+
+def test_failed_flush_restores_total(counter, monkeypatch):
+    counter.increment(1, 4)
+    counter.increment(2)
+
+    def fail(batch):
+        raise RuntimeError('数据库不可用')
+
+    monkeypatch.setattr(counter, '_apply', fail)
+    counter.flush()
+    assert counter._pending == {1: 4, 2: 1}
+    assert counter._pending_total == 5
+
+    monkeypatch.undo()
+    counter.flush()
+    assert not counter._pending
+    assert counter._pending_total == 0
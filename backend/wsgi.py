@@ -0,0 +1,9 @@
+"""生产环境入口
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+worker 数、线程数、超时和平滑重启等参数见 gunicorn.conf.py（均可用环境变量调整）。
+"""
+from run import app
+
+application = app
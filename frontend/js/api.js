@@ -22,18 +22,125 @@ async function getCsrfToken() {
     }
 }
 
+// Bearer 令牌（CONFIG.AUTH_MODE 为 'token' 时使用）
+function getAccessToken() {
+    return localStorage.getItem('access_token');
+}
+
+function saveAuthTokens(tokens) {
+    localStorage.setItem('access_token', tokens.access_token);
+    localStorage.setItem('refresh_token', tokens.refresh_token);
+}
+
+function clearAuthTokens() {
+    localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
+}
+
+// 用刷新令牌换一对新令牌，成功返回 true。
+// 刷新令牌只能用一次：同时过期的多个请求共用同一次刷新，避免后到的请求用旧令牌刷新失败而被登出
+let refreshInFlight = null;
+
+function refreshAuthTokens() {
+    if (!refreshInFlight) {
+        refreshInFlight = doRefreshAuthTokens().finally(() => {
+            refreshInFlight = null;
+        });
+    }
+    return refreshInFlight;
+}
+
+async function doRefreshAuthTokens() {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+        return false;
+    }
+    const response = await fetch(`${CONFIG.API_BASE}/auth/token/refresh`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken })
+    });
+    if (!response.ok) {
+        clearAuthTokens();
+        return false;
+    }
+    saveAuthTokens((await response.json()).tokens);
+    return true;
+}
+
+// 在请求头中加上 Bearer 令牌（没有令牌时原样返回，只用 cookie 会话）
+function authHeaders(headers = {}) {
+    const accessToken = getAccessToken();
+    return accessToken ? { ...headers, 'Authorization': `Bearer ${accessToken}` } : headers;
+}
+
+// 读己之写：写操作后服务端在响应头里给出读主库的截止时间，之后的请求原样带回
+// （令牌模式没有 session cookie，靠这个请求头让刚写入的数据立即可见）
+const PRIMARY_UNTIL_HEADER = 'X-DB-Primary-Until';
+
+function requestHeaders(headers = {}) {
+    // 只在截止时间之前带上（自定义请求头会触发 CORS 预检），过期后删除
+    const primaryUntil = localStorage.getItem('db_primary_until');
+    if (primaryUntil && parseFloat(primaryUntil) * 1000 > Date.now()) {
+        return authHeaders({ ...headers, [PRIMARY_UNTIL_HEADER]: primaryUntil });
+    }
+    if (primaryUntil) {
+        localStorage.removeItem('db_primary_until');
+    }
+    return authHeaders(headers);
+}
+
+function rememberPrimaryUntil(response) {
+    const primaryUntil = response.headers.get(PRIMARY_UNTIL_HEADER);
+    if (primaryUntil) {
+        localStorage.setItem('db_primary_until', primaryUntil);
+    }
+}
+
+// 带认证头的 fetch：访问令牌过期（401）时刷新一次令牌后重发
+// body 可以是函数，重发时重新生成（请求体里带令牌时要用刷新后的令牌）
+async function authFetch(url, options = {}) {
+    const send = () => fetch(url, {
+        ...options,
+        headers: requestHeaders(options.headers),
+        body: typeof options.body === 'function' ? options.body() : options.body
+    });
+    const sentToken = getAccessToken();
+    let response = await send();
+    // 其他请求已经刷新过令牌时直接用新令牌重发
+    if (response.status === 401 && sentToken
+            && (getAccessToken() !== sentToken ? !!getAccessToken() : await refreshAuthTokens())) {
+        response = await send();
+    }
+    rememberPrimaryUntil(response);
+    return response;
+}
+
+// GET 请求的 ETag 缓存：endpoint -> { etag, data }
+const etagCache = new Map();
+
 // 通用请求函数
 async function request(endpoint, options = {}) {
-    const csrfToken = await getCsrfToken();
+    const isGet = (options.method || 'GET').toUpperCase() === 'GET';
     
     const defaultOptions = {
         credentials: 'include',
         headers: {
-            'Content-Type': 'application/json',
-            'X-CSRFToken': csrfToken
+            'Content-Type': 'application/json'
         }
     };
     
+    // 只有写操作需要CSRF令牌，GET 请求省去一次往返
+    if (!isGet) {
+        defaultOptions.headers['X-CSRFToken'] = await getCsrfToken();
+    }
+    
+    // 带上次的 ETag 发起条件请求，数据没变时服务器返回 304
+    const cached = isGet ? etagCache.get(endpoint) : null;
+    if (cached) {
+        defaultOptions.headers['If-None-Match'] = cached.etag;
+    }
+    
     const mergedOptions = {
         ...defaultOptions,
         ...options,
@@ -44,14 +151,25 @@ async function request(endpoint, options = {}) {
     };
     
     try {
-        const response = await fetch(`${CONFIG.API_BASE}${endpoint}`, mergedOptions);
+        const response = await authFetch(`${CONFIG.API_BASE}${endpoint}`, mergedOptions);
+        
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
         
         if (!response.ok) {
             const errorData = await response.json().catch(() => ({}));
             throw new Error(errorData.message || `请求失败: ${response.status}`);
         }
         
-        return await response.json();
+        const data = await response.json();
+        
+        const etag = response.headers.get('ETag');
+        if (isGet && etag) {
+            etagCache.set(endpoint, { etag, data });
+        }
+        
+        return data;
     } catch (error) {
         console.error('API请求失败:', error);
         throw error;
@@ -83,7 +201,7 @@ async function uploadRequest(endpoint, formData, options = {}) {
     delete mergedOptions.headers['Content-Type'];
     
     try {
-        const response = await fetch(`${CONFIG.API_BASE}${endpoint}`, mergedOptions);
+        const response = await authFetch(`${CONFIG.API_BASE}${endpoint}`, mergedOptions);
         
         if (!response.ok) {
             const errorData = await response.json().catch(() => ({}));
@@ -97,6 +215,52 @@ async function uploadRequest(endpoint, formData, options = {}) {
     }
 }
 
+// 分片上传：先创建上传会话，再按服务端给出的分片大小逐片 PUT，最后确认完成
+// 中断后重新调用时带上 uploadId，会从服务端已收到的位置继续
+async function uploadInChunks(file, kind, uploadId = null, onProgress = null) {
+    let upload;
+    let chunkSize = 1024 * 1024;
+    
+    if (uploadId) {
+        upload = (await request(`/uploads/${uploadId}`, { method: 'GET' })).upload;
+        if (upload.status === 'complete') {
+            return upload.upload_id;
+        }
+    } else {
+        const created = await request('/uploads', {
+            method: 'POST',
+            body: JSON.stringify({ filename: file.name, size: file.size, kind })
+        });
+        upload = created.upload;
+        chunkSize = created.chunk_size;
+    }
+    
+    const csrfToken = await getCsrfToken();
+    let offset = upload.offset;
+    while (offset < file.size) {
+        const response = await authFetch(`${CONFIG.API_BASE}/uploads/${upload.upload_id}?offset=${offset}`, {
+            method: 'PUT',
+            credentials: 'include',
+            headers: {
+                'X-CSRFToken': csrfToken,
+                'Content-Type': 'application/octet-stream'
+            },
+            body: file.slice(offset, offset + chunkSize)
+        });
+        const result = await response.json().catch(() => ({}));
+        if (!response.ok) {
+            throw new Error(result.message || `上传失败: ${response.status}`);
+        }
+        offset = result.upload.offset;
+        if (onProgress) {
+            onProgress(offset, file.size);
+        }
+    }
+    
+    await request(`/uploads/${upload.upload_id}/complete`, { method: 'POST' });
+    return upload.upload_id;
+}
+
 // 认证相关API
 
 // 登录
@@ -167,19 +331,23 @@ async function getInstrumentDetail(id) {
     });
 }
 
-// 发布乐器
+// 发布乐器（图片和音频先分片上传，表单只提交 upload_id）
 async function publishInstrument(data, images) {
     const formData = new FormData();
     
-    // 添加文本字段
+    // 添加文本字段，音频等文件字段先走分片上传
     for (const [key, value] of Object.entries(data)) {
-        formData.append(key, value);
+        if (value instanceof File) {
+            formData.append(key, await uploadInChunks(value, key === 'audio' ? 'audio' : 'image'));
+        } else {
+            formData.append(key, value);
+        }
     }
     
-    // 添加图片文件
-    images.forEach((image, index) => {
-        formData.append('images', image);
-    });
+    // 添加图片
+    for (const image of images) {
+        formData.append('images', await uploadInChunks(image, 'image'));
+    }
     
     return await uploadRequest('/instruments', formData, {
         method: 'POST'
@@ -313,6 +481,7 @@ window.api = {
     
     // 工具函数
     getCsrfToken,
+    uploadInChunks,
     request,
     uploadRequest
 };
\ No newline at end of file
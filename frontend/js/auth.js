@@ -55,7 +55,8 @@ async function handleLogin(event) {
             body: JSON.stringify({
                 username: username,
                 password: password,
-                remember: remember
+                remember: remember,
+                issue_tokens: CONFIG.AUTH_MODE === 'token'
             }),
             signal: controller.signal
         });
@@ -74,6 +75,9 @@ async function handleLogin(event) {
             
             // 保存用户信息到sessionStorage
             sessionStorage.setItem('user', JSON.stringify(data.user));
+            if (data.tokens) {
+                saveAuthTokens(data.tokens);
+            }
             
             // 重定向到用户界面或原页面
             setTimeout(() => {
@@ -212,26 +216,30 @@ async function checkAuth() {
 // 退出登录
 async function logout() {
     try {
-        const response = await fetch(`${CONFIG.API_BASE}/auth/logout`, {
+        // 访问令牌过期时 authFetch 先刷新再重发，服务端才能吊销这对令牌
+        const response = await authFetch(`${CONFIG.API_BASE}/auth/logout`, {
             method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: () => JSON.stringify({ refresh_token: localStorage.getItem('refresh_token') }),
             credentials: 'include'
         });
         const data = await response.json();
-        
-        if (data.success) {
-            // 清除本地存储的用户信息
-            sessionStorage.removeItem('user');
-            localStorage.removeItem('user');
-            
-            showNotification('已退出登录', 'success');
-            setTimeout(() => {
-                window.location.href = 'login.html';
-            }, 1000);
+        if (!data.success) {
+            console.error('退出登录失败:', data.message);
         }
     } catch (error) {
         console.error('退出登录失败:', error);
-        showNotification('退出失败，请重试', 'error');
+    } finally {
+        // 服务端失败也要清除本地存储的用户信息和令牌
+        sessionStorage.removeItem('user');
+        localStorage.removeItem('user');
+        clearAuthTokens();
     }
+    
+    showNotification('已退出登录', 'success');
+    setTimeout(() => {
+        window.location.href = 'login.html';
+    }, 1000);
 }
 
 // 更新用户资料
@@ -174,9 +174,13 @@ async function renderCartPage() {
                 ${cart.items.map(item => `
                     <div class="cart-item" data-item-id="${item.id}">
                         <div class="item-info">
-                            <img src="${item.instrument.main_image || 'images/default-instrument.jpg'}" 
-                                 alt="${item.instrument.title}"
-                                 onerror="this.src='images/default-instrument.jpg'">
+                            <picture>
+                                ${webpSource(item.instrument.main_image_srcset_webp, '100px')}
+                                <img src="${item.instrument.main_image_thumb || 'images/default-instrument.jpg'}" 
+                                 ${item.instrument.main_image_srcset ? `srcset="${item.instrument.main_image_srcset}" sizes="100px"` : ''}
+                                     alt="${item.instrument.title}"
+                                     onerror="useDefaultImage(this)">
+                            </picture>
                             <div>
                                 <h4>${item.instrument.title}</h4>
                                 <p class="category">${item.instrument.category_name || '未分类'}</p>
@@ -3,5 +3,7 @@ const CONFIG = {
     // 自动检测API地址，如果是本地开发则使用localhost，否则使用当前域名
     API_BASE: window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1' 
         ? 'http://localhost:5000/api' 
-        : `${window.location.protocol}//${window.location.host}/api`
+        : `${window.location.protocol}//${window.location.host}/api`,
+    // 登录方式：'session' 使用 cookie 会话；'token' 使用 Bearer 访问令牌（保存在 localStorage，过期后自动刷新）
+    AUTH_MODE: 'session'
 };
\ No newline at end of file
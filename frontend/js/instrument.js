@@ -47,7 +47,7 @@ function renderInstrumentDetail(instrument) {
     if (thumbnailList && instrument.images.length > 0) {
         thumbnailList.innerHTML = instrument.images.map((img, index) => `
             <div class="thumbnail ${index === 0 ? 'active' : ''}" onclick="changeMainImage('${img.full_url}', this)">
-                <img src="${img.full_url}" alt="缩略图 ${index + 1}">
+                <img src="${img.thumb_url}" alt="缩略图 ${index + 1}" loading="lazy">
             </div>
         `).join('');
     }
@@ -82,7 +82,11 @@ function renderInstrumentDetail(instrument) {
     const audioPlayer = document.getElementById('audioPlayer');
     if (instrument.audio_url && audioPreview && audioPlayer) {
         audioPreview.style.display = 'block';
-        audioPlayer.src = instrument.audio_url;
+        // 优先播放转码后的试听文件，处理完成前退回原文件
+        audioPlayer.src = instrument.audio_preview_url || instrument.audio_url;
+        if (instrument.audio_peaks_url) {
+            renderWaveform(instrument.audio_peaks_url, audioPlayer);
+        }
     }
     
     // 更新卖家信息
@@ -110,6 +114,58 @@ function renderInstrumentDetail(instrument) {
     }
 }
 
+// 绘制试听音频波形（峰值数据由后端预先计算），点击波形跳转播放位置
+async function renderWaveform(peaksUrl, audioPlayer) {
+    const canvas = document.getElementById('audioWaveform');
+    if (!canvas) return;
+    
+    let waveform;
+    try {
+        const response = await fetch(peaksUrl);
+        if (!response.ok) return;
+        waveform = await response.json();
+    } catch (error) {
+        console.error('加载波形失败:', error);
+        return;
+    }
+    
+    const peaks = waveform.data || [];
+    const draw = () => {
+        const width = canvas.clientWidth;
+        const height = 60;
+        const ratio = window.devicePixelRatio || 1;
+        canvas.width = width * ratio;
+        canvas.height = height * ratio;
+        const ctx = canvas.getContext('2d');
+        ctx.scale(ratio, ratio);
+        ctx.clearRect(0, 0, width, height);
+        
+        const count = peaks.length / 2;
+        const duration = audioPlayer.duration || waveform.duration || 0;
+        const played = duration ? audioPlayer.currentTime / duration : 0;
+        const mid = height / 2;
+        for (let x = 0; x < width; x++) {
+            const i = Math.floor(x / width * count) * 2;
+            const top = mid - peaks[i + 1] * mid;
+            const bottom = mid - peaks[i] * mid;
+            ctx.fillStyle = x / width < played ? '#667eea' : '#c8cbd6';
+            ctx.fillRect(x, top, 1, Math.max(1, bottom - top));
+        }
+    };
+    
+    canvas.style.display = 'block';
+    canvas.onclick = (event) => {
+        const duration = audioPlayer.duration || waveform.duration;
+        if (!duration) return;
+        const rect = canvas.getBoundingClientRect();
+        audioPlayer.currentTime = (event.clientX - rect.left) / rect.width * duration;
+        audioPlayer.play();
+    };
+    audioPlayer.addEventListener('timeupdate', draw);
+    window.addEventListener('resize', draw);
+    draw();
+}
+
 // 渲染卖家信息
 function renderSellerInfo(seller) {
     const sellerCard = document.getElementById('sellerCard');
@@ -154,9 +210,14 @@ async function loadRelatedInstruments(categoryId, excludeId, limit = 4) {
                 relatedGrid.innerHTML = related.map(instrument => `
                     <div class="instrument-card" onclick="window.location.href='detail.html?id=${instrument.id}'">
                         <div class="instrument-image">
-                            <img src="${instrument.main_image || 'images/default-instrument.jpg'}" 
-                                 alt="${instrument.title}"
-                                 onerror="this.src='images/default-instrument.jpg'">
+                            <picture>
+                                ${webpSource(instrument.main_image_srcset_webp, '(max-width: 768px) 50vw, 280px')}
+                                <img src="${instrument.main_image_thumb || 'images/default-instrument.jpg'}" 
+                                     ${instrument.main_image_srcset ? `srcset="${instrument.main_image_srcset}" sizes="(max-width: 768px) 50vw, 280px"` : ''}
+                                     loading="lazy"
+                                     alt="${instrument.title}"
+                                     onerror="useDefaultImage(this)">
+                            </picture>
                             <span class="condition-badge ${instrument.condition}">
                                 ${getConditionText(instrument.condition)}
                             </span>
@@ -124,23 +124,35 @@ async function handleSearch() {
 async function handleLogout(e) {
     e.preventDefault();
     
+    // 没有加载 api.js 的页面只用 cookie 会话
+    const hasApi = typeof authFetch === 'function';
+    
     try {
-        const response = await fetch(`${CONFIG.API_BASE}/auth/logout`, {
-            method: 'POST',
-            credentials: 'include'
-        });
+        const response = hasApi
+            ? await authFetch(`${CONFIG.API_BASE}/auth/logout`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: () => JSON.stringify({ refresh_token: localStorage.getItem('refresh_token') }),
+                credentials: 'include'
+            })
+            : await fetch(`${CONFIG.API_BASE}/auth/logout`, { method: 'POST', credentials: 'include' });
         const data = await response.json();
-        
-        if (data.success) {
-            showNotification('已退出登录', 'success');
-            setTimeout(() => {
-                window.location.href = 'index.html';
-            }, 1000);
+        if (!data.success) {
+            console.error('登出失败:', data.message);
         }
     } catch (error) {
         console.error('登出失败:', error);
-        showNotification('登出失败', 'error');
+    } finally {
+        // 服务端失败也要清除本地令牌
+        if (hasApi) {
+            clearAuthTokens();
+        }
     }
+    
+    showNotification('已退出登录', 'success');
+    setTimeout(() => {
+        window.location.href = 'index.html';
+    }, 1000);
 }
 
 // 加载页面数据
@@ -191,9 +203,14 @@ async function loadHotInstruments() {
             hotInstruments.innerHTML = data.instruments.map(instrument => `
                 <div class="instrument-card" onclick="viewInstrument(${instrument.id})">
                     <div class="instrument-image">
-                        <img src="${instrument.main_image || 'images/default-instrument.jpg'}" 
-                             alt="${instrument.title}"
-                             onerror="this.src='images/default-instrument.jpg'">
+                        <picture>
+                            ${webpSource(instrument.main_image_srcset_webp, '(max-width: 768px) 50vw, 280px')}
+                            <img src="${instrument.main_image_thumb || 'images/default-instrument.jpg'}" 
+                                 ${instrument.main_image_srcset ? `srcset="${instrument.main_image_srcset}" sizes="(max-width: 768px) 50vw, 280px"` : ''}
+                                 loading="lazy"
+                                 alt="${instrument.title}"
+                                 onerror="useDefaultImage(this)">
+                        </picture>
                         <span class="condition-badge ${instrument.condition}">
                             ${getConditionText(instrument.condition)}
                         </span>
@@ -227,9 +244,14 @@ async function loadLatestInstruments() {
             instrumentsGrid.innerHTML = data.instruments.map(instrument => `
                 <div class="instrument-card" onclick="viewInstrument(${instrument.id})">
                     <div class="instrument-image">
-                        <img src="${instrument.main_image || 'images/default-instrument.jpg'}" 
-                             alt="${instrument.title}"
-                             onerror="this.src='images/default-instrument.jpg'">
+                        <picture>
+                            ${webpSource(instrument.main_image_srcset_webp, '(max-width: 768px) 50vw, 280px')}
+                            <img src="${instrument.main_image_thumb || 'images/default-instrument.jpg'}" 
+                                 ${instrument.main_image_srcset ? `srcset="${instrument.main_image_srcset}" sizes="(max-width: 768px) 50vw, 280px"` : ''}
+                                 loading="lazy"
+                                 alt="${instrument.title}"
+                                 onerror="useDefaultImage(this)">
+                        </picture>
                         <span class="condition-badge ${instrument.condition}">
                             ${getConditionText(instrument.condition)}
                         </span>
@@ -238,4 +238,18 @@ function previewImages(files, container) {
         };
         reader.readAsDataURL(file);
     });
-}
\ No newline at end of file
+}
+// 列表图片的 WebP 来源：支持 WebP 的浏览器从 <source> 取 WebP 派生图，其余用 img 自身的 srcset
+function webpSource(srcsetWebp, sizes) {
+    return srcsetWebp ? `<source type="image/webp" srcset="${srcsetWebp}" sizes="${sizes}">` : '';
+}
+
+// 图片加载失败时换成默认图：<source> 和 srcset 都优先于 src，要一并去掉
+function useDefaultImage(img, fallback = 'images/default-instrument.jpg') {
+    img.onerror = null;
+    if (img.parentElement && img.parentElement.tagName === 'PICTURE') {
+        img.parentElement.querySelectorAll('source').forEach(source => source.remove());
+    }
+    img.removeAttribute('srcset');
+    img.src = fallback;
+}